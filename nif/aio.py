@@ -0,0 +1,144 @@
+"""
+Asyncio counterparts of the blocking I/O of `NIFDocument`.
+
+Parsing and serialization are CPU bound, so they run in an executor and the
+event loop keeps serving other requests meanwhile::
+
+    doc = await NIFDocument.aparse_rdf(await request.text(), format='turtle')
+    await doc.awrite_to(response, format='turtle')
+
+The executor is the default one of the loop unless another one is set with
+`set_executor` or passed to a call. A `concurrent.futures.ProcessPoolExecutor`
+sidesteps the GIL for `parse_rdf` and `serialize`; the streaming functions
+advance a generator step by step and need a thread executor.
+"""
+import asyncio
+import codecs
+import contextvars
+import functools
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+
+from nif.annotation import NIFDocument, nif_ns
+
+_executor = None
+
+
+def set_executor(executor):
+    """
+    :param executor: the `concurrent.futures.Executor` used by default,
+        `None` for the default executor of the loop
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    return _executor
+
+
+async def run(fn, *args, executor=None, **kwargs):
+    """
+    :return: the result of `fn(*args, **kwargs)` computed in `executor`, or
+        in the executor of `set_executor` by default. In a thread executor
+        `fn` runs in a copy of the current context, e.g. it is counted by
+        the active `nif.annotation.instrument` block.
+    """
+    if executor is None:
+        executor = _executor
+    call = functools.partial(fn, *args, **kwargs)
+    if not isinstance(executor, ProcessPoolExecutor):
+        call = functools.partial(contextvars.copy_context().run, call)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, call)
+
+
+async def read_chunks(chunks, encoding='utf-8'):
+    """
+    :param chunks: async iterable of str or bytes, e.g.
+        `aiohttp.StreamReader.iter_chunked(n)`. The bytes are decoded
+        incrementally, a character split between chunks is kept.
+    :return: the whole text
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    async for chunk in chunks:
+        parts.append(decoder.decode(chunk) if isinstance(chunk, bytes)
+                     else chunk)
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts)
+
+
+async def parse_rdf(rdf_text, format='n3', context_class=nif_ns.Context,
+                    document_class=NIFDocument, executor=None, **kwargs):
+    """
+    See `NIFDocument.parse_rdf`.
+
+    :param rdf_text: str, bytes or an async iterable of str or bytes chunks,
+        see `read_chunks`
+    :return: NIFDocument
+    """
+    if hasattr(rdf_text, '__aiter__'):
+        rdf_text = await read_chunks(rdf_text)
+    return await run(document_class.parse_rdf, rdf_text, format=format,
+                     context_class=context_class, executor=executor,
+                     **kwargs)
+
+
+async def serialize(doc, format='xml', executor=None, **kwargs):
+    """
+    See `NIFDocument.serialize`.
+    """
+    return await run(doc.serialize, format=format, executor=executor,
+                     **kwargs)
+
+
+def _next_batch(chunks, batch_size):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            break
+    return ''.join(batch)
+
+
+async def iter_serialize(doc, format='nt', batch_size=1000, executor=None):
+    """
+    Asynchronous generator over the serialization of the document, see
+    `NIFDocument.iter_serialize`.
+
+    :param batch_size: the number of chunks of `NIFDocument.iter_serialize`
+        (triples or subject blocks) produced by one step in the executor and
+        joined in a single text chunk
+    :param executor: a thread executor, see the module docstring
+    """
+    chunks = doc.iter_serialize(format=format)
+    while True:
+        text = await run(_next_batch, chunks, batch_size, executor=executor)
+        if not text:
+            return
+        yield text
+
+
+async def write_to(doc, writer, format='nt', encoding='utf-8',
+                   batch_size=1000, executor=None):
+    """
+    Stream the serialization of the document to `writer`, e.g. an
+    `asyncio.StreamWriter` (drained after every chunk) or an
+    `aiohttp.web.StreamResponse` (whose `write` is awaited).
+
+    :param encoding: the encoding of the bytes written, `None` to write str
+    :return: the number of chunks written
+    """
+    n = 0
+    async for text in iter_serialize(doc, format=format,
+                                     batch_size=batch_size,
+                                     executor=executor):
+        result = writer.write(text if encoding is None
+                              else text.encode(encoding))
+        if inspect.isawaitable(result):
+            await result
+        elif hasattr(writer, 'drain'):
+            await writer.drain()
+        n += 1
+    return n
@@ -1,30 +1,183 @@
+import contextlib
+import contextvars
+import functools
+import operator
 import re
+import time
 import uuid
+import weakref
+from collections import Counter, defaultdict
 from typing import List
 
 import rdflib
 
+from nif import parser, terms, writer
+from nif.fingerprint import format_fingerprint, triple_digests
 from nif.namespace import ns_dict
+from nif.spans import SpanIndex
 
 nif_ns = ns_dict['nif']
+xsd_nni = rdflib.XSD.nonNegativeInteger
+# namespace attribute lookups are slow, the hot paths use these
+_rdf_type = rdflib.RDF.type
+_reference_context = nif_ns.referenceContext
+_anchor_of = nif_ns.anchorOf
+_uri_schemes = (nif_ns.ContextHashBasedString, nif_ns.RFC5147String,
+                nif_ns.CStringInst, nif_ns.OffsetBasedString)
+
+
+class _ContextAnchor:
+    """
+    Anchor of an annotation that is the span of its reference context. It
+    is held instead of a copy of the substring, the literal is only built
+    when the anchor is read or serialized.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'CONTEXT_ANCHOR'
+
+    def __reduce__(self):
+        return 'CONTEXT_ANCHOR'
+
+
+CONTEXT_ANCHOR = _ContextAnchor()
+
+
+def _anchor_fits(anchor, text, begin, end):
+    """
+    Case insensitive comparison of `anchor` with `text[begin:end]`. The
+    usual exact match is checked in place, only anchors differing in case
+    are lowered.
+    """
+    if len(anchor) == end - begin and text.startswith(anchor, begin):
+        return True
+    # Extractor returns different capitalization in matches!
+    return anchor.lower() == text[begin:end].lower()
+
+
+# Instrumentation
+
+# the innermost `Instrumentation` active in the current context
+_instrumentation = contextvars.ContextVar('nif_instrumentation',
+                                          default=None)
+
+
+class Instrumentation:
+    """
+    Counters and stage timers collected while `instrument` is active.
+
+    `counters` counts the events: `records_created`, `graphs_created`,
+    `triples_added`, `validations` (annotations checked),
+    `attribute_resolutions` (reads of `prefix__name` attributes) and
+    `attribute_name_parses` (attribute names resolved for the first time).
+    `timers` sums the wall time of the stages: `parse_rdf`,
+    `add_annotations`, `add_extracted_positions`, `validate`, `rdf` (the
+    union graph), `serialize`, `write_to` and `fingerprint`. The stages
+    are timed inclusively, e.g. `parse_rdf` includes `add_annotations`.
+    """
+    def __init__(self, callback=None, parent=None):
+        """
+        :param callback: function (stage, seconds) called at the end of
+            every timed stage
+        :param Instrumentation parent: enclosing instrumentation, it gets
+            the same numbers
+        """
+        self.counters = Counter()
+        self.timers = defaultdict(float)
+        self.calls = Counter()
+        self.callback = callback
+        self.parent = parent
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+        if self.parent is not None:
+            self.parent.count(name, n)
+
+    def record(self, stage, seconds):
+        self.timers[stage] += seconds
+        self.calls[stage] += 1
+        if self.callback is not None:
+            self.callback(stage, seconds)
+        if self.parent is not None:
+            self.parent.record(stage, seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        :return: JSON serializable dict of the counters and the timers
+        """
+        return {'counters': dict(self.counters),
+                'timers': {stage: {'seconds': seconds,
+                                   'calls': self.calls[stage]}
+                           for stage, seconds in self.timers.items()}}
+
+
+@contextlib.contextmanager
+def instrument(callback=None):
+    """
+    Collect the counters and the timers of the operations run in the block
+    by the current thread or asyncio task::
+
+        with instrument() as stats:
+            doc = NIFDocument.parse_rdf(text)
+            doc.serialize(format='turtle')
+        export(stats.snapshot())
+
+    The active instrumentation is a context variable, so concurrent blocks
+    in other threads or tasks count apart. New threads and the executors of
+    `loop.run_in_executor` start with an empty context and are not counted;
+    the calls of `nif.aio` run in a copy of the context of the caller and
+    are counted by its block. Outside of the blocks the instrumentation
+    costs one context variable lookup per event.
+
+    :param callback: see `Instrumentation`
+    :return: Instrumentation
+    """
+    stats = Instrumentation(callback=callback, parent=_instrumentation.get())
+    token = _instrumentation.set(stats)
+    try:
+        yield stats
+    finally:
+        _instrumentation.reset(token)
+
+
+def _timed(stage):
+    """
+    Decorator timing the calls of a function as the stage `stage`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            instrumentation = _instrumentation.get()
+            if instrumentation is None:
+                return fn(*args, **kwargs)
+            with instrumentation.timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
 
 
 def do_suffix_offset(uri, begin_index, end_index):
-    # TODO: add uri_scheme and add support for RFC5147String
-    uri_str = uri.toPython() if hasattr(uri, 'toPython') else str(uri)
-    uri_str = uri_str.rstrip('/')
-    chars_indicator = '#offset_'
-    if chars_indicator in uri_str:
-        splitted = uri_str.split(chars_indicator)
-        splitted[-1] = '{}_{}'.format(begin_index, end_index)
-        out = chars_indicator.join(splitted)
-    else:
-        out = uri_str + chars_indicator + '{}_{}'.format(begin_index,
-                                                         end_index)
-    return rdflib.URIRef(out)
+    return terms.offset_uri(uri, begin_index, end_index)
+
+
+# attribute name -> predicate, memo of `_parse_attr_name`
+_attr_predicates = dict()
 
 
 def _parse_attr_name(name):
+    try:
+        return _attr_predicates[name]
+    except KeyError:
+        pass
     try:
         prefix, suffix = name.split('__')
     except Exception:
@@ -42,68 +195,156 @@ def _parse_attr_name(name):
             splitted[i] = x
     rdf_suffix = ''.join(splitted)
     predicate = ns[rdf_suffix]
+    _attr_predicates[name] = predicate
+    instrumentation = _instrumentation.get()
+    if instrumentation is not None:
+        instrumentation.count('attribute_name_parses')
     return predicate
 
 
+def _attr_name(predicate):
+    """
+    :return: the attribute name resolved to `predicate` by
+        `_parse_attr_name`, e.g. nif__begin_index for nif:beginIndex, or None
+    """
+    for key, ns in ns_dict.items():
+        ns = str(ns)
+        if predicate.startswith(ns):
+            suffix = re.sub('[A-Z]', lambda m: '_' + m.group().lower(),
+                            predicate[len(ns):])
+            name = '{}__{}'.format(key, suffix)
+            if _parse_attr_name(name) == predicate:
+                return name
+    return None
+
+
+def _offset_int(value):
+    if value is None or isinstance(value, int):
+        return value
+    return int(value.toPython())
+
+
 def register_ns(key, ns):
     assert isinstance(ns, rdflib.Namespace)
     ns_dict[key] = ns
+    _attr_predicates.clear()
 
 
 def to_rdf_literal(value, datatype=None):
     if isinstance(value, (rdflib.URIRef, rdflib.Literal,
                           rdflib.BNode, rdflib.Variable)):
         return value
-    elif datatype is not None:
-        return rdflib.Literal(value, datatype=datatype)
-    else:
-        return rdflib.Literal(value)
+    return terms.literal(value, datatype)
+
+
+class _SlotAttribute:
+    """
+    Read access to the attribute of a predicate held in a slot, e.g.
+    `nif__begin_index`, bypassing the name resolution of
+    `RDFGetSetMixin.__getattr__`. Writes still go through `__setattr__`.
+    """
+    __slots__ = ('predicate', 'slot')
+
+    def __init__(self, predicate, slot):
+        self.predicate = predicate
+        self.slot = slot
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        instrumentation = _instrumentation.get()
+        if instrumentation is not None:
+            instrumentation.count('attribute_resolutions')
+        if obj._po is None or self.predicate not in obj._po:
+            return obj._slot_term(self.slot)
+        return obj._attr_value(self.predicate)
+
+
+class RDFGetSetMixin:
+    """
+    Compact record describing a single NIF subject.
+
+    The values of the core NIF predicates are kept in dedicated slots (see
+    `_slot_predicates`), any other (predicate, object) pair lives in a small
+    dict and triples about other subjects are kept aside. No `rdflib.Graph`
+    is created until one is explicitly requested with `to_graph`, e.g. on
+    serialization. The read-only part of the `rdflib.Graph` API used by the
+    callers (`triples`, `objects`, `value`, slicing, `len`, ...) is
+    emulated on top of the record.
+
+    Weak references to the objects watching the record (e.g. the
+    `NIFDocument`s it belongs to) are kept in `_watchers`; the watchers get
+    `_record_changed(record)` called on every change of its triples.
+    """
+    # `__dict__` is only allocated if somebody attaches an ad-hoc attribute
+    __slots__ = ('uri', '_po', '_extra', '_watchers', '__dict__')
+    # predicate -> name of the slot holding its (single) value
+    _slot_predicates = {}
+    # slots holding offsets stored as plain ints
+    _int_slots = frozenset()
+
+    def __init__(self):
+        self._po = None
+        self._extra = None
+        self._watchers = None
+        for slot in self._slot_predicates.values():
+            object.__setattr__(self, slot, None)
+        instrumentation = _instrumentation.get()
+        if instrumentation is not None:
+            instrumentation.count('records_created')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for predicate, slot in cls._slot_predicates.items():
+            name = _attr_name(predicate)
+            if name is not None and name not in cls.__dict__:
+                setattr(cls, name, _SlotAttribute(predicate, slot))
 
-
-class RDFGetSetMixin(rdflib.Graph):
     def __getattr__(self, name):
         if name.startswith("_"):
             return super().__getattribute__(name)
         elif '__' in name:
-            predicate = _parse_attr_name(name)
-            rs = list(self.objects(subject=self.uri, predicate=predicate))
-            if len(rs) == 1:
-                return rs.pop()
-            elif len(rs) == 0:
-                return None
-            else:
-                return rs
+            instrumentation = _instrumentation.get()
+            if instrumentation is not None:
+                instrumentation.count('attribute_resolutions')
+            return self._attr_value(_parse_attr_name(name))
         else:
             return super().__getattribute__(name)
 
+    def _attr_value(self, predicate):
+        rs = self._objects(predicate)
+        if len(rs) == 1:
+            return rs[0]
+        elif len(rs) == 0:
+            return None
+        else:
+            return rs
+
     def __setattr__(self, name, value, validate=True, datatype=None):
-        if name.startswith("_"):
-            super().__setattr__(name, value)
-        elif '__' in name:
+        if '__' in name and not name.startswith('_'):
             predicate = _parse_attr_name(name)
+            self._remove_po(predicate)
             if isinstance(value, (list, tuple)):
-                self.remove((self.uri, predicate, None))
                 for val_item in value:
-                    self.add((self.uri, predicate,
-                              to_rdf_literal(val_item, datatype=datatype)))
+                    self._add_po(predicate,
+                                 to_rdf_literal(val_item, datatype=datatype))
             else:
-                self.set((self.uri, predicate,
-                          to_rdf_literal(value, datatype=datatype)))
+                self._add_po(predicate,
+                             to_rdf_literal(value, datatype=datatype))
             if validate:
                 self.validate()
         else:
-            super().__setattr__(name, value)
+            object.__setattr__(self, name, value)
 
     def addattr(self, name, value, validate=True, datatype=None):
         assert '__' in name, name
         predicate = _parse_attr_name(name)
         if isinstance(value, (list, tuple)):
             for val_item in value:
-                self.add((self.uri, predicate,
-                          to_rdf_literal(val_item, datatype=datatype)))
+                self._add_po(predicate,
+                             to_rdf_literal(val_item, datatype=datatype))
         else:
-            self.add((self.uri, predicate,
-                      to_rdf_literal(value, datatype=datatype)))
+            self._add_po(predicate, to_rdf_literal(value, datatype=datatype))
         if validate:
             self.validate()
 
@@ -112,22 +353,317 @@ class RDFGetSetMixin(rdflib.Graph):
         predicate = _parse_attr_name(name)
         if isinstance(value, (list, tuple)):
             for val_item in value:
-                self.remove((self.uri, predicate, to_rdf_literal(val_item)))
+                self._remove_po(predicate, to_rdf_literal(val_item))
         else:
-            self.remove((self.uri, predicate, to_rdf_literal(value)))
+            self._remove_po(predicate, to_rdf_literal(value))
         if validate:
             self.validate()
 
     def add_nif_classes(self):
         for cls in self.nif_classes:
-            self.add((self.uri, rdflib.RDF.type, cls))
+            self._add_po(_rdf_type, cls)
         return self
 
     def validate(self):
         raise NotImplementedError
 
+    # Record storage
+
+    def _changed(self):
+        if self._watchers:
+            for ref in self._watchers:
+                watcher = ref()
+                if watcher is not None:
+                    watcher._record_changed(self)
+
+    def _watch(self, ref):
+        """
+        :param weakref.ref ref: reference to the new watcher
+        """
+        if self._watchers is None:
+            self._watchers = [ref]
+        elif not any(r is ref for r in self._watchers):
+            # drop the watchers garbage collected meanwhile, e.g. the many
+            # documents sharing a context, in place since the units of an
+            # annotation share its list
+            self._watchers[:] = [r for r in self._watchers
+                                 if r() is not None]
+            self._watchers.append(ref)
+
+    def _unwatch(self, ref):
+        if self._watchers:
+            self._watchers[:] = [r for r in self._watchers if r is not ref]
+
+    def __getstate__(self):
+        state = dict()
+        for cls in type(self).__mro__:
+            for slot in cls.__dict__.get('__slots__', ()):
+                if slot not in ('_watchers', '__dict__') and \
+                        hasattr(self, slot):
+                    state[slot] = getattr(self, slot)
+        state.update(self.__dict__)
+        return state
+
+    def __setstate__(self, state):
+        self._watchers = None
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+
+    def __copy__(self):
+        """
+        :return: a new record with the same URI and triples, not watched
+        """
+        state = self.__getstate__()
+        if state.get('_po') is not None:
+            state['_po'] = {p: list(objs) for p, objs in state['_po'].items()}
+        if state.get('_extra') is not None:
+            state['_extra'] = set(state['_extra'])
+        out = type(self).__new__(type(self))
+        out.__setstate__(state)
+        return out
+
+    def _slot_term(self, slot):
+        value = getattr(self, slot)
+        if value is None or isinstance(value, rdflib.term.Node):
+            return value
+        if value is CONTEXT_ANCHOR:
+            return self._context_anchor()
+        if slot not in self._int_slots:
+            return value
+        return terms.offset_literal(value)
+
+    def _slot_value(self, slot, obj):
+        if slot in self._int_slots and isinstance(obj, rdflib.Literal) and \
+                obj.datatype == xsd_nni:
+            return int(obj.toPython())
+        return obj
+
+    def _objects(self, predicate):
+        out = []
+        slot = self._slot_predicates.get(predicate)
+        if slot is not None:
+            value = self._slot_term(slot)
+            if value is not None:
+                out.append(value)
+        if self._po is not None and predicate in self._po:
+            out.extend(self._po[predicate])
+        return out
+
+    def _predicate_objects(self):
+        for predicate, slot in self._slot_predicates.items():
+            value = self._slot_term(slot)
+            if value is not None:
+                yield predicate, value
+        if self._po is not None:
+            for predicate, objs in self._po.items():
+                for obj in objs:
+                    yield predicate, obj
+
+    def _add_po(self, predicate, obj):
+        slot = self._slot_predicates.get(predicate)
+        if slot is not None:
+            if getattr(self, slot) is None:
+                object.__setattr__(self, slot, self._slot_value(slot, obj))
+                self._changed()
+                instrumentation = _instrumentation.get()
+                if instrumentation is not None:
+                    instrumentation.count('triples_added')
+                return
+            elif self._slot_term(slot) == obj:
+                return
+        if self._po is None:
+            self._po = dict()
+        objs = self._po.setdefault(predicate, [])
+        if obj not in objs:
+            objs.append(obj)
+            self._changed()
+            instrumentation = _instrumentation.get()
+            if instrumentation is not None:
+                instrumentation.count('triples_added')
+
+    def _remove_po(self, predicate, obj=None):
+        changed = False
+        slot = self._slot_predicates.get(predicate)
+        if slot is not None and getattr(self, slot) is not None and \
+                (obj is None or self._slot_term(slot) == obj):
+            object.__setattr__(self, slot, None)
+            changed = True
+        if self._po is not None and predicate in self._po:
+            if obj is None:
+                del self._po[predicate]
+                changed = True
+            else:
+                objs = self._po[predicate]
+                if obj in objs:
+                    objs.remove(obj)
+                    changed = True
+                if not objs:
+                    del self._po[predicate]
+        if changed:
+            self._changed()
+
+    # Emulation of the rdflib.Graph API
+
+    def add(self, triple):
+        s, p, o = triple
+        if s == self.uri:
+            self._add_po(p, o)
+        else:
+            if self._extra is None:
+                self._extra = set()
+            if (s, p, o) not in self._extra:
+                self._extra.add((s, p, o))
+                self._changed()
+                instrumentation = _instrumentation.get()
+                if instrumentation is not None:
+                    instrumentation.count('triples_added')
+        return self
+
+    def remove(self, triple):
+        for s, p, o in list(self.triples(triple)):
+            if s == self.uri:
+                self._remove_po(p, o)
+            else:
+                self._extra.discard((s, p, o))
+                self._changed()
+        return self
+
+    def set(self, triple):
+        s, p, o = triple
+        self.remove((s, p, None))
+        return self.add((s, p, o))
+
+    def triples(self, triple):
+        s, p, o = triple
+        if s is None or s == self.uri:
+            if p is not None:
+                pos = ((p, obj) for obj in self._objects(p))
+            else:
+                pos = self._predicate_objects()
+            for pred, obj in pos:
+                if o is None or obj == o:
+                    yield self.uri, pred, obj
+        if self._extra:
+            for t in list(self._extra):
+                if (s is None or t[0] == s) and \
+                        (p is None or t[1] == p) and \
+                        (o is None or t[2] == o):
+                    yield t
+
+    def subjects(self, predicate=None, object=None):
+        for s, p, o in self.triples((None, predicate, object)):
+            yield s
+
+    def predicates(self, subject=None, object=None):
+        for s, p, o in self.triples((subject, None, object)):
+            yield p
+
+    def objects(self, subject=None, predicate=None):
+        for s, p, o in self.triples((subject, predicate, None)):
+            yield o
+
+    def subject_predicates(self, object=None):
+        for s, p, o in self.triples((None, None, object)):
+            yield s, p
+
+    def subject_objects(self, predicate=None):
+        for s, p, o in self.triples((None, predicate, None)):
+            yield s, o
+
+    def predicate_objects(self, subject=None):
+        for s, p, o in self.triples((subject, None, None)):
+            yield p, o
+
+    def value(self, subject=None, predicate=rdflib.RDF.value, object=None,
+              default=None, any=True):
+        if (subject is None and predicate is None) or \
+                (subject is None and object is None) or \
+                (predicate is None and object is None):
+            return None
+        if object is None:
+            values = self.objects(subject, predicate)
+        elif subject is None:
+            values = self.subjects(predicate, object)
+        else:
+            values = self.predicates(subject, object)
+        try:
+            retval = next(values)
+        except StopIteration:
+            return default
+        if any is False:
+            try:
+                next(values)
+            except StopIteration:
+                pass
+            else:
+                raise rdflib.exceptions.UniquenessError(
+                    list(self.triples((subject, predicate, object))))
+        return retval
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            s, p, o = item.start, item.stop, item.step
+            if s is None and p is None and o is None:
+                return self.triples((s, p, o))
+            elif s is None and p is None:
+                return self.subject_predicates(o)
+            elif s is None and o is None:
+                return self.subject_objects(p)
+            elif p is None and o is None:
+                return self.predicate_objects(s)
+            elif s is None:
+                return self.subjects(p, o)
+            elif p is None:
+                return self.predicates(s, o)
+            elif o is None:
+                return self.objects(s, p)
+            else:
+                return (s, p, o) in self
+        elif isinstance(item, rdflib.term.Node):
+            return self.predicate_objects(item)
+        else:
+            raise TypeError('You can only index by a single rdflib term or '
+                            'a slice of rdflib terms.')
+
+    def __iter__(self):
+        return self.triples((None, None, None))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, triple):
+        for _ in self.triples(triple):
+            return True
+        return False
+
+    def __iadd__(self, other):
+        for t in other:
+            self.add(t)
+        return self
+
+    def to_graph(self, graph=None):
+        """
+        Materialize the triples of this record.
+
+        :param graph: `rdflib.Graph` to add the triples to. If `None` a new
+            graph is created.
+        :return: the graph
+        """
+        if graph is None:
+            graph = rdflib.Graph()
+            instrumentation = _instrumentation.get()
+            if instrumentation is not None:
+                instrumentation.count('graphs_created')
+        for t in self:
+            graph.add(t)
+        return graph
+
+    def serialize(self, *args, **kwargs):
+        return self.to_graph().serialize(*args, **kwargs)
+
 
 class NIFAnnotationUnit(RDFGetSetMixin):
+    __slots__ = ()
     nif_classes = (nif_ns.AnnotationUnit,)
 
     def __init__(self, uri: str = None, **kwargs):
@@ -147,23 +683,38 @@ class NIFAnnotationUnit(RDFGetSetMixin):
                 p_uri = p
                 assert isinstance(p_uri, rdflib.URIRef), '{} is not a URIRef'.format(p)
             self.add((self.uri, p_uri, to_rdf_literal(o)))
-        self.add((self.uri, rdflib.RDF.type, nif_ns.AnnotationUnit))
+        self.add_nif_classes()
+
+    def copy(self, uri=None):
+        """
+        :param uri: URI of the copy, a new BNode by default
+        :return: a new unit with the same triples as this one
+        """
+        out = self.__copy__()
+        out.uri = rdflib.BNode() if uri is None else uri
+        return out
 
     def validate(self):
         return True
 
 
 class NIFString(RDFGetSetMixin):
+    __slots__ = ('_begin', '_end', 'reference_context')
     nif_classes = tuple()
+    _slot_predicates = {nif_ns.beginIndex: '_begin',
+                        nif_ns.endIndex: '_end'}
+    _int_slots = frozenset(('_begin', '_end'))
 
     def __init__(self,
                  begin_end_index,
+                 validate=True,
                  **kwargs):
         """
         The base abstract class.
 
         :param begin_end_index: tuple (begin_index, end_index). If `None` then
             begin_index = 0. see http://persistence.uni-leipzig.org/nlp2rdf/ontologies/nif-core/nif-core.html#d4e436
+        :param validate: if False the setting of `kwargs` is not validated
         :param **kwargs: any additional (predicate, object) pairs
         """
         super().__init__()
@@ -173,17 +724,22 @@ class NIFString(RDFGetSetMixin):
             raise ValueError(
                 'begin_end_index should be convertible to integers, '
                 '{} provided'.format(begin_end_index))
-        self.reference_context = None  # this holds a separate graph
-        self.__setattr__('nif__begin_index', begin_end_index[0], validate=False,
-                         datatype=rdflib.XSD.nonNegativeInteger)
-        self.__setattr__('nif__end_index', begin_end_index[1], validate=False,
-                         datatype=rdflib.XSD.nonNegativeInteger)
+        self.reference_context = None  # this holds a separate record
+        self._begin, self._end = begin_end_index
         for key, val in kwargs.items():
-            self.__setattr__(key, val)
+            self.__setattr__(key, val, validate=validate)
         self.add_nif_classes()
 
+    @property
+    def begin_end_index(self):
+        """
+        :return: tuple (begin_index, end_index) of ints
+        """
+        return _offset_int(self._begin), _offset_int(self._end)
+
 
 class NIFOffsetBasedString(NIFString):
+    __slots__ = ()
     nif_classes = tuple()
 
     def __init__(self,
@@ -201,18 +757,18 @@ class NIFOffsetBasedString(NIFString):
             `http://example.doc#char=0,100`.
         :param **kwargs: any additional (predicate, object) pairs
         """
-        assert uri_scheme in [nif_ns.ContextHashBasedString,
-                              nif_ns.RFC5147String, nif_ns.CStringInst,
-                              nif_ns.OffsetBasedString]
-        self.nif_classes = list(self.nif_classes)
-        self.nif_classes.append(uri_scheme)
-        self.nif_classes = tuple(self.nif_classes)
+        assert uri_scheme in _uri_schemes
         self.uri = do_suffix_offset(uri_prefix, *begin_end_index)
         super().__init__(begin_end_index, **kwargs)
+        self._add_po(_rdf_type, uri_scheme)
 
 
 class NIFAnnotation(NIFOffsetBasedString):
+    __slots__ = ('_anchor', '_ref_uri', 'annotation_units')
     nif_classes = (nif_ns.Annotation,)
+    _slot_predicates = dict(NIFOffsetBasedString._slot_predicates)
+    _slot_predicates.update({nif_ns.anchorOf: '_anchor',
+                             nif_ns.referenceContext: '_ref_uri'})
 
     def __init__(self,
                  begin_end_index,
@@ -220,6 +776,7 @@ class NIFAnnotation(NIFOffsetBasedString):
                  anchor_of=None,
                  annotation_units: List[NIFAnnotationUnit] = None,
                  uri_scheme=nif_ns.OffsetBasedString,
+                 validate=True,
                  **kwargs):
         """
         A class to store NIF annotation block for a single entity. Hence,
@@ -234,96 +791,186 @@ class NIFAnnotation(NIFOffsetBasedString):
             `http://example.doc#char=0,100`.
             :note: Only used if reference context is not given.
         :param anchor_of: see http://persistence.uni-leipzig.org/nlp2rdf/ontologies/nif-core/nif-core.html#d4e395
+            If it is `CONTEXT_ANCHOR`, or a plain string equal to the span
+            of the reference context, the anchor is not copied but read from
+            the context when needed.
+        :param validate: if False the annotation is not validated at all,
+            e.g. because the whole batch is validated by `NIFDocument`
         :param **kwargs: any additional (predicate, object) pairs
         """
         uri_prefix = reference_context.uri
         super().__init__(begin_end_index=begin_end_index,
                          uri_prefix=uri_prefix,
                          uri_scheme=uri_scheme,
+                         validate=validate,
                          **kwargs)
         assert reference_context is not None
         self.reference_context = reference_context
         self.__setattr__('nif__reference_context', reference_context.uri,
                          validate=False)
-        if anchor_of is not None:
+        if anchor_of is CONTEXT_ANCHOR or self._spans_context(anchor_of):
+            object.__setattr__(self, '_anchor', CONTEXT_ANCHOR)
+        elif anchor_of is not None:
             self.__setattr__('nif__anchor_of', anchor_of, validate=False)
 
         self.annotation_units = dict()
         if annotation_units is not None:
             for au in annotation_units:
-                self.add_annotation_unit(au)
-        self.validate()
+                self.add_annotation_unit(au, validate=False)
+        if validate:
+            self.validate()
 
     @staticmethod
     def is_annotation(cxt):
         return isinstance(cxt, NIFAnnotation)
 
-    def add_annotation_unit(self, au: NIFAnnotationUnit):
-        self.addattr('nif__annotation_unit', au.uri)
+    def _spans_context(self, anchor):
+        if not isinstance(anchor, str) or isinstance(anchor, rdflib.Literal) \
+                and (anchor.language or anchor.datatype):
+            return False
+        text = getattr(self.reference_context, 'text', None)
+        begin, end = self.begin_end_index
+        return text is not None and 0 <= begin <= end and \
+            len(anchor) == end - begin and text.startswith(anchor, begin)
+
+    def _context_anchor(self):
+        begin, end = self.begin_end_index
+        return rdflib.Literal(self.reference_context.text[begin:end])
+
+    def _remove_po(self, predicate, obj=None):
+        # the anchor read from the context must not follow new offsets
+        if self._anchor is CONTEXT_ANCHOR and \
+                self._slot_predicates.get(predicate) in self._int_slots:
+            object.__setattr__(self, '_anchor', self._context_anchor())
+        super()._remove_po(predicate, obj)
+
+    def _explicit_anchors(self):
+        """
+        :return: list of the anchors not read from the context
+        """
+        anchor = self._anchor
+        out = [] if anchor is None or anchor is CONTEXT_ANCHOR else [anchor]
+        if self._po is not None:
+            out.extend(self._po.get(_anchor_of, ()))
+        return out
+
+    def add_annotation_unit(self, au: NIFAnnotationUnit, validate=True):
+        self.addattr('nif__annotation_unit', au.uri, validate=validate)
         self.annotation_units[au.uri] = au
+        au._watchers = self._watchers
 
-    def remove_annotation_unit(self, au_uri: str):
-        self.delattr('nif__annotation_unit', au_uri)
-        del self.annotation_units[au_uri]
+    def __copy__(self):
+        """
+        :return: a copy with copied annotation units and the same reference
+            context
+        """
+        out = super().__copy__()
+        out.annotation_units = {uri: au.__copy__()
+                                for uri, au in self.annotation_units.items()}
+        return out
+
+    def copy_to(self, context, offset=0):
+        """
+        Copy of the annotation referring to `context` where the text of the
+        annotation starts `offset` characters later (earlier if negative),
+        e.g. to move annotations between a document and a window of it. The
+        URI is regenerated from the new offsets and the blank node units get
+        new blank nodes. Not validated.
+
+        :param NIFContext context: the new reference context
+        :return: NIFAnnotation of the same class
+        """
+        out = super().__copy__()
+        begin, end = self.begin_end_index
+        object.__setattr__(out, '_begin', begin + offset)
+        object.__setattr__(out, '_end', end + offset)
+        object.__setattr__(out, '_ref_uri', context.uri)
+        out.uri = do_suffix_offset(context.uri, begin + offset, end + offset)
+        out.reference_context = context
+        out.annotation_units = dict()
+        out._remove_po(nif_ns.annotationUnit)
+        for au in self.annotation_units.values():
+            out.add_annotation_unit(
+                au.copy(uri=None if isinstance(au.uri, rdflib.BNode)
+                        else au.uri), validate=False)
+        return out
+
+    def remove_annotation_unit(self, au_uri: str, validate=True):
+        self.delattr('nif__annotation_unit', au_uri, validate=validate)
+        au = self.annotation_units.pop(au_uri)
+        au._watchers = None
 
     def validate(self):
+        instrumentation = _instrumentation.get()
+        if instrumentation is not None:
+            instrumentation.count('validations')
         if self.reference_context is not None:
             if not NIFContext.is_context(self.reference_context):
                 raise ValueError(
                     'The provided reference context is not compatible with '
                     'nif.Context class.')
-        if self.nif__is_string is not None:
-            if not isinstance(self.nif__is_string, str):
+        is_string = self.nif__is_string
+        begin, end = self.begin_end_index
+        if is_string is not None:
+            if not isinstance(is_string, str):
                 raise TypeError('is_string value {} should be '
-                                'a string'.format(self.nif__is_string))
-            if int(self.nif__begin_index) != 0 or \
-                    int(self.nif__end_index) != len(self.nif__is_string):
+                                'a string'.format(is_string))
+            if begin != 0 or end != len(is_string):
                 raise ValueError(
                     'Begin and end indices are provided ({}), '
                     'but do not fit the provided string (length = {})'
-                    '.'.format((self.nif__begin_index, self.nif__end_index),
-                               len(self.nif__is_string)))
-        if self.nif__anchor_of is not None:
-            ref_substring = self.reference_context.nif__is_string[
-                            int(self.nif__begin_index):int(self.nif__end_index)]
-            # Extractor returns different capitalization in matches!
-            if self.nif__anchor_of.toPython().lower() != ref_substring.lower():
+                    '.'.format((begin, end), len(is_string)))
+        if self._anchor is None:
+            return
+        text = self.reference_context.text
+        if self._anchor is CONTEXT_ANCHOR and \
+                not 0 <= begin <= end <= len(text):
+            raise ValueError(
+                'The indices {} do not fit the reference context of length '
+                '{}.'.format((begin, end), len(text)))
+        for anchor_of in self._explicit_anchors():
+            if not _anchor_fits(anchor_of, text, begin, end):
                 raise ValueError(
                     'Anchor should be equal exactly to the subtring of '
                     'the reference context. You have anchor = "{}", '
                     'substring in ref context = "{}"'.format(
-                        self.nif__anchor_of, ref_substring))
+                        anchor_of, text[begin:end]))
 
     @classmethod
     def from_triples(cls, rdf_graph, ref_cxt,
-                     uri_scheme=nif_ns.OffsetBasedString):
+                     uri_scheme=nif_ns.OffsetBasedString, validate=True):
         kwargs = dict()
-        other_triples = rdflib.Graph()
+        other_triples = []
+        begin_ref, end_ref = nif_ns.beginIndex, nif_ns.endIndex
+        ref_cxt_ref, anchor_ref = nif_ns.referenceContext, nif_ns.anchorOf
         for s, p, o in rdf_graph:
-            if p == nif_ns.beginIndex:
+            if p == begin_ref:
                 kwargs['begin_index'] = int(o.toPython())
-            elif p == nif_ns.endIndex:
+            elif p == end_ref:
                 kwargs['end_index'] = int(o.toPython())
-            elif p == nif_ns.referenceContext:
+            elif p == ref_cxt_ref:
                 ref_cxt_uriref = o
                 assert ref_cxt_uriref == ref_cxt.uri, \
                     (ref_cxt_uriref, ref_cxt.uri)
-            elif p == nif_ns.anchorOf:
+            elif p == anchor_ref:
                 kwargs['anchor_of'] = o.toPython()
                 # pass
             else:
-                other_triples.add((s, p, o))
+                other_triples.append((s, p, o))
         # kwargs['anchor_of'] = ref_cxt.nif__is_string[kwargs['begin_index']:kwargs['end_index']]
         kwargs['begin_end_index'] = kwargs['begin_index'], kwargs['end_index']
         del kwargs['begin_index']
         del kwargs['end_index']
-        out = cls(reference_context=ref_cxt, **kwargs)
+        out = cls(reference_context=ref_cxt, validate=validate, **kwargs)
         out += other_triples
         return out
 
 
 class NIFContext(NIFString):
+    __slots__ = ('_is_string', '_text')
     nif_classes = (nif_ns.Context, )
+    _slot_predicates = dict(NIFString._slot_predicates)
+    _slot_predicates[nif_ns.isString] = '_is_string'
 
     def __init__(self, uri, is_string):
         """
@@ -337,6 +984,19 @@ class NIFContext(NIFString):
             begin_end_index=begin_end_index)
         self.__setattr__('nif__is_string', is_string, False)
 
+    @property
+    def text(self):
+        """
+        :return: the context string as a plain `str`, shared by the
+            annotations instead of slicing the literal
+        """
+        return None if self._is_string is None else self._text
+
+    def _slot_value(self, slot, obj):
+        if slot == '_is_string':
+            object.__setattr__(self, '_text', str.__str__(obj))
+        return super()._slot_value(slot, obj)
+
     def validate(self):
         return True
 
@@ -349,10 +1009,10 @@ class NIFContext(NIFString):
                      ref_cxt=None,
                      uri_scheme=nif_ns.OffsetBasedString):
         kwargs = dict()
-        other_triples = rdflib.Graph()
+        other_triples = []
         for s, p, o in rdf_graph:
             if s != context_uri:
-                other_triples.add((s, p, o))
+                other_triples.append((s, p, o))
             elif p == nif_ns.isString:
                 if 'is_string' in kwargs:
                     raise ValueError('{} found twice. {}, {}'.format(p, kwargs, o.toPython()))
@@ -360,7 +1020,7 @@ class NIFContext(NIFString):
                 uri = s.toPython()
                 assert str(uri) == str(context_uri)
             else:
-                other_triples.add((s, p, o))
+                other_triples.append((s, p, o))
 
         out = cls(uri=context_uri, **kwargs)
         out += other_triples
@@ -368,14 +1028,22 @@ class NIFContext(NIFString):
 
 
 class NIFExtractedEntity(NIFAnnotation):
+    __slots__ = ()
+
     def __init__(self, reference_context, begin_end_index, anchor_of,
-                 entity_uri, au_kwargs=None, **kwargs):
-        if au_kwargs is not None:
+                 entity_uri, au_kwargs=None, au=None, **kwargs):
+        """
+        :param au: the annotation unit of the entity. By default it is
+            created from `entity_uri` and `au_kwargs`.
+        """
+        if au is not None:
+            pass
+        elif au_kwargs is not None:
             au = NIFAnnotationUnit(
-                itsrdf__ta_ident_ref=rdflib.URIRef(entity_uri), **au_kwargs)
+                itsrdf__ta_ident_ref=terms.uri_ref(entity_uri), **au_kwargs)
         else:
             au = NIFAnnotationUnit(
-                itsrdf__ta_ident_ref=rdflib.URIRef(entity_uri))
+                itsrdf__ta_ident_ref=terms.uri_ref(entity_uri))
         super().__init__(
             reference_context=reference_context,
             begin_end_index=begin_end_index, anchor_of=anchor_of,
@@ -383,6 +1051,22 @@ class NIFExtractedEntity(NIFAnnotation):
             **kwargs)
 
 
+def _template(template, au_kwargs, kwargs):
+    """
+    :return: `template`, or a new template of `au_kwargs` and `kwargs`
+    """
+    if template is None:
+        from nif.template import AnnotationTemplate
+        return AnnotationTemplate(au_kwargs=au_kwargs, **kwargs)
+    elif au_kwargs or kwargs:
+        raise ValueError('Either a template or the (predicate, object) pairs '
+                         'of the annotations can be given, not both.')
+    return template
+
+
+_begin_end_index = operator.attrgetter('begin_end_index')
+
+
 class NIFDocument:
     def __init__(self, context: NIFContext, annotations: List[NIFAnnotation] = None):
         if not NIFContext.is_context(context):
@@ -391,46 +1075,148 @@ class NIFDocument:
         self.context = context
         self.uri_prefix = str(context.uri)
         self.annotations = []
+        self.spans = SpanIndex(key=_begin_end_index)
+        self._rdf = None
+        self._structure = None
+        self._reset_fingerprint()
+        self._ref = weakref.ref(self)
+        context._watch(self._ref)
         if annotations is not None:
-            for ann in annotations:
-                self.add_annotations([ann])
-        self.validate()
-        # self._rdf = None
+            self.add_annotations(annotations)
 
     def validate(self):
-        for ann in self.annotations:
-            if not NIFAnnotation.is_annotation(ann):
-                raise TypeError('The provided structure {} is not a '
-                                'NIFStructure.'.format(ann))
-            if ann.nif__reference_context != self.context.uri:
-                raise ValueError('The reference context {} for the structure {}'
-                                 ' is different from the context {} of the '
-                                 'document.'.format(
-                                     ann.nif__reference_context,
-                                     ann.uri, self.context.uri))
+        self.validate_annotations(self.annotations)
+
+    @_timed('validate')
+    def validate_annotations(self, anns):
+        """
+        Check `anns` against the context of the document in a single pass
+        over the annotation records.
+
+        :raise TypeError: if some of `anns` are not NIFAnnotations
+        :raise ValueError: if some of `anns` do not fit the context. The
+            message lists all the failing annotations.
+        """
+        text = self.context.text
+        instrumentation = _instrumentation.get()
+        if instrumentation is not None:
+            instrumentation.count('validations', len(anns))
+        errors = []
+        for ann in anns:
+            error = self._annotation_error(ann, text)
+            if error is not None:
+                errors.append(error)
+        if len(errors) == 1:
+            raise errors[0]
+        elif errors:
+            exc_type = TypeError if any(isinstance(e, TypeError)
+                                        for e in errors) else ValueError
+            raise exc_type('{} of {} annotations are invalid:\n{}'.format(
+                len(errors), len(anns), '\n'.join(str(e) for e in errors)))
+
+    def _annotation_error(self, ann, text):
+        if not NIFAnnotation.is_annotation(ann):
+            return TypeError('The provided structure {} is not a '
+                             'NIFStructure.'.format(ann))
+        ref_cxts = ann._objects(_reference_context)
+        if ref_cxts != [self.context.uri]:
+            return ValueError('The reference context {} for the structure {}'
+                              ' is different from the context {} of the '
+                              'document.'.format(
+                                  ref_cxts, ann.uri, self.context.uri))
+        begin, end = ann.begin_end_index
+        if begin is None or end is None or \
+                not 0 <= begin <= end <= len(text):
+            return ValueError('The indices {} of the structure {} do not fit '
+                              'the context of length {}.'.format(
+                                  (begin, end), ann.uri, len(text)))
+        for anchor in ann._explicit_anchors():
+            if not _anchor_fits(anchor, text, begin, end):
+                return ValueError(
+                    'Anchor of {} should be equal exactly to the subtring of '
+                    'the reference context. You have anchor = "{}", '
+                    'substring in ref context = "{}"'.format(
+                        ann.uri, anchor, text[begin:end]))
+        return None
 
     @classmethod
     def from_text(cls, text, uri="http://example.doc/" + str(uuid.uuid4())):
         cxt = NIFContext(is_string=text, uri=uri)
         return cls(context=cxt, annotations=[])
 
-    def add_annotations(self, anns: List[NIFAnnotation]):
+    @classmethod
+    def from_spans(cls, context, spans, au_kwargs=None, template=None,
+                   **kwargs):
+        """
+        Bulk construction of a document: the annotations are created without
+        any intermediate validation and are validated once, all together.
+
+        :param NIFContext context: the context of the document
+        :param spans: iterable of (begin, end) or (begin, end, entity_uri)
+            tuples. The anchors are taken from the context. If `entity_uri`
+            is given a `NIFExtractedEntity` is created.
+        :param au_kwargs: additional (predicate, object) pairs of the
+            annotation units of the extracted entities
+        :param template: `nif.template.AnnotationTemplate` of the
+            annotations, instead of `au_kwargs` and `kwargs`
+        :param **kwargs: additional (predicate, object) pairs of every
+            annotation
+        :return: NIFDocument
+        """
+        template = _template(template, au_kwargs, kwargs)
+        anns = [template.annotation(
+                    context, int(span[0]), int(span[1]),
+                    span[2] if len(span) > 2 else None)
+                for span in spans]
+        return cls(context=context, annotations=anns)
+
+    @_timed('add_annotations')
+    def add_annotations(self, anns: List[NIFAnnotation], validate=True):
+        """
+        :param validate: if False `anns` are trusted to fit the context
+        :return: self
+        """
+        anns = list(anns)
+        if validate:
+            self.validate_annotations(anns)
+        self.annotations.extend(anns)
         for ann in anns:
-            self.annotations.append(ann)
-        try:
-            self.validate()
-        except (ValueError, TypeError) as e:
-            for _ in range(len(anns)):
-                self.annotations.pop()
-            raise e
-        # else:
-            # self.rdf += ann
+            self.spans.add(*ann.begin_end_index, ann)
+            ann._watch(self._ref)
+            for au in ann.annotation_units.values():
+                au._watchers = ann._watchers
+            if self._rdf is not None:
+                self._add_to_rdf(ann)
+            if self._fp_total is not None:
+                self._fp_dirty[id(ann)] = ann
+        return self
+
+    def remove_annotations(self, anns: List[NIFAnnotation]):
+        """
+        Remove `anns` (compared by identity) from the document.
+
+        :return: self
+        """
+        to_remove = {id(ann) for ann in anns}
+        kept, removed = [], []
+        for ann in self.annotations:
+            if id(ann) in to_remove:
+                ann._unwatch(self._ref)
+                self._fp_forget(ann)
+                removed.append(ann)
+            else:
+                kept.append(ann)
+        self.annotations = kept
+        self.spans.remove_all(removed)
+        if self._rdf is not None and removed:
+            self._remove_from_rdf(removed)
         return self
 
     def add_extracted_entities(self, ees):
         self.add_annotations(ees)
 
-    def add_extracted_cpts(self, cpt_dicts, au_kwargs=None, **kwargs):
+    def add_extracted_cpts(self, cpt_dicts, au_kwargs=None, template=None,
+                           **kwargs):
         """
         :param cpt_dict: expected to have 'uri',
             'matchings'-> [{'text': value,
@@ -438,85 +1224,422 @@ class NIFDocument:
                            ...]
         :return: self
         """
-        ees = []
-        for i, cpt_dict in enumerate(cpt_dicts):
+        entity_uris, begins, ends = [], [], []
+        for cpt_dict in cpt_dicts:
             cpt_uri = cpt_dict['uri']
             for matches in cpt_dict['matchings']:
                 for match in matches['positions']:
-                    surface_form = self.context.nif__is_string[match[0]:match[1]]
-                    ee = NIFExtractedEntity(
-                        reference_context=self.context,
-                        begin_end_index=(match[0], match[1]),
-                        anchor_of=surface_form,
-                        entity_uri=cpt_uri,
-                        au_kwargs=au_kwargs,
-                        **kwargs
-                    )
-                    ees.append(ee)
+                    entity_uris.append(cpt_uri)
+                    begins.append(match[0])
+                    ends.append(match[1])
+        return self.add_extracted_positions(entity_uris, begins, ends,
+                                            au_kwargs=au_kwargs,
+                                            template=template, **kwargs)
+
+    @_timed('add_extracted_positions')
+    def add_extracted_positions(self, entity_uris, begins, ends,
+                                au_kwargs=None, stats=None, template=None,
+                                **kwargs):
+        """
+        Bulk ingestion of the output of an extractor given as parallel
+        sequences. The extra (predicate, object) pairs are resolved once
+        into a `nif.template.AnnotationTemplate` instantiated for each
+        position, the anchors are read from the context and the whole batch
+        is validated once.
+
+        :param entity_uris: entity URI of every position, or a single URI
+            for all of them
+        :param begins: begin indices, any sequence of ints, e.g. a list, an
+            `array.array` or a numpy array
+        :param ends: end indices
+        :param au_kwargs: additional (predicate, object) pairs of the
+            annotation units
+        :param dict stats: if given it is updated with the number of
+            `positions`, the `seconds` spent and `positions_per_second`
+        :param template: `nif.template.AnnotationTemplate` of the
+            annotations, instead of `au_kwargs` and `kwargs`
+        :param **kwargs: additional (predicate, object) pairs of every
+            annotation
+        :return: self
+        """
+        start = time.perf_counter()
+        template = _template(template, au_kwargs, kwargs)
+        ees = template.annotations(self.context, entity_uris, begins, ends)
         self.add_extracted_entities(ees)
+        if stats is not None:
+            seconds = time.perf_counter() - start
+            stats.update(positions=len(ees), seconds=seconds,
+                         positions_per_second=len(ees) / seconds
+                         if seconds else None)
         return self
 
+    def to_columnar(self):
+        """
+        :return: `nif.columnar.ColumnarAnnotations` holding the annotations
+        """
+        from nif.columnar import ColumnarAnnotations
+        return ColumnarAnnotations.from_document(self)
+
+    @classmethod
+    def from_columnar(cls, columnar):
+        """
+        :param nif.columnar.ColumnarAnnotations columnar:
+        :return: NIFDocument
+        """
+        return columnar.to_document(document_class=cls)
+
+    def save(self, path):
+        """
+        Write the document to `path` in the binary format of `nif.store`.
+
+        :return: the number of bytes written
+        """
+        from nif import store
+        return store.save(self, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Read a document written by `save`. Use `nif.store.DocumentStore` to
+        read single annotations without loading the whole document.
+
+        :param mmap: if True the file is memory-mapped rather than read
+        :return: NIFDocument
+        """
+        from nif.store import DocumentStore
+        with DocumentStore(path, mmap=mmap) as store:
+            return store.document(document_class=cls)
+
+    @classmethod
+    def merge(cls, *docs, policy='all', annotators=None, validate=True):
+        """
+        Merge documents of the same context string, e.g. the outputs of
+        several extractors. The annotations with the same span are merged
+        into one annotation, see `nif.merge` for the policies selecting
+        their annotation units.
+
+        :param policy: 'all', 'confidence', 'annotator' or a function taking
+            the list of the annotation units of a span and returning the
+            units to keep
+        :param annotators: preferred annotators, for the 'annotator' policy
+        :return: a new NIFDocument
+        """
+        from nif import merge
+        return merge.merge(docs, policy=policy, annotators=annotators,
+                           document_class=cls, validate=validate)
+
+    def diff(self, other):
+        """
+        Difference from this document to `other`, a later version of it,
+        computed span by span, see `nif.diff`. E.g. `doc.diff(other)
+        .to_sparql()` updates a triple store holding `doc` to `other`.
+
+        :param NIFDocument other: document with the same context URI
+        :return: `nif.diff.DocumentDiff`
+        """
+        from nif import diff
+        return diff.diff(self, other)
+
+    @property
+    def structure(self):
+        """
+        The paragraphs, sentences and words of the context, see
+        `nif.structure.Segmentation`. Created empty on the first access.
+        """
+        if self._structure is None:
+            from nif.structure import Segmentation
+            self._structure = Segmentation(self.context, document=self)
+            if self._fp_total is not None:
+                self._fp_dirty[id(self._structure)] = self._structure
+        return self._structure
+
     @property
     def rdf(self):
-        # if self._rdf is None:
-        _rdf = self.context
+        """
+        The merged graph of the context, the annotations and their units.
+        It is built on the first access and then kept up to date: added
+        annotations are merged into it and removed ones are taken out of it,
+        any other change of the records makes it rebuilt on the next access.
+        The graph is shared, change the records rather than the graph.
+        """
+        if self._rdf is None:
+            self._rdf = self._build_rdf()
+        return self._rdf
+
+    @_timed('rdf')
+    def _build_rdf(self):
+        _rdf = self.context.to_graph()
         for ann in self.annotations:
-            _rdf += ann
-            for au in ann.annotation_units.values():
-                _rdf += au
-        # self._rdf = _rdf
+            self._add_to_rdf(ann, _rdf)
+        if self._structure is not None:
+            for triple in self._structure:
+                _rdf.add(triple)
         return _rdf
 
+    def _add_to_rdf(self, ann, graph=None):
+        graph = self._rdf if graph is None else graph
+        ann.to_graph(graph)
+        for au in ann.annotation_units.values():
+            au.to_graph(graph)
+
+    def _remove_from_rdf(self, anns):
+        """
+        Remove the triples of the removed `anns` and of their units from the
+        merged graph, but the ones still held by the context or by the
+        remaining annotations and units, e.g. an annotation with the same
+        span.
+        """
+        if self._structure is not None and any(
+                layer.index_of(*ann.begin_end_index) is not None
+                for ann in anns for layer in self._structure.layers):
+            # a structure shares the URI of an annotation
+            self._rdf = None
+            return
+        triples = set()
+        for ann in anns:
+            for record in (ann,) + tuple(ann.annotation_units.values()):
+                triples.update(record.triples((None, None, None)))
+        subjects = {s for s, _, _ in triples}
+        for s in subjects:
+            triples.difference_update(self.context.triples((s, None, None)))
+        for ann in self.annotations:
+            for record in (ann,) + tuple(ann.annotation_units.values()):
+                if record.uri in subjects or record._extra:
+                    triples.difference_update(
+                        record.triples((None, None, None)))
+        for triple in triples:
+            self._rdf.remove(triple)
+
+    def _record_changed(self, record):
+        self._rdf = None
+        if NIFAnnotation.is_annotation(record):
+            # its offsets may have changed
+            self.spans.move(record)
+        self._fp_forget(record, keep=True)
+
+    @property
+    @_timed('fingerprint')
+    def fingerprint(self):
+        """
+        Canonical digest of the triples of the document: it does not depend
+        on the order of the annotations nor on the ids of the blank nodes,
+        see `nif.fingerprint`. Like the graph, it is a set of triples: an
+        annotation added twice, or a unit shared by several annotations, is
+        counted once. The digests of every record are computed once and the
+        document digest is kept up to date on changes, so only the records
+        changed since the last access are hashed again.
+
+        :return: hex string
+        """
+        if self._fp_total is None:
+            self._fp_total = 0
+            self._fp_dirty = {id(r): r for r in [self.context] +
+                              self.annotations}
+            if self._structure is not None:
+                self._fp_dirty[id(self._structure)] = self._structure
+        for key, record in self._fp_dirty.items():
+            triples = list(record)
+            if NIFAnnotation.is_annotation(record):
+                for au in record.annotation_units.values():
+                    triples.extend(au)
+                    self._fp_owners[id(au)] = record
+            part = triple_digests(triples)
+            self._fp_parts[key] = part
+            for digest in part:
+                if not self._fp_counts[digest]:
+                    self._fp_total += digest
+                self._fp_counts[digest] += 1
+        self._fp_dirty = dict()
+        return format_fingerprint(self._fp_total)
+
+    def _reset_fingerprint(self):
+        self._fp_total = None
+        self._fp_parts = dict()  # id(record) -> digests of its triples
+        self._fp_counts = Counter()  # digest -> number of records with it
+        self._fp_dirty = dict()  # id(record) -> record to be hashed
+        self._fp_owners = dict()  # id(unit) -> annotation
+
+    def _fp_forget(self, record, keep=False):
+        """
+        Subtract the digests of `record` (or of the annotation owning it)
+        and rehash it on the next access if `keep`.
+        """
+        if self._fp_total is None:
+            return
+        record = self._fp_owners.get(id(record), record)
+        key = id(record)
+        if key in self._fp_parts:
+            for digest in self._fp_parts.pop(key):
+                self._fp_counts[digest] -= 1
+                if not self._fp_counts[digest]:
+                    del self._fp_counts[digest]
+                    self._fp_total -= digest
+            if keep:
+                self._fp_dirty[key] = record
+        elif not keep:
+            self._fp_dirty.pop(key, None)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_ref']
+        state['_rdf'] = None
+        # the digests are kept by id
+        for key in ('_fp_total', '_fp_parts', '_fp_counts', '_fp_dirty',
+                    '_fp_owners'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_fingerprint()
+        self._ref = weakref.ref(self)
+        self.context._watch(self._ref)
+        self.__dict__.setdefault('_structure', None)
+        if self._structure is not None:
+            self._structure._document_ref = self._ref
+        for ann in self.annotations:
+            ann._watch(self._ref)
+            for au in ann.annotation_units.values():
+                au._watchers = ann._watchers
+
+    @_timed('serialize')
     def serialize(self, format="xml",
                   # uri_format=nif_ns.OffsetBasedString
+                  fast=True,
                   **kwargs
                   ):
+        """
+        :param format: any rdflib format. JSON-LD is written directly by
+            `nif.jsonld.serialize` unless `fast` is False, `kwargs` are then
+            passed to it (`context`, `indent`, `encoding`).
+        :param **kwargs: passed to `rdflib.Graph.serialize`
+        """
+        if fast and format in writer.JSONLD_FORMATS:
+            from nif import jsonld
+            return jsonld.serialize(self, **kwargs)
         rdf_text = self.rdf.serialize(format=format, **kwargs)
         return rdf_text
 
+    def iter_serialize(self, format='nt'):
+        """
+        Serialize the document chunk by chunk walking the context and the
+        annotations directly, the merged graph is never built.
+
+        :param format: 'nt' (one triple per chunk), 'ttl' (one subject
+            block per chunk) or 'json-ld' (one annotation per chunk)
+        :return: generator over text chunks
+        """
+        return writer.iter_serialize(self, format=format)
+
+    @_timed('write_to')
+    def write_to(self, fileobj, format='nt', encoding='utf-8'):
+        """
+        Stream the serialization of the document to a text or binary file
+        object, e.g. an open file or `socket.makefile('wb')`.
+
+        :param format: see `iter_serialize`
+        :return: the number of chunks written
+        """
+        return writer.write_to(self, fileobj, format=format,
+                               encoding=encoding)
+
+    async def aserialize(self, format="xml", executor=None, **kwargs):
+        """
+        `serialize` run in an executor, see `nif.aio`.
+        """
+        from nif import aio
+        return await aio.serialize(self, format=format, executor=executor,
+                                   **kwargs)
+
+    def aiter_serialize(self, format='nt', batch_size=1000, executor=None):
+        """
+        :return: async generator over the chunks of `iter_serialize`, see
+            `nif.aio.iter_serialize`
+        """
+        from nif import aio
+        return aio.iter_serialize(self, format=format, batch_size=batch_size,
+                                  executor=executor)
+
+    async def awrite_to(self, writer, format='nt', encoding='utf-8',
+                        batch_size=1000, executor=None):
+        """
+        Stream the serialization of the document to an asyncio writer, see
+        `nif.aio.write_to`.
+
+        :return: the number of chunks written
+        """
+        from nif import aio
+        return await aio.write_to(self, writer, format=format,
+                                  encoding=encoding, batch_size=batch_size,
+                                  executor=executor)
+
     @classmethod
-    def parse_rdf(cls, rdf_text, format="n3", context_class=nif_ns.Context):
-        rdf_graph = rdflib.Graph()
-        rdf_graph.parse(data=rdf_text, format=format)
-
-        context_uri = rdf_graph.value(predicate=rdflib.RDF.type,
-                                      object=context_class)
-        if context_uri is None:
-            raise ValueError(f'Provided RDF: \n{rdf_graph[:]}\n does not contain a context of class {context_class}.')
-        context_triples = list(rdf_graph.triples((context_uri, None, None)))
-        for t in context_triples:
-            if isinstance(t[2], rdflib.BNode):
-                context_triples += list(rdf_graph.triples((t[2], None, None)))
-        context = NIFContext.from_triples(context_triples,
-                                          context_uri=context_uri)
-
-        annotations = []
-        # struct_uris = list(rdf_graph[:nif_ns.referenceContext:context.uri])
-        struct_uris = (set(rdf_graph[:nif_ns.referenceContext:context.uri]) &
-                       set(rdf_graph[:rdflib.RDF.type:nif_ns.Annotation]))
-        for i, struct_uri in enumerate(struct_uris):
-            struct_triples = rdf_graph.triples((struct_uri, None, None))
-            struct = NIFAnnotation.from_triples(struct_triples, ref_cxt=context)
-            au_uris = list(rdf_graph[struct_uri:nif_ns.annotationUnit:])
-            for au_uri in au_uris:
-                au_dict = {p_uri: o_uri for p_uri, o_uri in rdf_graph[au_uri::]}
-                au = NIFAnnotationUnit(uri=au_uri, **au_dict)
-                struct.add_annotation_unit(au)
-            annotations.append(struct)
-        out = cls(context=context, annotations=annotations)
-
-        for t in rdf_graph - out.rdf:
-            # if t not in out.rdf:
-            out.context.add(t)
+    async def aparse_rdf(cls, rdf_text, format="n3",
+                         context_class=nif_ns.Context, executor=None,
+                         **kwargs):
+        """
+        `parse_rdf` run in an executor, see `nif.aio`.
 
-        return out
+        :param rdf_text: str, bytes or an async iterable of chunks
+        :return: NIFDocument
+        """
+        from nif import aio
+        return await aio.parse_rdf(rdf_text, format=format,
+                                   context_class=context_class,
+                                   document_class=cls, executor=executor,
+                                   **kwargs)
+
+    @classmethod
+    @_timed('parse_rdf')
+    def parse_rdf(cls, rdf_text, format="n3", context_class=nif_ns.Context,
+                  fast=True, lazy=False):
+        """
+        :param format: any rdflib format. N-Triples, Turtle (also if given
+            as n3) and JSON-LD are loaded by the single pass parsers of
+            `nif.parser` and `nif.jsonld` unless `fast` is False; input they
+            do not support falls back to an `rdflib.Graph`.
+        :param context_class: the class of the context node
+        :param lazy: if True a `nif.lazy.LazyDocument` is returned, whose
+            annotations are built and validated when they are accessed
+        :return: NIFDocument
+        """
+        by_subject = None
+        if fast:
+            try:
+                by_subject = parser.parse_by_subject(rdf_text, format=format)
+            except parser.ParseError:
+                pass
+        if by_subject is None:
+            rdf_graph = rdflib.Graph()
+            rdf_graph.parse(data=rdf_text, format=format)
+            by_subject = parser.group_by_subject(rdf_graph)
+        if lazy:
+            from nif.lazy import LazyDocument
+            return LazyDocument(by_subject, context_class=context_class,
+                                document_class=cls)
+        return parser.build_document(by_subject, context_class=context_class,
+                                     document_class=cls)
 
     def __copy__(self):
-        return NIFDocument.parse_rdf(self.serialize(format='n3'))
+        """
+        :return: a document with copies of the context, the annotations and
+            their units
+        """
+        context = self.context.__copy__()
+        anns = []
+        for ann in self.annotations:
+            ann = ann.__copy__()
+            ann.reference_context = context
+            anns.append(ann)
+        out = type(self)(context=context)
+        if self._structure is not None:
+            out._structure = self._structure.copy(context=context,
+                                                  document=out)
+        return out.add_annotations(anns, validate=False)
 
     def __eq__(self, other):
         return isinstance(other, NIFDocument) and \
-               self.serialize(format='n3') == other.serialize(format='n3')
+               self.fingerprint == other.fingerprint
 
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+import os
+import traceback
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, \
+    as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from nif.annotation import NIFDocument, nif_ns
+from nif.columnar import ColumnarAnnotations
+
+
+class BatchResult(namedtuple('BatchResult',
+                             ('index', 'path', 'value', 'error'))):
+    """
+    Outcome of processing a single document of a corpus.
+
+    `index` is the position of the document in the input, `value` is what
+    the processing function returned (a `NIFDocument` is shipped back as
+    `ColumnarAnnotations`, see `document`) and `error` is the formatted
+    traceback if the processing failed, `None` otherwise.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def document(self, document_class=NIFDocument):
+        """
+        :return: the `NIFDocument` returned by the processing function
+        """
+        if isinstance(self.value, ColumnarAnnotations):
+            return self.value.to_document(document_class=document_class)
+        return self.value
+
+
+def _process_one(task):
+    index, path, fn, parse_kwargs = task
+    try:
+        doc = NIFDocument.parse_rdf(Path(path).read_text(encoding='utf-8'),
+                                    **parse_kwargs)
+        value = fn(doc)
+        if isinstance(value, NIFDocument):
+            # much smaller and faster to pickle than the records
+            value = ColumnarAnnotations.from_document(value)
+        return BatchResult(index, path, value, None)
+    except Exception:
+        return BatchResult(index, path, None, traceback.format_exc())
+
+
+def _process_alone(task):
+    # a pool of its own: if it breaks again the document is the culprit
+    executor = ProcessPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(_process_one, task).result()
+    finally:
+        executor.shutdown()
+
+
+def process(paths, fn, workers=None, ordered=True, format='n3',
+            context_class=nif_ns.Context, max_pending=None):
+    """
+    Parse every document of a corpus and apply `fn` to it in a pool of
+    processes.
+
+    A failure (of parsing, of `fn`, of the pickling of its value or of a
+    worker process) is reported in the result of the document and does not
+    stop the batch: a pool broken by a dying process is replaced by a new
+    one for the remaining documents, and the documents that were pending in
+    the broken pool are processed again one at a time, so that only the one
+    killing its process is reported as failed.
+
+    :param paths: iterable of paths of RDF files, consumed lazily
+    :param fn: function `NIFDocument -> value`. Must be picklable, i.e.
+        defined at the top level of a module, and so must be the values. If
+        a `NIFDocument` is returned it is shipped back in the compact
+        `ColumnarAnnotations` form, see `BatchResult.document`.
+    :param workers: number of processes, `os.cpu_count()` by default. If 0
+        the documents are processed one by one in the current process.
+    :param ordered: if True the results are yielded in the input order,
+        otherwise as soon as they are ready
+    :param format: format of the files, see `NIFDocument.parse_rdf`
+    :param context_class: see `NIFDocument.parse_rdf`
+    :param max_pending: maximal number of documents submitted to the pool
+        and not yet yielded, 4 per process by default
+    :return: generator over `BatchResult`
+    """
+    parse_kwargs = dict(format=format, context_class=context_class)
+    tasks = ((i, path, fn, parse_kwargs) for i, path in enumerate(paths))
+    if workers == 0:
+        for task in tasks:
+            yield _process_one(task)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 4 * workers
+    executor = ProcessPoolExecutor(max_workers=workers)
+    # future -> task of its document
+    submitted = dict()
+
+    def submit(task):
+        nonlocal executor
+        try:
+            future = executor.submit(_process_one, task)
+        except BrokenProcessPool:
+            # the futures of the old pool have failed already
+            executor.shutdown(wait=False)
+            executor = ProcessPoolExecutor(max_workers=workers)
+            future = executor.submit(_process_one, task)
+        submitted[future] = task
+        return future
+
+    def result(future):
+        task = submitted.pop(future)
+        try:
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                # maybe killed by another document of the pool
+                return _process_alone(task)
+        except Exception:
+            return BatchResult(task[0], task[1], None, traceback.format_exc())
+
+    try:
+        if ordered:
+            pending = deque()
+            for task in tasks:
+                pending.append(submit(task))
+                if len(pending) >= max_pending:
+                    yield result(pending.popleft())
+            while pending:
+                yield result(pending.popleft())
+        else:
+            pending = set()
+            for task in tasks:
+                pending.add(submit(task))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending,
+                                         return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield result(future)
+            for future in as_completed(pending):
+                yield result(future)
+    finally:
+        executor.shutdown()
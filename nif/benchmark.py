@@ -0,0 +1,299 @@
+"""
+Benchmarks of the main stages of the life of a `NIFDocument` on synthetic
+documents. Only the long standing public API is used, so the same script
+measures older versions of the package as well::
+
+    python -m nif.benchmark --annotations 2000 --output new.json
+    python -m nif.benchmark --compare old.json new.json
+"""
+import argparse
+import inspect
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import rdflib
+
+from nif.annotation import NIFAnnotation, NIFAnnotationUnit, NIFContext, \
+    NIFDocument
+from nif.namespace import eli_ns, lynx_ns, ns_dict
+
+_words = ('madrid', 'europe', 'article', 'decision', 'minister', 'energy',
+          'licence', 'the', 'of', 'and', 'is', 'good', 'city', 'law')
+
+
+def synthetic_text(length, seed=0):
+    """
+    :return: text of about `length` characters made of random words
+    """
+    rnd = random.Random(seed)
+    words = []
+    size = 0
+    while size < length:
+        word = rnd.choice(_words)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)
+
+
+def synthetic_spans(text, n_annotations, seed=0):
+    """
+    :return: sorted list of `n_annotations` distinct word spans of `text`
+        (fewer if the text has less words)
+    """
+    spans = []
+    begin = 0
+    for word in text.split(' '):
+        spans.append((begin, begin + len(word)))
+        begin += len(word) + 1
+    rnd = random.Random(seed)
+    return sorted(rnd.sample(spans, min(n_annotations, len(spans))))
+
+
+def add_metadata(context, n_extra):
+    """
+    Add `n_extra` non-NIF triples about the context, a part of them
+    describing a blank node, in the manner of the Lynx metadata of
+    `examples/aardwamte.nif`.
+    """
+    node = rdflib.BNode()
+    for i in range(n_extra):
+        if i % 4 == 3:
+            context.add((node, rdflib.RDFS.label,
+                         rdflib.Literal('value {}'.format(i), lang='en')))
+        elif i % 4 == 2:
+            context.add((context.uri, eli_ns['related_to'], node))
+        else:
+            context.add((context.uri, lynx_ns['metadata{}'.format(i)],
+                         rdflib.Literal('metadata {}'.format(i))))
+
+
+def synthetic_document(text_length=10000, n_annotations=500,
+                       units_per_annotation=1, n_extra=20, seed=0):
+    """
+    :param text_length: approximate number of characters of the context
+    :param n_annotations: number of annotations, one per word at most
+    :param units_per_annotation: number of annotation units of every
+        annotation
+    :param n_extra: number of non-NIF triples of the context, see
+        `add_metadata`
+    :return: NIFDocument
+    """
+    text = synthetic_text(text_length, seed=seed)
+    context = NIFContext(is_string=text,
+                         uri='http://example.doc/synthetic-{}'.format(seed))
+    add_metadata(context, n_extra)
+    anns = []
+    for begin, end in synthetic_spans(text, n_annotations, seed=seed):
+        units = []
+        for k in range(units_per_annotation):
+            units.append(NIFAnnotationUnit(
+                itsrdf__ta_ident_ref=rdflib.URIRef(
+                    'http://example.com/{}'.format(text[begin:end])),
+                itsrdf__ta_class_ref=lynx_ns['Class{}'.format(k)],
+                itsrdf__ta_annotators_ref='benchmark',
+                itsrdf__ta_confidence=rdflib.Literal(
+                    '0.{}'.format(k + 5), datatype=rdflib.XSD.decimal)))
+        anns.append(NIFAnnotation(begin_end_index=(begin, end),
+                                  reference_context=context,
+                                  anchor_of=text[begin:end],
+                                  annotation_units=units))
+    doc = NIFDocument(context=context)
+    doc.add_annotations(anns)
+    return doc
+
+
+def synthetic_cpts(text, n_annotations, seed=0):
+    """
+    :return: concept dicts as accepted by `NIFDocument.add_extracted_cpts`
+    """
+    by_word = dict()
+    for begin, end in synthetic_spans(text, n_annotations, seed=seed):
+        by_word.setdefault(text[begin:end], []).append((begin, end))
+    return [{'uri': 'http://example.com/{}'.format(word),
+             'matchings': [{'text': word, 'positions': positions}]}
+            for word, positions in by_word.items()]
+
+
+def measure(fn, repeat=3):
+    """
+    :return: dict with the best and the median wall time over `repeat`
+        runs and the peak memory allocated by one more traced run
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'median_seconds': statistics.median(times),
+            'peak_bytes': peak}
+
+
+def rdflib_has_jsonld():
+    """
+    :return: True if rdflib can parse and serialize JSON-LD (rdflib 6 or
+        the rdflib-jsonld plugin)
+    """
+    try:
+        rdflib.plugin.get('json-ld', rdflib.parser.Parser)
+        rdflib.plugin.get('json-ld', rdflib.serializer.Serializer)
+    except (rdflib.plugin.PluginException, ImportError):
+        return False
+    return True
+
+
+def run(text_length=10000, n_annotations=500, units_per_annotation=1,
+        n_extra=20, repeat=3, seed=0, stages=None):
+    """
+    Benchmark the stages `construct`, `add_extracted_cpts`, `validate`,
+    `serialize_turtle`, `serialize_nt`, `parse_turtle`, `serialize_jsonld`
+    and `parse_jsonld`. If rdflib supports JSON-LD the same two stages are
+    run through rdflib as `serialize_jsonld_rdflib` and
+    `parse_jsonld_rdflib`, the latter only if `NIFDocument.parse_rdf` can
+    be told not to use its own parser.
+
+    :param stages: names of the stages to run, all by default
+    :return: JSON serializable dict of the results
+    """
+    params = dict(text_length=text_length, n_annotations=n_annotations,
+                  units_per_annotation=units_per_annotation,
+                  n_extra=n_extra, repeat=repeat, seed=seed)
+    doc = synthetic_document(text_length, n_annotations,
+                             units_per_annotation, n_extra, seed)
+    text = str(doc.context.nif__is_string)
+    cpts = synthetic_cpts(text, n_annotations, seed=seed)
+    turtle = doc.serialize(format='turtle')
+    n_triples = len(doc.rdf)
+    # an inline context, no network access
+    jsonld_context = {key: str(ns) for key, ns in ns_dict.items()}
+    try:
+        jsonld = doc.serialize(format='json-ld', context=jsonld_context)
+    except rdflib.plugin.PluginException:
+        # a version without the native writer and rdflib without JSON-LD
+        jsonld = None
+
+    def add_extracted_cpts():
+        cxt = NIFContext(is_string=text, uri=doc.context.uri)
+        NIFDocument(context=cxt).add_extracted_cpts(cpts)
+
+    benchmarks = [
+        ('construct', lambda: synthetic_document(
+            text_length, n_annotations, units_per_annotation, n_extra, seed)),
+        ('add_extracted_cpts', add_extracted_cpts),
+        ('validate', doc.validate),
+        ('serialize_turtle', lambda: doc.serialize(format='turtle')),
+        ('serialize_nt', lambda: doc.serialize(format='nt')),
+        ('parse_turtle', lambda: NIFDocument.parse_rdf(turtle,
+                                                       format='turtle')),
+    ]
+    if jsonld is not None:
+        benchmarks += [
+            ('serialize_jsonld', lambda: doc.serialize(
+                format='json-ld', context=jsonld_context)),
+            ('parse_jsonld', lambda: NIFDocument.parse_rdf(
+                jsonld, format='json-ld')),
+        ]
+    if rdflib_has_jsonld():
+        benchmarks.append(
+            ('serialize_jsonld_rdflib', lambda: doc.rdf.serialize(
+                format='json-ld', context=jsonld_context)))
+        # older versions always parse with rdflib, see `parse_jsonld`
+        if jsonld is not None and \
+                'fast' in inspect.signature(NIFDocument.parse_rdf).parameters:
+            benchmarks.append(
+                ('parse_jsonld_rdflib', lambda: NIFDocument.parse_rdf(
+                    jsonld, format='json-ld', fast=False)))
+    results = dict()
+    for name, fn in benchmarks:
+        if stages is not None and name not in stages:
+            continue
+        result = measure(fn, repeat=repeat)
+        result['triples'] = n_triples
+        result['triples_per_second'] = n_triples / result['seconds'] \
+            if result['seconds'] else None
+        results[name] = result
+    return {'environment': _environment(), 'params': params,
+            'stages': results}
+
+
+def _environment():
+    try:
+        from nif import __version__ as nif_version
+    except Exception:  # not installed, e.g. a plain checkout
+        nif_version = None
+    return {'nif': nif_version, 'rdflib': rdflib.__version__,
+            'python': platform.python_version(),
+            'machine': platform.machine()}
+
+
+def compare(old, new):
+    """
+    :param dict old: results of `run`
+    :param dict new: results of `run`
+    :return: list of (stage, old seconds, new seconds, new / old)
+    """
+    out = []
+    for stage, new_result in new['stages'].items():
+        old_result = old['stages'].get(stage)
+        if old_result is None:
+            continue
+        ratio = new_result['seconds'] / old_result['seconds'] \
+            if old_result['seconds'] else None
+        out.append((stage, old_result['seconds'], new_result['seconds'],
+                    ratio))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark NIF documents processing.')
+    parser.add_argument('--text-length', type=int, default=10000)
+    parser.add_argument('--annotations', type=int, default=500)
+    parser.add_argument('--units', type=int, default=1,
+                        help='annotation units per annotation')
+    parser.add_argument('--extra', type=int, default=20,
+                        help='non-NIF triples of the context')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stage', action='append', dest='stages',
+                        help='stage to run, may be repeated; all by default')
+    parser.add_argument('--output', help='write the JSON results to a file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two JSON result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            rows = compare(json.load(f_old), json.load(f_new))
+        print('{:<20} {:>10} {:>10} {:>8}'.format('stage', 'old, s', 'new, s',
+                                                  'new/old'))
+        for stage, old_s, new_s, ratio in rows:
+            print('{:<20} {:>10.4f} {:>10.4f} {:>8}'.format(
+                stage, old_s, new_s,
+                'n/a' if ratio is None else '{:.2f}'.format(ratio)))
+        return
+
+    results = run(text_length=args.text_length,
+                  n_annotations=args.annotations,
+                  units_per_annotation=args.units, n_extra=args.extra,
+                  repeat=args.repeat, seed=args.seed, stages=args.stages)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+import rdflib
+
+from nif.annotation import CONTEXT_ANCHOR, NIFAnnotation, \
+    NIFAnnotationUnit, nif_ns, do_suffix_offset
+from nif.namespace import itsrdf_ns
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, filters fall back to plain loops
+    np = None
+
+NO_TERM = -1
+# datatype of a confidence kept as an extra triple, see `add_unit`
+EXTRA_CONFIDENCE = -2
+NO_ANCHOR, DERIVED_ANCHOR, EXPLICIT_ANCHOR = 0, 1, 2
+
+_ann_core = frozenset((nif_ns.beginIndex, nif_ns.endIndex,
+                       nif_ns.referenceContext, nif_ns.annotationUnit))
+_ann_default_types = frozenset((nif_ns.Annotation, nif_ns.OffsetBasedString))
+_unit_columns = {itsrdf_ns.taIdentRef: 'unit_ident',
+                 itsrdf_ns.taClassRef: 'unit_class',
+                 itsrdf_ns.taAnnotatorsRef: 'unit_annotator'}
+
+
+class ColumnarAnnotations:
+    """
+    Array-backed storage of the annotations of a single `NIFContext`.
+
+    Every annotation is a row of the `begin`/`end` columns, every annotation
+    unit is a row of the `unit_*` columns pointing to its annotation with
+    `unit_ann`. `itsrdf:taIdentRef`, `itsrdf:taClassRef` and
+    `itsrdf:taAnnotatorsRef` values are interned into integer ids (see
+    `term`), `itsrdf:taConfidence` is kept in a float column (`nan` if
+    absent) if it is an `xsd:double`, `xsd:float` or `xsd:decimal` literal
+    written in the canonical form of its float value. Triples that do not
+    fit the columns, e.g. other confidence literals, are kept per row in the
+    `ann_extra`/`unit_extra` dicts (the value of a numeric confidence is
+    still put in the float column for `select`), so the conversion from and
+    to a `NIFDocument` is lossless up to blank node labels.
+    """
+    def __init__(self, context):
+        """
+        :param NIFContext context: the reference context of all annotations
+        """
+        self.context = context
+        self.begin = array('l')
+        self.end = array('l')
+        self.anchor_kind = array('b')
+        self.anchors = dict()  # annotation index -> anchor literal
+        self.ann_extra = dict()  # annotation index -> [(s, p, o), ...]
+        self.unit_ann = array('l')
+        self.unit_ident = array('l')
+        self.unit_class = array('l')
+        self.unit_annotator = array('l')
+        self.unit_confidence = array('d')
+        self.unit_confidence_dt = array('l')
+        self.unit_uris = dict()  # unit index -> URIRef of named units
+        self.unit_extra = dict()  # unit index -> [(s, p, o), ...]
+        self._units_sorted = None  # whether unit_ann is non-decreasing
+        self.structure = None  # nif.structure.Segmentation of the context
+        self.terms = []
+        self._term_ids = dict()  # None until needed if `terms` is loaded
+
+    def __len__(self):
+        return len(self.begin)
+
+    @property
+    def n_units(self):
+        return len(self.unit_ann)
+
+    def intern(self, term):
+        """
+        :return: integer id of `term`, `NO_TERM` if `term` is `None`
+        """
+        if term is None:
+            return NO_TERM
+        try:
+            return self._term_index()[term]
+        except KeyError:
+            self.terms.append(term)
+            self._term_ids[term] = len(self.terms) - 1
+            return len(self.terms) - 1
+
+    def term_id(self, term):
+        """
+        :return: id of an already interned `term`, `NO_TERM` if unknown
+        """
+        return self._term_index().get(term, NO_TERM)
+
+    def _term_index(self):
+        if self._term_ids is None:
+            self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        return self._term_ids
+
+    def term(self, term_id):
+        return None if term_id == NO_TERM else self.terms[term_id]
+
+    def add_annotation(self, begin, end, anchor=None, extra=None):
+        """
+        :param anchor: anchor literal, `True` to derive it from the context
+            on conversion, `None` for no anchor
+        :param extra: iterable of additional triples, a `None` subject
+            stands for the annotation itself
+        :return: index of the new annotation
+        """
+        idx = len(self.begin)
+        self.begin.append(begin)
+        self.end.append(end)
+        if anchor is None:
+            self.anchor_kind.append(NO_ANCHOR)
+        elif anchor is True:
+            self.anchor_kind.append(DERIVED_ANCHOR)
+        else:
+            self.anchor_kind.append(EXPLICIT_ANCHOR)
+            self.anchors[idx] = anchor
+        if extra:
+            self.ann_extra[idx] = list(extra)
+        return idx
+
+    def add_unit(self, ann_idx, ident_ref=None, class_ref=None,
+                 annotators_ref=None, confidence=None, uri=None, extra=None):
+        """
+        :param int ann_idx: index of the annotation the unit belongs to
+        :param confidence: float or `rdflib.Literal`, a literal not rebuilt
+            unchanged from the float column (see `_float_confidence`) is
+            kept as an extra triple
+        :param uri: URI of the unit, `None` for a blank node
+        :param extra: iterable of additional triples, a `None` subject
+            stands for the unit itself
+        :return: index of the new unit
+        """
+        idx = len(self.unit_ann)
+        extra = list(extra) if extra else []
+        self.unit_ann.append(ann_idx)
+        self._units_sorted = None
+        self.unit_ident.append(self.intern(ident_ref))
+        self.unit_class.append(self.intern(class_ref))
+        self.unit_annotator.append(self.intern(annotators_ref))
+        if confidence is None:
+            self.unit_confidence.append(math.nan)
+            self.unit_confidence_dt.append(NO_TERM)
+        elif isinstance(confidence, rdflib.Literal):
+            value = _float_confidence(confidence)
+            if value is not None:
+                self.unit_confidence.append(value)
+                self.unit_confidence_dt.append(
+                    self.intern(confidence.datatype))
+            else:
+                # the literal itself is kept, its value is only used by
+                # `select`
+                extra.append((None, itsrdf_ns.taConfidence, confidence))
+                self.unit_confidence.append(_number(confidence))
+                self.unit_confidence_dt.append(EXTRA_CONFIDENCE)
+        else:
+            self.unit_confidence.append(float(confidence))
+            self.unit_confidence_dt.append(NO_TERM)
+        if uri is not None and not isinstance(uri, rdflib.BNode):
+            self.unit_uris[idx] = uri
+        if extra:
+            self.unit_extra[idx] = extra
+        return idx
+
+    @classmethod
+    def from_document(cls, doc):
+        """
+        :param NIFDocument doc: the document to convert
+        :return: ColumnarAnnotations
+        """
+        out = cls(doc.context)
+        if doc._structure is not None:
+            out.structure = doc._structure.copy()
+        text = doc.context.text
+        for ann in doc.annotations:
+            anchor = None
+            extra = []
+            for s, p, o in ann:
+                if s != ann.uri:
+                    extra.append((s, p, o))
+                elif p in _ann_core or \
+                        (p == rdflib.RDF.type and o in _ann_default_types):
+                    continue
+                elif p == nif_ns.anchorOf and anchor is None:
+                    anchor = o
+                else:
+                    extra.append((None, p, o))
+            begin, end = ann.begin_end_index
+            if ann._anchor is CONTEXT_ANCHOR or \
+                    anchor is not None and text is not None and \
+                    anchor == rdflib.Literal(text[begin:end]):
+                anchor = True
+            ann_idx = out.add_annotation(begin, end, anchor=anchor,
+                                         extra=extra)
+            for au in ann.annotation_units.values():
+                out._add_unit_record(ann_idx, au)
+        return out
+
+    def _add_unit_record(self, ann_idx, au):
+        columns = dict()
+        extra = []
+        for s, p, o in au:
+            if s != au.uri:
+                extra.append((s, p, o))
+            elif p == rdflib.RDF.type and o == nif_ns.AnnotationUnit:
+                continue
+            elif p in _unit_columns and _unit_columns[p] not in columns:
+                columns[_unit_columns[p]] = o
+            elif p == itsrdf_ns.taConfidence and \
+                    'confidence' not in columns and \
+                    isinstance(o, rdflib.Literal):
+                columns['confidence'] = o
+            else:
+                extra.append((None, p, o))
+        return self.add_unit(ann_idx,
+                             ident_ref=columns.get('unit_ident'),
+                             class_ref=columns.get('unit_class'),
+                             annotators_ref=columns.get('unit_annotator'),
+                             confidence=columns.get('confidence'),
+                             uri=au.uri, extra=extra)
+
+    def to_document(self, document_class=None):
+        """
+        :param document_class: class of the result, `NIFDocument` by default
+        :return: NIFDocument
+        """
+        if document_class is None:
+            from nif.annotation import NIFDocument
+            document_class = NIFDocument
+        units = [[] for _ in range(len(self))]
+        for unit_idx, ann_idx in enumerate(self.unit_ann):
+            units[ann_idx].append(self.unit(unit_idx))
+        anns = [self.annotation(i, units=units[i]) for i in range(len(self))]
+        doc = document_class(context=self.context)
+        if self.structure is not None:
+            doc._structure = self.structure.copy(context=self.context,
+                                                 document=doc)
+        doc.add_annotations(anns)
+        return doc
+
+    def annotation(self, ann_idx, units=None):
+        """
+        :param units: the annotation units, by default built from the unit
+            rows of the annotation
+        :return: NIFAnnotation built from the row `ann_idx`
+        """
+        if units is None:
+            units = [self.unit(unit_idx)
+                     for unit_idx in self.annotation_units(ann_idx)]
+        begin, end = self.begin[ann_idx], self.end[ann_idx]
+        kind = self.anchor_kind[ann_idx]
+        if kind == DERIVED_ANCHOR:
+            anchor = CONTEXT_ANCHOR
+        elif kind == EXPLICIT_ANCHOR:
+            anchor = self.anchors[ann_idx]
+        else:
+            anchor = None
+        ann = NIFAnnotation(begin_end_index=(begin, end),
+                            reference_context=self.context,
+                            anchor_of=anchor, annotation_units=units,
+                            validate=False)
+        for s, p, o in self.ann_extra.get(ann_idx, ()):
+            ann.add((ann.uri if s is None else s, p, o))
+        return ann
+
+    def annotation_units(self, ann_idx):
+        """
+        :return: indices of the unit rows of the annotation `ann_idx`
+        """
+        unit_ann = self.unit_ann
+        if self._units_sorted is None:
+            self._units_sorted = all(unit_ann[i] <= unit_ann[i + 1]
+                                     for i in range(len(unit_ann) - 1))
+        if self._units_sorted:
+            return range(bisect_left(unit_ann, ann_idx),
+                         bisect_right(unit_ann, ann_idx))
+        return [i for i, a in enumerate(unit_ann) if a == ann_idx]
+
+    def unit(self, unit_idx):
+        """
+        :return: NIFAnnotationUnit built from the row `unit_idx`
+        """
+        au = NIFAnnotationUnit(uri=self.unit_uris.get(unit_idx))
+        for p, column in _unit_columns.items():
+            term = self.term(getattr(self, column)[unit_idx])
+            if term is not None:
+                au.add((au.uri, p, term))
+        confidence = self.unit_confidence[unit_idx]
+        if not math.isnan(confidence) and \
+                self.unit_confidence_dt[unit_idx] != EXTRA_CONFIDENCE:
+            datatype = self.term(self.unit_confidence_dt[unit_idx])
+            au.add((au.uri, itsrdf_ns.taConfidence,
+                    rdflib.Literal(confidence, datatype=datatype)))
+        for s, p, o in self.unit_extra.get(unit_idx, ()):
+            au.add((au.uri if s is None else s, p, o))
+        return au
+
+    def annotation_uri(self, ann_idx):
+        return do_suffix_offset(self.context.uri, self.begin[ann_idx],
+                                self.end[ann_idx])
+
+    def select(self, ident_ref=None, class_ref=None, annotators_ref=None,
+               min_confidence=None, begin=None, end=None):
+        """
+        Bulk filter. Unit criteria (`ident_ref`, `class_ref`,
+        `annotators_ref`, `min_confidence`) have to be met by at least one
+        unit of an annotation. The span criteria keep the annotations lying
+        inside [`begin`, `end`). Vectorized with numpy if it is installed.
+
+        :return: sorted list of annotation indices
+        """
+        unit_criteria = [
+            (self.unit_ident, ident_ref), (self.unit_class, class_ref),
+            (self.unit_annotator, annotators_ref)]
+        unit_criteria = [(column, self.term_id(term))
+                         for column, term in unit_criteria if term is not None]
+        if any(term_id == NO_TERM for _, term_id in unit_criteria):
+            return []
+        has_unit_criteria = bool(unit_criteria) or min_confidence is not None
+        if np is not None:
+            return self._select_np(unit_criteria, has_unit_criteria,
+                                   min_confidence, begin, end)
+        if has_unit_criteria:
+            candidates = set()
+            for unit_idx, ann_idx in enumerate(self.unit_ann):
+                if all(column[unit_idx] == term_id
+                       for column, term_id in unit_criteria) and \
+                        (min_confidence is None or
+                         self.unit_confidence[unit_idx] >= min_confidence):
+                    candidates.add(ann_idx)
+        else:
+            candidates = range(len(self))
+        return sorted(i for i in candidates
+                      if (begin is None or self.begin[i] >= begin) and
+                      (end is None or self.end[i] <= end))
+
+    def _select_np(self, unit_criteria, has_unit_criteria, min_confidence,
+                   begin, end):
+        mask = np.ones(len(self), dtype=bool)
+        if has_unit_criteria:
+            unit_mask = np.ones(self.n_units, dtype=bool)
+            for column, term_id in unit_criteria:
+                unit_mask &= _as_np(column) == term_id
+            if min_confidence is not None:
+                unit_mask &= _as_np(self.unit_confidence) >= min_confidence
+            mask[:] = False
+            mask[_as_np(self.unit_ann)[unit_mask]] = True
+        if begin is not None:
+            mask &= _as_np(self.begin) >= begin
+        if end is not None:
+            mask &= _as_np(self.end) <= end
+        return np.flatnonzero(mask).tolist()
+
+
+def _as_np(column):
+    # arrays and memoryviews (e.g. over a `nif.store` file)
+    dtype = column.typecode if isinstance(column, array) else column.format
+    return np.frombuffer(column, dtype=dtype)
+
+
+_float_datatypes = frozenset((rdflib.XSD.double, rdflib.XSD.float,
+                              rdflib.XSD.decimal))
+
+
+def _float_confidence(o):
+    """
+    :return: float value of the literal `o` if it is rebuilt unchanged from
+        it and its datatype, None otherwise, e.g. for `"1"^^xsd:integer` or
+        `"0.50"^^xsd:decimal`
+    """
+    if not isinstance(o, rdflib.Literal) or o.datatype not in _float_datatypes:
+        return None
+    try:
+        value = float(o.toPython())
+    except (TypeError, ValueError):  # ill-typed literal
+        return None
+    if math.isnan(value) or rdflib.Literal(value, datatype=o.datatype) != o:
+        return None
+    return value
+
+
+def _number(o):
+    """
+    :return: float value of the literal `o`, `nan` if it is not a number
+    """
+    value = o.toPython()
+    if isinstance(value, bool) or \
+            not isinstance(value, (int, float, Decimal)):
+        return math.nan
+    return float(value)
@@ -0,0 +1,227 @@
+"""
+Differences between two versions of the annotations of a text, see
+`NIFDocument.diff`, and their export as a SPARQL Update request, so that
+only the changed triples are sent to a triple store.
+
+The annotations and the structures of both documents are sorted by span and
+swept in a single pass, the triples are only compared span by span. Blank
+nodes are compared by their canonical labels (see
+`nif.fingerprint.bnode_labels`), i.e. an annotation unit is identified by
+the span of its annotation and its triples: a changed unit is removed and
+added again.
+"""
+import heapq
+from itertools import groupby
+from operator import itemgetter
+
+import rdflib
+
+from nif.fingerprint import bnode_labels
+from nif.writer import nt_term
+
+_span = itemgetter(0)
+
+
+def _has_bnode(triple):
+    return isinstance(triple[0], rdflib.BNode) or \
+        isinstance(triple[2], rdflib.BNode)
+
+
+def _keyed(triples):
+    """
+    :return: dict key -> triple, the blank nodes of the keys are replaced by
+        their canonical labels
+    """
+    labels = bnode_labels(triples)
+    out = dict()
+    for triple in triples:
+        if _has_bnode(triple):
+            key = tuple(('_:', labels.get(t, '_:'))
+                        if isinstance(t, rdflib.BNode) else t
+                        for t in triple)
+        else:
+            key = triple
+        out[key] = triple
+    return out
+
+
+def _triples(record):
+    # not list(record), the length of a record is computed by iterating it
+    return list(record.triples((None, None, None)))
+
+
+def _annotation_items(doc):
+    for ann in sorted(doc.annotations, key=lambda a: a.begin_end_index):
+        triples = _triples(ann)
+        for au in ann.annotation_units.values():
+            triples.extend(au.triples((None, None, None)))
+        yield ann.begin_end_index, triples
+
+
+def _groups(doc):
+    """
+    :return: generator over (span, list of triples) of the annotations and
+        the structures of `doc` sharing the span, sorted by span
+    """
+    streams = [_annotation_items(doc)]
+    if doc._structure is not None:
+        streams.extend(((span, [(uri, p, o) for p, o in pos])
+                        for span, uri, pos in layer)
+                       for layer in doc._structure.iter_layers())
+    for span, items in groupby(heapq.merge(*streams, key=_span), key=_span):
+        triples = []
+        for _, item_triples in items:
+            triples.extend(item_triples)
+        yield span, list(dict.fromkeys(triples))
+
+
+def _components(triples):
+    """
+    :param triples: triples with blank nodes
+    :return: list of the lists of the triples connected by blank nodes
+    """
+    parent = dict()
+
+    def find(node):
+        while node in parent:
+            node = parent[node]
+        return node
+
+    for s, _, o in triples:
+        if isinstance(s, rdflib.BNode) and isinstance(o, rdflib.BNode):
+            root_s, root_o = find(s), find(o)
+            if root_s != root_o:
+                parent[root_o] = root_s
+    out = dict()
+    for triple in triples:
+        node = triple[0] if isinstance(triple[0], rdflib.BNode) \
+            else triple[2]
+        out.setdefault(find(node), []).append(triple)
+    return list(out.values())
+
+
+def _block(triples, graph=None, variables=None):
+    def term(t):
+        if variables is not None and isinstance(t, rdflib.BNode):
+            if t not in variables:
+                variables[t] = '?b{}'.format(len(variables))
+            return variables[t]
+        return nt_term(t)
+
+    lines = '\n'.join('  {} {} {} .'.format(*map(term, triple))
+                      for triple in triples)
+    if graph is None:
+        return '{{\n{}\n}}'.format(lines)
+    return '{{ GRAPH {} {{\n{}\n}} }}'.format(
+        nt_term(rdflib.URIRef(graph)), lines)
+
+
+class DocumentDiff:
+    """
+    The triples to remove from a document and to add to it to get another
+    version of it.
+    """
+    def __init__(self):
+        self.removed = []
+        self.added = []
+        # spans of the annotations and structures only in the old version,
+        # only in the new one and changed
+        self.removed_spans = []
+        self.added_spans = []
+        self.changed_spans = []
+
+    def __len__(self):
+        return len(self.removed) + len(self.added)
+
+    def __bool__(self):
+        return bool(self.removed or self.added)
+
+    def __repr__(self):
+        return '<DocumentDiff -{} +{} triples>'.format(
+            len(self.removed), len(self.added))
+
+    def _compare(self, old, new):
+        """
+        :return: (removed, added) triples of `old` and `new`
+        """
+        old_keys, new_keys = _keyed(old), _keyed(new)
+        return ([t for k, t in old_keys.items() if k not in new_keys],
+                [t for k, t in new_keys.items() if k not in old_keys])
+
+    def _collect(self, changes):
+        """
+        :param changes: list of (span, list of the spans, removed, added),
+            span is None for the context
+        """
+        # a triple may be held by other records in the two versions, e.g.
+        # the triples of the structures are context triples once parsed
+        moved = {t for _, _, removed, _ in changes for t in removed
+                 if not _has_bnode(t)}.intersection(
+            t for _, _, _, added in changes for t in added
+            if not _has_bnode(t))
+        for span, spans, removed, added in changes:
+            if moved:
+                removed = [t for t in removed if t not in moved]
+                added = [t for t in added if t not in moved]
+            self.removed.extend(removed)
+            self.added.extend(added)
+            if spans is not None and (removed or added):
+                spans.append(span)
+
+    def iter_sparql(self, graph=None):
+        """
+        The removed triples without blank nodes are deleted with a single
+        `DELETE DATA`, the removed blank nodes, e.g. annotation units, with
+        a `DELETE WHERE` each, where the blank nodes become variables. The
+        added triples are inserted with a single `INSERT DATA`.
+
+        :param graph: URI of the named graph to change, the default graph if
+            None
+        :return: generator over the SPARQL Update operations
+        """
+        ground = [t for t in self.removed if not _has_bnode(t)]
+        if ground:
+            yield 'DELETE DATA ' + _block(ground, graph)
+        for component in _components([t for t in self.removed
+                                      if _has_bnode(t)]):
+            yield 'DELETE WHERE ' + _block(component, graph, variables={})
+        if self.added:
+            yield 'INSERT DATA ' + _block(self.added, graph)
+
+    def to_sparql(self, graph=None):
+        """
+        :return: SPARQL Update request of `iter_sparql`, empty if there is
+            no difference
+        """
+        return ' ;\n'.join(self.iter_sparql(graph=graph))
+
+
+def diff(doc, other):
+    """
+    :param doc: the old version
+    :param other: the new version, with the same context URI
+    :return: DocumentDiff from `doc` to `other`
+    """
+    if doc.context.uri != other.context.uri:
+        raise ValueError('Versions of the context {} expected, {} '
+                         'provided.'.format(doc.context.uri,
+                                            other.context.uri))
+    out = DocumentDiff()
+    changes = [(None, None) + out._compare(_triples(doc.context),
+                                           _triples(other.context))]
+    old, new = _groups(doc), _groups(other)
+    a, b = next(old, None), next(new, None)
+    while a is not None or b is not None:
+        if b is None or a is not None and a[0] < b[0]:
+            changes.append((a[0], out.removed_spans, a[1], []))
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            changes.append((b[0], out.added_spans, [], b[1]))
+            b = next(new, None)
+        else:
+            removed, added = out._compare(a[1], b[1])
+            if removed or added:
+                changes.append((a[0], out.changed_spans, removed, added))
+            a, b = next(old, None), next(new, None)
+    out._collect(changes)
+    return out
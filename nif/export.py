@@ -0,0 +1,190 @@
+"""
+Bulk export of many documents to a triple store in few requests.
+
+`BulkExporter` accumulates the triples of the added documents and hands
+batches of at most `batch_size` triples to a sink, either as a SPARQL Update
+`INSERT DATA` request or as N-Quads, with the context URI of every document
+as its named graph. A sink is any function taking the text of a batch, e.g.
+the `write` method of a file or the function returned by `http_sink`::
+
+    with BulkExporter(http_sink('http://localhost:3030/ds/update')) as out:
+        for doc in docs:
+            out.add(doc)
+
+The triples sharing blank nodes, e.g. an annotation and its units, are never
+split between two batches since blank node labels are scoped to a single
+request.
+"""
+from nif.writer import nt_term
+
+FORMATS = ('sparql', 'nquads')
+CONTENT_TYPES = {'sparql': 'application/sparql-update',
+                 'nquads': 'application/n-quads'}
+
+
+def http_sink(url, format='sparql', headers=None, timeout=60):
+    """
+    :param url: the SPARQL Update endpoint, or the graph store endpoint for
+        N-Quads
+    :param format: one of `FORMATS`, gives the content type of the requests
+    :param dict headers: additional HTTP headers, e.g. authorization
+    :return: sink POSTing every batch to `url`
+    """
+    import urllib.request
+    request_headers = {'Content-Type': CONTENT_TYPES[format] +
+                       '; charset=utf-8'}
+    request_headers.update(headers or {})
+
+    def sink(payload):
+        request = urllib.request.Request(url, data=payload.encode('utf-8'),
+                                         headers=request_headers,
+                                         method='POST')
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    return sink
+
+
+def _groups(doc):
+    """
+    :return: generator over the lists of triples of `doc` to be kept in the
+        same batch: the context, every annotation with its units, every
+        structure
+    """
+    yield list(doc.context.triples((None, None, None)))
+    for ann in doc.annotations:
+        triples = list(ann.triples((None, None, None)))
+        for au in ann.annotation_units.values():
+            triples.extend(au.triples((None, None, None)))
+        yield triples
+    if doc._structure is not None:
+        for s, pos in doc._structure.iter_subjects():
+            yield [(s, p, o) for p, o in pos]
+
+
+class BulkExporter:
+    _sparql_wrapper = 'INSERT DATA {{\n{}}}\n'
+    _graph_wrapper = '  GRAPH {} {{\n{}  }}\n'
+
+    def __init__(self, sink, format='sparql', batch_size=10000,
+                 max_chars=None, named_graphs=True):
+        """
+        :param sink: function taking the text of a batch
+        :param format: one of `FORMATS`
+        :param batch_size: maximal number of triples of a batch. Only the
+            triples of a single annotation with its units, or of the
+            context, may exceed it and are sent in a batch of their own.
+        :param max_chars: if given, maximal length of the text of a batch,
+            with the same exception
+        :param named_graphs: if False the triples go to the default graph
+            instead of the graph named by the context URI
+        """
+        if format not in FORMATS:
+            raise ValueError('Unknown export format {}, use one of '
+                             '{}.'.format(format, FORMATS))
+        self.sink = sink
+        self.format = format
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.named_graphs = named_graphs
+        # (graph, lines) segments of the pending batch
+        self._segments = []
+        self._n_triples = 0
+        self._n_chars = self._batch_chars()
+        self.stats = dict(documents=0, triples=0, batches=0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, doc):
+        """
+        Add the triples of `doc`, the full batches are sent to the sink.
+
+        :return: self
+        """
+        graph = nt_term(doc.context.uri) if self.named_graphs else None
+        for triples in _groups(doc):
+            if self.format == 'nquads':
+                suffix = ' .\n' if graph is None else ' {} .\n'.format(graph)
+                lines = ['{} {} {}{}'.format(nt_term(s), nt_term(p),
+                                             nt_term(o), suffix)
+                         for s, p, o in triples]
+            else:
+                lines = ['    {} {} {} .\n'.format(nt_term(s), nt_term(p),
+                                                   nt_term(o))
+                         for s, p, o in triples]
+            n_chars = sum(map(len, lines))
+            if self._n_triples and (
+                    self._n_triples + len(lines) > self.batch_size or
+                    self.max_chars is not None and
+                    self._n_chars + self._segment_chars(graph) + n_chars >
+                    self.max_chars):
+                self.flush()
+            n_chars += self._segment_chars(graph)
+            if not self._segments or self._segments[-1][0] != graph:
+                self._segments.append((graph, []))
+            self._segments[-1][1].extend(lines)
+            self._n_triples += len(lines)
+            self._n_chars += n_chars
+        self.stats['documents'] += 1
+        return self
+
+    def add_all(self, docs):
+        """
+        :param docs: iterable of documents, consumed lazily
+        :return: self
+        """
+        for doc in docs:
+            self.add(doc)
+        return self
+
+    def _batch_chars(self):
+        """
+        :return: length of the text of an empty batch
+        """
+        if self.format == 'nquads':
+            return 0
+        return len(self._sparql_wrapper.format(''))
+
+    def _segment_chars(self, graph):
+        """
+        :return: length of the text wrapping the lines of the graph `graph`
+            added to the pending batch, 0 if they go to its last segment
+        """
+        if self.format == 'nquads' or graph is None or \
+                self._segments and self._segments[-1][0] == graph:
+            return 0
+        return len(self._graph_wrapper.format(graph, ''))
+
+    def _payload(self):
+        if self.format == 'nquads':
+            return ''.join(line for _, lines in self._segments
+                           for line in lines)
+        blocks = []
+        for graph, lines in self._segments:
+            if graph is None:
+                blocks.append(''.join(lines))
+            else:
+                blocks.append(self._graph_wrapper.format(graph,
+                                                         ''.join(lines)))
+        return self._sparql_wrapper.format(''.join(blocks))
+
+    def flush(self):
+        """
+        Send the pending triples to the sink, if any.
+
+        :return: self
+        """
+        if not self._n_triples:
+            return self
+        payload = self._payload()
+        self.stats['triples'] += self._n_triples
+        self.stats['batches'] += 1
+        self._segments = []
+        self._n_triples = 0
+        self._n_chars = self._batch_chars()
+        self.sink(payload)
+        return self
@@ -0,0 +1,86 @@
+import hashlib
+
+import rdflib
+
+from nif.writer import nt_term
+
+FINGERPRINT_BITS = 128
+_modulo = 1 << FINGERPRINT_BITS
+
+
+def _digest(text):
+    return int.from_bytes(
+        hashlib.blake2b(text.encode('utf-8'),
+                        digest_size=FINGERPRINT_BITS // 8).digest(), 'big')
+
+
+def bnode_labels(triples):
+    """
+    Canonical labels of the blank nodes that are subjects of `triples`. The
+    label of a blank node is the digest of its own (predicate, object) pairs
+    where the nested blank nodes are replaced by their labels, so it does
+    not depend on the blank node ids. Tree shaped structures, e.g. the
+    annotation units, are labelled exactly; in a cycle of blank nodes the
+    back reference is replaced by a constant.
+
+    :return: dict BNode -> label
+    """
+    by_bnode = dict()
+    for s, p, o in triples:
+        if isinstance(s, rdflib.BNode):
+            by_bnode.setdefault(s, []).append((p, o))
+    labels = dict()
+
+    def label(node, visiting):
+        if node in labels:
+            return labels[node]
+        if node not in by_bnode or node in visiting:
+            return '_:'
+        visiting.add(node)
+        lines = sorted('{} {}'.format(nt_term(p), term_key(o, visiting))
+                       for p, o in by_bnode[node])
+        visiting.discard(node)
+        labels[node] = '_:{:x}'.format(_digest('\n'.join(lines)))
+        return labels[node]
+
+    def term_key(term, visiting):
+        if isinstance(term, rdflib.BNode):
+            return label(term, visiting)
+        return nt_term(term)
+
+    for node in by_bnode:
+        label(node, set())
+    return labels
+
+
+def triple_digests(triples):
+    """
+    Digest of every triple of `triples`, the blank nodes being replaced by
+    the labels of `bnode_labels`.
+
+    :return: list of int
+    """
+    triples = list(triples)
+    labels = bnode_labels(triples)
+    return [_digest(' '.join(labels.get(t, '_:')
+                             if isinstance(t, rdflib.BNode) else nt_term(t)
+                             for t in triple))
+            for triple in triples]
+
+
+def triples_fingerprint(triples):
+    """
+    Order independent digest of `triples`: the sum of the digests of the
+    triples modulo 2 ** `FINGERPRINT_BITS`, so that the fingerprints of
+    disjoint parts can be added and subtracted, see `triple_digests`.
+
+    :return: int
+    """
+    return sum(triple_digests(triples)) % _modulo
+
+
+def format_fingerprint(value):
+    """
+    :return: hex string of a fingerprint
+    """
+    return '{:0{}x}'.format(value % _modulo, FINGERPRINT_BITS // 4)
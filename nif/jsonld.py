@@ -0,0 +1,777 @@
+"""
+Native JSON-LD reader and writer of NIF documents.
+
+The JSON-LD contexts are registered locally (`register_context`) and
+processed once, no context is ever fetched from the network. The reader maps
+the JSON objects straight to the triples grouped by subject of `nif.parser`
+and the writer maps the records of a document straight to compact JSON
+objects, neither an `rdflib.Graph` nor a generic JSON-LD processor is
+involved::
+
+    doc = NIFDocument.parse_rdf(data, format='json-ld')
+    data = doc.serialize(format='json-ld')
+
+The documents are written with the inline context `NIF_CONTEXT` by default,
+so that any JSON-LD processor reads the same triples: `text` is
+`nif:isString`, `offset_ini` and `offset_end` are the offsets, `annotations`
+lists the annotations referring to a context and `annotationUnit` the units
+of an annotation. The written document is the context node, the annotations
+(and the structures) are nested in its reverse `nif:referenceContext`
+property if the context defines one, in its `@included` list otherwise.
+
+No remote context is registered by default. The Lynx documents refer to
+`LYNX_CONTEXT_URL`; they are read natively once the actual context document
+is registered, e.g. from a local copy::
+
+    jsonld.register_context(jsonld.LYNX_CONTEXT_URL, lynx_context_text)
+
+and are left to rdflib otherwise.
+
+Only the compacted documents of this kind are supported: lists (`@list`),
+named graphs, `@nest`, `@index`, keyword aliases, scoped contexts and
+unregistered remote contexts raise `nif.parser.ParseError`, so that
+`NIFDocument.parse_rdf` falls back to rdflib.
+"""
+import json
+import textwrap
+from collections import Counter
+from itertools import chain
+from urllib.parse import urljoin
+
+import rdflib
+
+from nif.namespace import ns_dict
+from nif.parser import ParseError
+
+nif_ns = ns_dict['nif']
+
+LYNX_CONTEXT_URL = 'http://lynx-project.eu/doc/jsonld/lynxdocument.json'
+
+# the terms of the written documents, see the module docstring
+NIF_CONTEXT = dict(
+    [(key, str(ns)) for key, ns in sorted(ns_dict.items())] + [
+        ('xsd', str(rdflib.XSD)),
+        ('text', 'nif:isString'),
+        ('offset_ini', {'@id': 'nif:beginIndex',
+                        '@type': 'xsd:nonNegativeInteger'}),
+        ('offset_end', {'@id': 'nif:endIndex',
+                        '@type': 'xsd:nonNegativeInteger'}),
+        ('anchorOf', 'nif:anchorOf'),
+        ('referenceContext', {'@id': 'nif:referenceContext',
+                              '@type': '@id'}),
+        ('annotations', {'@reverse': 'nif:referenceContext',
+                         '@container': '@set'}),
+        ('annotationUnit', {'@id': 'nif:annotationUnit',
+                            '@container': '@set'}),
+        ('keyword', 'nif:keyword'),
+        ('summary', 'nif:summary'),
+        ('taIdentRef', {'@id': 'itsrdf:taIdentRef', '@type': '@id'}),
+        ('taClassRef', {'@id': 'itsrdf:taClassRef', '@type': '@id'}),
+        ('taAnnotatorsRef', {'@id': 'itsrdf:taAnnotatorsRef',
+                             '@type': '@id'}),
+        ('taConfidence', 'itsrdf:taConfidence'),
+    ])
+
+_rdf_type = rdflib.RDF.type
+_xsd_integer = rdflib.XSD.integer
+_xsd_double = rdflib.XSD.double
+_xsd_boolean = rdflib.XSD.boolean
+_integer_types = frozenset((rdflib.XSD.integer, rdflib.XSD.nonNegativeInteger,
+                            rdflib.XSD.int, rdflib.XSD.long))
+_term_keys = frozenset(('@id', '@type', '@container', '@reverse',
+                        '@language'))
+_gen_delims = ':/?#[]@'
+_inherit = object()
+_missing = object()
+_rdflib_returns_bytes = int(rdflib.__version__.split('.')[0]) < 6
+
+
+class _Term:
+    __slots__ = ('name', 'iri', 'type', 'container', 'reverse', 'language')
+
+    def __init__(self, name, iri, type=None, container=None, reverse=False,
+                 language=_inherit):
+        self.name = name
+        self.iri = iri
+        self.type = type
+        self.container = container
+        self.reverse = reverse
+        self.language = language
+
+    @property
+    def simple(self):
+        return self.type is None and self.container is None and \
+            not self.reverse and self.language is _inherit
+
+
+class JsonLdContext:
+    """
+    A processed JSON-LD context: the term definitions, `@vocab`, `@base` and
+    the default `@language`.
+    """
+    def __init__(self, definition=None, base=None):
+        """
+        :param definition: value of a `@context` key: a dict, the URL of a
+            registered context or a list of them
+        :param base: the base IRI of the document
+        """
+        self.terms = dict()
+        self.vocab = None
+        self.base = base
+        self.language = None
+        self._compactor = None
+        if definition is not None:
+            self._update(definition)
+
+    def extend(self, definition):
+        """
+        :return: a new context with the terms of `definition` added
+        """
+        out = JsonLdContext(base=self.base)
+        out.terms = dict(self.terms)
+        out.vocab = self.vocab
+        out.language = self.language
+        out._update(definition)
+        return out
+
+    def _update(self, definition):
+        for item in _as_list(definition):
+            if item is None:
+                self.terms = dict()
+                self.vocab = self.language = None
+            elif isinstance(item, str):
+                registered = get_context(item)
+                self.terms.update(registered.terms)
+                if registered.vocab is not None:
+                    self.vocab = registered.vocab
+                if registered.language is not None:
+                    self.language = registered.language
+            elif isinstance(item, dict):
+                self._update_terms(item)
+            else:
+                raise ParseError('Invalid context {!r}.'.format(item))
+
+    def _update_terms(self, definition):
+        for key in ('@import', '@propagate'):
+            if key in definition:
+                raise ParseError('{} is not supported.'.format(key))
+        if '@base' in definition:
+            base = definition['@base']
+            self.base = base if base is None or self.base is None else \
+                urljoin(self.base, base)
+        if '@vocab' in definition:
+            vocab = definition['@vocab']
+            self.vocab = None if vocab is None else \
+                self.expand_iri(vocab, vocab=True)
+        if '@language' in definition:
+            self.language = definition['@language']
+        pending = {key: value for key, value in definition.items()
+                   if not key.startswith('@')}
+        for name in list(pending):
+            self._define(name, pending, set())
+
+    def _define(self, name, pending, defining):
+        if name not in pending:
+            return
+        if name in defining:
+            raise ParseError('Cyclic definition of the term {}.'.format(name))
+        defining.add(name)
+        value = pending[name]
+        if value is None:
+            self.terms[name] = None
+            del pending[name]
+            return
+        if isinstance(value, str):
+            value = {'@id': value}
+        elif not isinstance(value, dict) or set(value) - _term_keys:
+            raise ParseError('The definition of the term {} is not '
+                             'supported: {!r}.'.format(name, value))
+
+        def expand(iri):
+            prefix = iri.split(':', 1)[0] if ':' in iri else iri
+            if prefix != name:
+                self._define(prefix, pending, defining)
+            out = self.expand_iri(iri, vocab=True)
+            if out.startswith('@'):
+                raise ParseError('Keyword aliases are not supported: '
+                                 '{}.'.format(name))
+            return out
+
+        reverse = '@reverse' in value
+        if reverse:
+            iri = expand(value['@reverse'])
+        elif value.get('@id', name) is None:
+            self.terms[name] = None
+            del pending[name]
+            return
+        elif '@id' in value and value['@id'] != name:
+            iri = expand(value['@id'])
+        elif ':' in name:
+            iri = expand(name)
+        elif self.vocab is not None:
+            iri = self.vocab + name
+        else:
+            raise ParseError('The term {} has no IRI.'.format(name))
+        type = value.get('@type')
+        if type is not None and type not in ('@id', '@vocab'):
+            type = expand(type)
+        container = value.get('@container')
+        if container not in (None, '@set', '@language'):
+            raise ParseError('The container {} of the term {} is not '
+                             'supported.'.format(container, name))
+        self.terms[name] = _Term(name, iri, type=type, container=container,
+                                 reverse=reverse,
+                                 language=value.get('@language', _inherit))
+        del pending[name]
+
+    def expand_iri(self, value, vocab=False):
+        """
+        :param vocab: if True `value` may be a term or relative to `@vocab`,
+            otherwise it is relative to `@base`
+        :return: the IRI `value` stands for, blank node labels are returned
+            as they are
+        """
+        if vocab:
+            term = self.terms.get(value, _missing)
+            if term is not _missing:
+                return None if term is None else term.iri
+        if value.startswith('@'):
+            return value
+        if ':' in value:
+            prefix, suffix = value.split(':', 1)
+            if prefix == '_' or suffix.startswith('//'):
+                return value
+            term = self.terms.get(prefix)
+            if term is not None and not term.reverse:
+                return term.iri + suffix
+            return value
+        if vocab and self.vocab is not None:
+            return self.vocab + value
+        if self.base:
+            return urljoin(self.base, value)
+        return value
+
+    @property
+    def compactor(self):
+        if self._compactor is None:
+            self._compactor = _Compactor(self)
+        return self._compactor
+
+
+_registered = dict()
+_processed = dict()
+_nif_context = None
+
+
+def register_context(url, document):
+    """
+    Make the context `document` served at `url` available to the reader and
+    the writer, no network access is ever made.
+
+    :param document: the JSON document of the context, as a dict (with or
+        without the `@context` key) or a str
+    """
+    if isinstance(document, (str, bytes)):
+        document = json.loads(document)
+    if isinstance(document, dict) and '@context' in document:
+        document = document['@context']
+    _registered[url] = document
+    _processed.pop(url, None)
+
+
+def get_context(url):
+    """
+    :raise ParseError: if no context is registered at `url`
+    :return: the processed context registered at `url`
+    """
+    try:
+        return _processed[url]
+    except KeyError:
+        pass
+    try:
+        definition = _registered[url]
+    except KeyError:
+        raise ParseError('The context {} is not registered, see '
+                         'nif.jsonld.register_context.'.format(url))
+    out = _processed[url] = JsonLdContext(definition)
+    return out
+
+
+def unregister_context(url):
+    """
+    Forget the context registered at `url`, the documents referring to it
+    are then left to rdflib.
+    """
+    _registered.pop(url, None)
+    _processed.pop(url, None)
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _double_lexical(value):
+    mantissa, exponent = '{:.15E}'.format(value).split('E')
+    mantissa = mantissa.rstrip('0')
+    if mantissa.endswith('.'):
+        mantissa += '0'
+    return '{}E{}'.format(mantissa, int(exponent))
+
+
+def _native_literal(value, datatype=None):
+    """
+    :return: Literal of the JSON number or boolean `value`, converted as by
+        the JSON-LD to RDF algorithm
+    """
+    if datatype is not None:
+        datatype = rdflib.URIRef(datatype)
+    if isinstance(value, bool):
+        return rdflib.Literal('true' if value else 'false',
+                              datatype=datatype or _xsd_boolean)
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and (not value.is_integer() or
+                                         abs(value) >= 1e21) or \
+                datatype == _xsd_double:
+            return rdflib.Literal(_double_lexical(value),
+                                  datatype=datatype or _xsd_double)
+        return rdflib.Literal(str(int(value)),
+                              datatype=datatype or _xsd_integer)
+    raise ParseError('Unexpected value {!r}.'.format(value))
+
+
+class _Reader:
+    def __init__(self):
+        self.by_subject = dict()
+        self.bnodes = dict()
+        self.predicates = dict()
+        # the same IRIs and values come again and again, build every term
+        # once
+        self.terms = dict()
+        self.expanded = dict()
+
+    def emit(self, s, p, o):
+        try:
+            self.by_subject[s].append((p, o))
+        except KeyError:
+            self.by_subject[s] = [(p, o)]
+
+    def top(self, obj, ctx):
+        if not isinstance(obj, dict):
+            raise ParseError('A node object expected, got {!r}.'.format(obj))
+        if '@graph' not in obj:
+            self.node(obj, ctx)
+            return
+        if set(obj) - {'@context', '@graph'}:
+            raise ParseError('Named graphs are not supported.')
+        if '@context' in obj:
+            ctx = ctx.extend(obj['@context'])
+        for item in _as_list(obj['@graph']):
+            self.node(item, ctx)
+
+    def iri(self, value, ctx, vocab=False):
+        key = (value, ctx, vocab)
+        try:
+            return self.expanded[key]
+        except KeyError:
+            pass
+        iri = ctx.expand_iri(value, vocab=vocab)
+        if iri.startswith('_:'):
+            out = self.bnodes.get(iri)
+            if out is None:
+                out = self.bnodes[iri] = rdflib.BNode()
+        else:
+            out = rdflib.URIRef(iri)
+        self.expanded[key] = out
+        return out
+
+    def literal(self, value, lang=None, datatype=None):
+        key = (value, lang, datatype)
+        try:
+            return self.terms[key]
+        except KeyError:
+            out = self.terms[key] = rdflib.Literal(
+                value, lang=lang,
+                datatype=None if datatype is None else rdflib.URIRef(datatype))
+            return out
+
+    def node(self, obj, ctx):
+        """
+        :return: the subject of the node object `obj`
+        """
+        if not isinstance(obj, dict):
+            raise ParseError('A node object expected, got {!r}.'.format(obj))
+        if '@context' in obj:
+            ctx = ctx.extend(obj['@context'])
+        subject = obj.get('@id')
+        subject = rdflib.BNode() if subject is None else \
+            self.iri(subject, ctx)
+        for key, value in obj.items():
+            if key in ('@context', '@id'):
+                continue
+            elif key == '@type':
+                for item in _as_list(value):
+                    self.emit(subject, _rdf_type,
+                              self.iri(item, ctx, vocab=True))
+            elif key == '@included':
+                for item in _as_list(value):
+                    self.node(item, ctx)
+            elif key.startswith('@'):
+                raise ParseError('{} is not supported.'.format(key))
+            else:
+                self.property(subject, key, value, ctx)
+        return subject
+
+    def property(self, subject, key, value, ctx):
+        term = ctx.terms.get(key, _missing)
+        if term is None:
+            return
+        elif term is _missing:
+            iri = ctx.expand_iri(key, vocab=True)
+            if ':' not in iri:
+                # not an IRI, dropped as by the JSON-LD expansion
+                return
+            term = _Term(key, iri)
+        try:
+            predicate = self.predicates[term.iri]
+        except KeyError:
+            predicate = self.predicates[term.iri] = rdflib.URIRef(term.iri)
+        if term.container == '@language' and isinstance(value, dict) and \
+                '@value' not in value:
+            for lang, strings in value.items():
+                for string in _as_list(strings):
+                    self.emit(subject, predicate, self.literal(
+                        string, lang=None if lang == '@none' else lang))
+            return
+        for item in _as_list(value):
+            obj = self.object(item, term, ctx)
+            if obj is None:
+                continue
+            if not term.reverse:
+                self.emit(subject, predicate, obj)
+            elif isinstance(obj, rdflib.Literal):
+                raise ParseError('The value of the reverse property {} is '
+                                 'not a node.'.format(key))
+            else:
+                self.emit(obj, predicate, subject)
+
+    def object(self, item, term, ctx):
+        if item is None:
+            return None
+        elif isinstance(item, dict):
+            if '@value' in item:
+                return self.value(item, ctx)
+            elif '@list' in item or '@set' in item:
+                raise ParseError('@list and @set objects are not supported.')
+            return self.node(item, ctx)
+        elif isinstance(item, list):
+            raise ParseError('Lists of lists are not supported.')
+        elif term.type == '@id' and isinstance(item, str):
+            return self.iri(item, ctx)
+        elif term.type == '@vocab' and isinstance(item, str):
+            return self.iri(item, ctx, vocab=True)
+        elif isinstance(item, str):
+            if term.type is not None:
+                return self.literal(item, datatype=term.type)
+            lang = ctx.language if term.language is _inherit \
+                else term.language
+            return self.literal(item, lang=lang)
+        return _native_literal(item, term.type if term.type not in
+                               ('@id', '@vocab') else None)
+
+    def value(self, item, ctx):
+        if set(item) - {'@value', '@language', '@type'}:
+            raise ParseError('Unexpected value object {!r}.'.format(item))
+        value = item['@value']
+        if value is None:
+            return None
+        datatype = item.get('@type')
+        if datatype is not None:
+            datatype = ctx.expand_iri(datatype, vocab=True)
+        if isinstance(value, str):
+            return self.literal(value, lang=item.get('@language'),
+                                datatype=datatype)
+        return _native_literal(value, datatype)
+
+
+def parse_by_subject(data, base=None):
+    """
+    :param data: JSON-LD document as str, bytes or the parsed JSON
+    :param base: the base IRI of the relative IRIs, they are kept as they
+        are by default
+    :raise ParseError: if the input is not supported, see the module
+        docstring
+    :return: dict, see `nif.parser.group_by_subject`
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError as e:
+            raise ParseError('Not a valid JSON document: {}'.format(e))
+    reader = _Reader()
+    ctx = JsonLdContext(base=base)
+    for obj in _as_list(data):
+        reader.top(obj, ctx)
+    return reader.by_subject
+
+
+class _Compactor:
+    """
+    Compaction of the triples of the records with a processed context.
+    """
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.by_iri = dict()
+        self.simple = dict()
+        self.reverse = dict()
+        prefixes = []
+        # the shortest terms are selected first
+        for name, term in sorted(ctx.terms.items(),
+                                 key=lambda x: (len(x[0]), x[0])):
+            if term is None:
+                continue
+            # URIRefs are not equal to strs
+            iri = rdflib.URIRef(term.iri)
+            if term.reverse:
+                if term.container in (None, '@set'):
+                    self.reverse.setdefault(iri, name)
+                continue
+            self.by_iri.setdefault(iri, []).append(term)
+            if term.simple:
+                self.simple.setdefault(iri, name)
+                if term.iri[-1:] in _gen_delims:
+                    prefixes.append((term.iri, name))
+        # longest namespaces first so that nested namespaces win
+        self.prefixes = sorted(prefixes, key=lambda x: -len(x[0]))
+        self.iris = dict()
+
+    def iri(self, iri, vocab=True):
+        key = (iri, vocab)
+        try:
+            return self.iris[key]
+        except KeyError:
+            pass
+        out = self.simple.get(iri) if vocab else None
+        if out is None:
+            out = str(iri)
+            for ns, name in self.prefixes:
+                if iri.startswith(ns) and len(iri) > len(ns):
+                    suffix = iri[len(ns):]
+                    curie = '{}:{}'.format(name, suffix)
+                    if not suffix.startswith('//') and \
+                            curie not in self.ctx.terms:
+                        out = curie
+                        break
+        self.iris[key] = out
+        return out
+
+    def ref(self, o):
+        if isinstance(o, rdflib.BNode):
+            return '_:' + str(o)
+        return self.iri(o, vocab=False)
+
+    def expanded(self, o):
+        if isinstance(o, rdflib.Literal):
+            if o.language:
+                return {'@value': str(o), '@language': o.language}
+            elif o.datatype is not None:
+                return {'@value': str(o), '@type': self.iri(o.datatype)}
+            elif self.ctx.language is not None:
+                return {'@value': str(o)}
+            return str(o)
+        return {'@id': self.ref(o)}
+
+    def coerced(self, term, o):
+        """
+        :return: the compact value of `o` for `term`, `_missing` if `term`
+            can not hold `o`
+        """
+        if term.container == '@language':
+            if isinstance(o, rdflib.Literal) and o.language:
+                return {o.language: str(o)}
+            return _missing
+        elif term.type in ('@id', '@vocab'):
+            if isinstance(o, rdflib.Literal):
+                return _missing
+            return self.ref(o)
+        elif term.type is not None:
+            if not isinstance(o, rdflib.Literal) or o.language or \
+                    str(o.datatype) != term.type:
+                return _missing
+            lexical = str(o)
+            if o.datatype in _integer_types and lexical.isdigit() and \
+                    lexical == str(int(lexical)):
+                return int(lexical)
+            return lexical
+        elif term.language is not _inherit:
+            if isinstance(o, rdflib.Literal) and not o.datatype and \
+                    o.language == term.language:
+                return str(o)
+            return _missing
+        return self.expanded(o)
+
+    def value(self, p, o):
+        """
+        :return: (key, compact value) of the (`p`, `o`) pair
+        """
+        for term in self.by_iri.get(p, ()):
+            value = self.coerced(term, o)
+            if value is not _missing:
+                return term, value
+        return None, self.expanded(o)
+
+    def node_key(self, p):
+        for term in self.by_iri.get(p, ()):
+            if term.type in (None, '@id') and term.container != '@language':
+                return term
+        return None
+
+    def node(self, subject, nodes, refs, embedded, skip=None):
+        out = dict()
+        if not isinstance(subject, rdflib.BNode) or refs[subject] != 1:
+            out['@id'] = self.ref(subject)
+        pos = nodes[subject]
+        types = [self.iri(o) for p, o in pos
+                 if p == _rdf_type and isinstance(o, rdflib.URIRef)]
+        if types:
+            out['@type'] = types[0] if len(types) == 1 else types
+        for p, o in pos:
+            if p == _rdf_type and isinstance(o, rdflib.URIRef) or \
+                    skip is not None and (p, o) == skip:
+                continue
+            if not isinstance(o, rdflib.Literal) and o in nodes and \
+                    o not in embedded:
+                embedded.add(o)
+                term = self.node_key(p)
+                value = self.node(o, nodes, refs, embedded)
+            else:
+                term, value = self.value(p, o)
+            if term is None:
+                key, container = self.iri(p), None
+            else:
+                key, container = term.name, term.container
+            _add(out, key, value, container)
+        return out
+
+    def record(self, records, skip=None):
+        """
+        :param records: the record and its dependent records, e.g. the
+            annotation units of an annotation
+        :param skip: (predicate, object) pair of the first record not to
+            write
+        :return: the node object of the first record, every triple of the
+            records not reachable from it is in its `@included` list
+        """
+        nodes = dict()
+        for record in records:
+            nodes.setdefault(record.uri, []).extend(
+                record.predicate_objects(record.uri))
+            if record._extra:
+                for s, p, o in record._extra:
+                    nodes.setdefault(s, []).append((p, o))
+        return self.nodes(records[0].uri, nodes, skip=skip)
+
+    def nodes(self, subject, nodes, skip=None):
+        refs = Counter(o for pos in nodes.values() for p, o in pos
+                       if isinstance(o, rdflib.BNode))
+        embedded = {subject}
+        out = self.node(subject, nodes, refs, embedded, skip=skip)
+        included = []
+        for s in nodes:
+            if s not in embedded:
+                embedded.add(s)
+                included.append(self.node(s, nodes, refs, embedded))
+        if included:
+            out['@included'] = included
+        return out
+
+
+def _add(node, key, value, container):
+    if container == '@language':
+        values = node.setdefault(key, dict())
+        for lang, string in value.items():
+            if lang in values:
+                values[lang] = _as_list(values[lang]) + [string]
+            else:
+                values[lang] = string
+    elif container == '@set':
+        node.setdefault(key, []).append(value)
+    elif key in node:
+        if not isinstance(node[key], list):
+            node[key] = [node[key]]
+        node[key].append(value)
+    else:
+        node[key] = value
+
+
+def _context_of(context):
+    global _nif_context
+    if context is NIF_CONTEXT:
+        if _nif_context is None:
+            _nif_context = JsonLdContext(NIF_CONTEXT)
+        return _nif_context
+    if isinstance(context, str):
+        return get_context(context)
+    return JsonLdContext(context)
+
+
+def iter_serialize(doc, context=None, indent=None):
+    """
+    Write the document as a compact JSON-LD node object of its context, see
+    the module docstring.
+
+    :param context: the `@context` of the output: the URL of a registered
+        context or an inline definition, `NIF_CONTEXT` by default
+    :param indent: see `json.dumps`
+    :return: generator over text chunks, one per annotation
+    """
+    if context is None:
+        context = NIF_CONTEXT
+    compactor = _context_of(context).compactor
+    context_uri = doc.context.uri
+    key = compactor.reverse.get(nif_ns.referenceContext)
+    skip = None if key is None else (nif_ns.referenceContext, context_uri)
+    top = {'@context': context}
+    top.update(compactor.record([doc.context]))
+    included = []
+    if key is None:
+        key = '@included'
+        included = top.pop('@included', [])
+    top[key] = []
+    head, tail = json.dumps(top, ensure_ascii=False,
+                            indent=indent).rsplit('[]', 1)
+    yield head + '['
+    annotations = (compactor.record(
+        [ann] + list(ann.annotation_units.values()), skip=skip)
+        for ann in doc.annotations)
+    structures = () if doc._structure is None else (
+        compactor.nodes(s, {s: pos}, skip=skip)
+        for s, pos in doc._structure.iter_subjects())
+    first = True
+    for node in chain(included, annotations, structures):
+        chunk = json.dumps(node, ensure_ascii=False, indent=indent)
+        if indent is not None:
+            chunk = '\n' + textwrap.indent(chunk, ' ' * (2 * indent))
+        yield chunk if first else ',' + chunk
+        first = False
+    if indent is not None and not first:
+        tail = '\n' + ' ' * indent + ']' + tail
+    else:
+        tail = ']' + tail
+    yield tail
+
+
+def serialize(doc, context=None, indent=None, encoding=None):
+    """
+    :param encoding: if given bytes are returned. Otherwise the type
+        returned by `rdflib.Graph.serialize`: bytes before rdflib 6, str
+        since.
+    :return: see `iter_serialize`
+    """
+    out = ''.join(iter_serialize(doc, context=context, indent=indent))
+    if encoding is not None:
+        return out.encode(encoding)
+    return out.encode('utf-8') if _rdflib_returns_bytes else out
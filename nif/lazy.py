@@ -0,0 +1,202 @@
+"""
+Lazy view of a parsed NIF document.
+
+Only the context is built when the document is loaded, the annotations and
+their units stay as parsed triples until they are accessed. The filters of
+`LazyAnnotations` look at the triples, so the annotations they reject are
+never built::
+
+    doc = NIFDocument.parse_rdf(text, lazy=True)
+    for ann in doc.annotations.filter(annotators_ref=annotator):
+        ...
+"""
+import sys
+from collections.abc import Sequence
+
+import rdflib
+
+from nif import parser
+from nif.annotation import NIFDocument, nif_ns
+from nif.namespace import itsrdf_ns
+from nif.spans import SpanIndex
+
+
+def _matches(term, value):
+    if isinstance(value, rdflib.term.Identifier):
+        return term == value
+    return str(term) == value
+
+
+class LazyAnnotations(Sequence):
+    """
+    Read-only sequence of the annotations of a `LazyDocument`. An
+    annotation is built, with its units, on the first access and the same
+    object is returned afterwards. Slicing and `filter` return new
+    sequences without building any annotation.
+    """
+    def __init__(self, document, subjects):
+        self._document = document
+        self._subjects = subjects
+
+    def __len__(self):
+        return len(self._subjects)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return LazyAnnotations(self._document, self._subjects[idx])
+        return self._document.annotation(self._subjects[idx])
+
+    def __repr__(self):
+        return '<LazyAnnotations of {}: {} annotations>'.format(
+            self._document.context.uri, len(self))
+
+    @property
+    def uris(self):
+        """
+        :return: list of the uris of the annotations
+        """
+        return list(self._subjects)
+
+    def filter(self, rdf_type=None, ident_ref=None, class_ref=None,
+               annotators_ref=None, begin=None, end=None):
+        """
+        Filter the annotations on their triples. Unit criteria
+        (`ident_ref`, `class_ref`, `annotators_ref`) have to be met by at
+        least one unit of an annotation, `rdf_type` by the annotation
+        itself. The span criteria keep the annotations lying inside
+        [`begin`, `end`). A criterion given as a plain string is compared
+        with the string value of the terms.
+
+        :return: LazyAnnotations
+        """
+        by_subject = self._document._by_subject
+        unit_criteria = [(pred, value) for pred, value in (
+            (itsrdf_ns.taIdentRef, ident_ref),
+            (itsrdf_ns.taClassRef, class_ref),
+            (itsrdf_ns.taAnnotatorsRef, annotators_ref)) if value is not None]
+        type_ref = rdflib.RDF.type
+        annotation_unit_ref = nif_ns.annotationUnit
+        subjects = self._subjects
+        if begin is not None or end is not None:
+            inside = set(self._document._span_index().within(
+                0 if begin is None else begin,
+                sys.maxsize if end is None else end))
+            subjects = [s for s in subjects if s in inside]
+        if rdf_type is not None:
+            subjects = [s for s in subjects
+                        if any(p == type_ref and _matches(o, rdf_type)
+                               for p, o in by_subject[s])]
+        if unit_criteria:
+            subjects = [s for s in subjects if any(
+                all(any(au_p == pred and _matches(au_o, value)
+                        for au_p, au_o in by_subject.get(au_uri, ()))
+                    for pred, value in unit_criteria)
+                for p, au_uri in by_subject[s] if p == annotation_unit_ref)]
+        return LazyAnnotations(self._document, subjects)
+
+
+class LazyDocument:
+    """
+    Document whose annotations are built from the parsed triples when they
+    are accessed, see `NIFDocument.parse_rdf` with `lazy=True`.
+
+    The context is built at once and keeps the triples not describing the
+    annotations and their units, as in an eagerly parsed document.
+    `annotations` is a `LazyAnnotations`; an annotation is validated
+    against the context when it is built. `to_document` converts the whole
+    view, or a part of it, to a regular `NIFDocument`.
+    """
+    def __init__(self, by_subject, context_class=nif_ns.Context,
+                 document_class=NIFDocument, validate=True):
+        """
+        :param dict by_subject: see `nif.parser.group_by_subject`
+        :param validate: if False the annotations are not validated
+        """
+        self._by_subject = by_subject
+        self._document_class = document_class
+        self._validate = validate
+        self.context = parser.find_context(by_subject, context_class)
+        subjects = parser.annotation_subjects(by_subject, self.context.uri)
+        annotation_unit_ref = nif_ns.annotationUnit
+        skipped = set(subjects)
+        skipped.update(au_uri for s in subjects
+                       for p, au_uri in by_subject[s]
+                       if p == annotation_unit_ref)
+        rest = {s: pos for s, pos in by_subject.items() if s not in skipped}
+        for triple in list(parser.unconsumed_triples(
+                rest, {self.context.uri: self.context})):
+            self.context.add(triple)
+        self.annotations = LazyAnnotations(self, subjects)
+        self._annotations = dict()
+        self._spans = None
+        self._checker = None
+
+    def __len__(self):
+        return len(self.annotations)
+
+    @property
+    def materialized(self):
+        """
+        :return: the number of annotations built so far
+        """
+        return len(self._annotations)
+
+    def annotation(self, uri):
+        """
+        :return: the NIFAnnotation `uri` with its units, built on the first
+            call
+        """
+        ann = self._annotations.get(uri)
+        if ann is not None:
+            return ann
+        built = dict()
+        ann = parser.build_annotation(uri, self._by_subject, self.context,
+                                      built)
+        # values of the slots not kept by the records, see
+        # `nif.parser.build_document`
+        for triple in list(parser.unconsumed_triples(
+                {s: self._by_subject.get(s, ()) for s in built}, built)):
+            self.context.add(triple)
+        if self._validate:
+            if self._checker is None:
+                self._checker = NIFDocument(context=self.context)
+            self._checker.validate_annotations([ann])
+        self._annotations[uri] = ann
+        return ann
+
+    def _span_index(self):
+        if self._spans is None:
+            begin_ref = nif_ns.beginIndex
+            end_ref = nif_ns.endIndex
+            spans = SpanIndex()
+            for s in self.annotations.uris:
+                begin = end = None
+                for p, o in self._by_subject[s]:
+                    if p == begin_ref:
+                        begin = o
+                    elif p == end_ref:
+                        end = o
+                try:
+                    spans.add(int(begin), int(end), s)
+                except (TypeError, ValueError):
+                    continue
+            self._spans = spans
+        return self._spans
+
+    def to_document(self, annotations=None):
+        """
+        :param annotations: the annotations of the document, e.g. a filtered
+            `LazyAnnotations`; all by default. The ones built by the view
+            were validated already, the others are only validated if the
+            view validates its annotations.
+        :return: NIFDocument with the context of the view
+        """
+        if annotations is None:
+            annotations = self.annotations
+        anns = list(annotations)
+        doc = self._document_class(context=self.context)
+        if self._validate:
+            built = {id(ann) for ann in self._annotations.values()}
+            doc.validate_annotations([ann for ann in anns
+                                      if id(ann) not in built])
+        return doc.add_annotations(anns, validate=False)
@@ -0,0 +1,154 @@
+"""
+Merging of the outputs of several extractors run on the same text, see
+`NIFDocument.merge`.
+
+The annotations of all documents are aligned by span in one sorted sweep.
+The annotations sharing a span, hence the `do_suffix_offset` subject, become
+a single annotation holding the union of their triples; their annotation
+units are selected by a policy:
+
+* `'all'`: every distinct unit is kept,
+* `'confidence'`: the unit with the highest `itsrdf:taConfidence`,
+* `'annotator'`: the units of the first annotator of `annotators`
+  (`itsrdf:taAnnotatorsRef`) present on the span, all if there is none,
+* or a function taking the list of the units of a span and returning the
+  units to keep.
+"""
+import heapq
+import math
+
+import rdflib
+
+from nif.annotation import nif_ns
+from nif.namespace import itsrdf_ns
+
+POLICIES = ('all', 'confidence', 'annotator')
+
+_merged_separately = frozenset((nif_ns.beginIndex, nif_ns.endIndex,
+                                nif_ns.referenceContext,
+                                nif_ns.annotationUnit))
+
+
+def _unit_key(au):
+    return frozenset((p, o) for s, p, o in au if s == au.uri)
+
+
+def _confidence(au):
+    value = au.itsrdf__ta_confidence
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return -math.inf
+
+
+def _check_policy(policy):
+    if not callable(policy) and policy not in POLICIES:
+        raise ValueError('Unknown merge policy {}, use one of {} or a '
+                         'function.'.format(policy, POLICIES))
+
+
+def _select_units(units, policy, annotators):
+    distinct = []
+    keys = set()
+    for au in units:
+        key = _unit_key(au)
+        if key not in keys:
+            keys.add(key)
+            distinct.append(au)
+    if callable(policy):
+        return policy(distinct)
+    elif policy == 'all':
+        return distinct
+    elif policy == 'confidence':
+        return [max(distinct, key=_confidence)] if distinct else []
+    for annotator in annotators or ():
+        annotator = str(annotator)
+        preferred = [au for au in distinct
+                     if any(str(o) == annotator for o in au.objects(
+                         au.uri, itsrdf_ns.taAnnotatorsRef))]
+        if preferred:
+            return preferred
+    return distinct
+
+
+def merge_context(context, other):
+    """
+    Add the triples of the context `other` to `context`, its URI is replaced
+    by the URI of `context`.
+
+    :raise ValueError: if the strings of the contexts differ
+    """
+    if other.text != context.text:
+        raise ValueError('The contexts {} and {} have different strings and '
+                         'can not be merged.'.format(context.uri, other.uri))
+    for s, p, o in other:
+        context.add((context.uri if s == other.uri else s, p,
+                     context.uri if o == other.uri else o))
+
+
+def merge_annotations(context, group, policy='all', annotators=None):
+    """
+    :param group: non-empty list of annotations with the same span
+    :return: NIFAnnotation referring to `context` with the triples of all
+        the annotations of `group` and the units selected by `policy`
+    """
+    _check_policy(policy)
+    merged = group[0].copy_to(context)
+    units = list(merged.annotation_units.values())
+    for ann in group[1:]:
+        for s, p, o in ann:
+            if s != ann.uri:
+                merged.add((s, p, o))
+            elif p not in _merged_separately:
+                merged.add((merged.uri, p, o))
+        units.extend(au.copy(uri=None if isinstance(au.uri, rdflib.BNode)
+                             else au.uri)
+                     for au in ann.annotation_units.values())
+    kept = {id(au) for au in _select_units(units, policy, annotators)}
+    for au in list(merged.annotation_units.values()):
+        if id(au) not in kept:
+            merged.remove_annotation_unit(au.uri, validate=False)
+    for au in units:
+        if id(au) in kept and au.uri not in merged.annotation_units:
+            merged.add_annotation_unit(au, validate=False)
+    return merged
+
+
+def merge(docs, policy='all', annotators=None, document_class=None,
+          validate=True):
+    """
+    :param docs: documents with the same context string
+    :param policy: see the module docstring
+    :param annotators: preferred annotators, for the `'annotator'` policy
+    :param document_class: class of the result, the class of the first
+        document by default
+    :param validate: if False the merged annotations are not validated
+    :return: a new document with a copy of the context of the first document
+    """
+    if not docs:
+        raise ValueError('No documents to merge.')
+    _check_policy(policy)
+    if document_class is None:
+        document_class = type(docs[0])
+    context = docs[0].context.__copy__()
+    for doc in docs[1:]:
+        merge_context(context, doc.context)
+    # the annotations of a document are usually sorted already, so are
+    # sorted in linear time, and merged in a single sweep
+    sweep = heapq.merge(*(
+        sorted(((ann.begin_end_index, i, j, ann)
+                for j, ann in enumerate(doc.annotations)),
+               key=lambda x: x[:3])
+        for i, doc in enumerate(docs)), key=lambda x: x[:3])
+    anns = []
+    group = []
+    for span, _, _, ann in sweep:
+        if group and span != group[0].begin_end_index:
+            anns.append(merge_annotations(context, group, policy,
+                                          annotators))
+            group = []
+        group.append(ann)
+    if group:
+        anns.append(merge_annotations(context, group, policy, annotators))
+    out = document_class(context=context)
+    return out.add_annotations(anns, validate=validate)
@@ -0,0 +1,525 @@
+import re
+from urllib.parse import urljoin
+
+import rdflib
+
+from nif import terms
+from nif.namespace import ns_dict
+from nif.writer import JSONLD_FORMATS, NT_FORMATS
+
+nif_ns = ns_dict['nif']
+
+TURTLE_FORMATS = ('ttl', 'turtle', 'n3')
+
+_xsd_integer = rdflib.XSD.integer
+_xsd_decimal = rdflib.XSD.decimal
+_xsd_double = rdflib.XSD.double
+_xsd_boolean = rdflib.XSD.boolean
+
+
+class ParseError(ValueError):
+    """
+    Raised if the input is not supported by the fast parsers.
+    """
+
+
+_echar = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))',
+                    re.DOTALL)
+_echars = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f',
+           '"': '"', "'": "'", '\\': '\\'}
+
+
+def _unescape_char(m):
+    if m.group(1) or m.group(2):
+        return chr(int(m.group(1) or m.group(2), 16))
+    try:
+        return _echars[m.group(3)]
+    except KeyError:
+        raise ParseError('Unknown escape sequence \\{}'.format(m.group(3)))
+
+
+def unescape(value):
+    if '\\' not in value:
+        return value
+    return _echar.sub(_unescape_char, value)
+
+
+_nt_iri = r'<([^>]*)>'
+_nt_bnode = r'_:(\S+)'
+_nt_literal = (r'"((?:[^"\\]|\\.)*)"'
+               r'(?:@([a-zA-Z]+(?:-[a-zA-Z0-9]+)*)|\^\^<([^>]*)>)?')
+_nt_line = re.compile(
+    r'\s*(?:{iri}|{bnode})\s*{iri}\s*(?:{iri}|{bnode}|{literal})\s*\.\s*'
+    r'(?:#.*)?$'.format(iri=_nt_iri, bnode=_nt_bnode, literal=_nt_literal))
+_nt_term = re.compile(r'(?:{iri}|{bnode}|{literal})$'.format(
+    iri=_nt_iri, bnode=_nt_bnode, literal=_nt_literal))
+
+
+def parse_nt_term(text, bnodes=None):
+    """
+    Inverse of `nif.writer.nt_term`.
+
+    :param dict bnodes: label -> BNode, the blank nodes with the same label
+        are the same within one dict
+    :return: rdflib term
+    """
+    m = _nt_term.match(text)
+    if m is None:
+        raise ParseError('Not a valid N-Triples term: {}'.format(text))
+    iri, label, lexical, lang, datatype = m.groups()
+    if iri is not None:
+        return rdflib.URIRef(unescape(iri))
+    elif label is not None:
+        if bnodes is None:
+            return rdflib.BNode()
+        try:
+            return bnodes[label]
+        except KeyError:
+            bnodes[label] = rdflib.BNode()
+            return bnodes[label]
+    elif datatype is not None:
+        return rdflib.Literal(unescape(lexical),
+                              datatype=rdflib.URIRef(unescape(datatype)))
+    return rdflib.Literal(unescape(lexical), lang=lang)
+
+
+def iter_ntriples(data):
+    """
+    Stream the triples of an N-Triples document line by line.
+
+    :param data: str or iterable of lines
+    :return: generator over (s, p, o)
+    """
+    if isinstance(data, str):
+        data = data.splitlines()
+    bnodes = dict()
+    # the same IRIs come again and again, build every URIRef once
+    uris = dict()
+
+    def bnode(label):
+        try:
+            return bnodes[label]
+        except KeyError:
+            bnodes[label] = rdflib.BNode()
+            return bnodes[label]
+
+    def uri(value):
+        try:
+            return uris[value]
+        except KeyError:
+            uris[value] = terms.uri_ref(unescape(value))
+            return uris[value]
+
+    for line_n, line in enumerate(data, 1):
+        m = _nt_line.match(line)
+        if m is None:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            raise ParseError('Line {}: not a valid N-Triples line: '
+                             '{}'.format(line_n, stripped))
+        (s_iri, s_bnode, p_iri, o_iri, o_bnode,
+         o_lex, o_lang, o_dt) = m.groups()
+        s = uri(s_iri) if s_iri is not None else bnode(s_bnode)
+        if o_iri is not None:
+            o = uri(o_iri)
+        elif o_bnode is not None:
+            o = bnode(o_bnode)
+        elif o_dt is not None:
+            o = terms.literal(unescape(o_lex), uri(o_dt))
+        else:
+            o = rdflib.Literal(unescape(o_lex), lang=o_lang)
+        yield s, uri(p_iri), o
+
+
+_pn_local_esc = r"\\[_~.\-!$&'()*+,;=/?#@%]"
+_plx = r'(?:%[0-9A-Fa-f]{2}|' + _pn_local_esc + r')'
+_long_string = (r'"""(?:(?:"|"")?(?:[^"\\]|\\.))*"""|'
+                r"'''(?:(?:'|'')?(?:[^'\\]|\\.))*'''")
+_pn_chars_first = r'(?:[\w:\-]|' + _plx + r')'
+_pname = (r'(?:[A-Za-z](?:[\w\-.]*[\w\-])?)?:'
+          r'(?:' + _pn_chars_first + r'(?:(?:[\w.:\-]|' + _plx + r')*' +
+          _pn_chars_first + r')?)?')
+_turtle_tokens = re.compile(r'''
+    (?P<ws>(?:\s|\#[^\n]*)+)
+  | (?P<iri><(?:[^<>"{}|^`\\\x00-\x20]|\\u[0-9A-Fa-f]{4}|\\U[0-9A-Fa-f]{8})*>)
+  | (?P<long_string>''' + _long_string + r''')
+  | (?P<string>"(?:[^"\\\n\r]|\\.)*"|'(?:[^'\\\n\r]|\\.)*')
+  | (?P<langtag>@[a-zA-Z]+(?:-[a-zA-Z0-9]+)*)
+  | (?P<datatype_mark>\^\^)
+  | (?P<double>[+-]?(?:[0-9]+\.[0-9]*[eE][+-]?[0-9]+|\.?[0-9]+[eE][+-]?[0-9]+))
+  | (?P<decimal>[+-]?[0-9]*\.[0-9]+)
+  | (?P<integer>[+-]?[0-9]+)
+  | (?P<bnode>_:[\w](?:[\w\-.]*[\w\-])?)
+  | (?P<pname>''' + _pname + r''')
+  | (?P<word>[A-Za-z]+)
+  | (?P<punct>[;,.\[\]()])
+''', re.VERBOSE | re.DOTALL)
+
+
+class _TurtleParser:
+    """
+    Recursive descent parser of Turtle emitting the triples in document
+    order. N3 extensions (formulas, paths, ...) are not supported.
+    """
+    def __init__(self, data, emit):
+        self.data = data
+        self.pos = 0
+        self.emit = emit
+        self.prefixes = dict()
+        self.base = ''
+        self.bnodes = dict()
+        self.uris = dict()
+        self._next()
+
+    def _next(self):
+        data = self.data
+        while True:
+            if self.pos >= len(data):
+                self.kind, self.value = 'eof', None
+                return
+            m = _turtle_tokens.match(data, self.pos)
+            if m is None:
+                raise ParseError('Unexpected input at char {}: {!r}'.format(
+                    self.pos, data[self.pos:self.pos + 30]))
+            self.pos = m.end()
+            if m.lastgroup != 'ws':
+                self.kind, self.value = m.lastgroup, m.group()
+                return
+
+    def _expect(self, value):
+        if self.value != value:
+            raise ParseError('Expected {!r} at char {}, got {!r}'.format(
+                value, self.pos, self.value))
+        self._next()
+
+    def parse(self):
+        while self.kind != 'eof':
+            if self.kind == 'langtag' and self.value in ('@prefix', '@base'):
+                self._directive(self.value[1:])
+                self._expect('.')
+            elif self.kind == 'word' and self.value.lower() in ('prefix',
+                                                                'base'):
+                self._directive(self.value.lower())
+            else:
+                self._triples()
+                self._expect('.')
+
+    def _directive(self, name):
+        self._next()
+        if name == 'prefix':
+            if self.kind != 'pname' or not self.value.endswith(':'):
+                raise ParseError('Bad prefix declaration at char '
+                                 '{}'.format(self.pos))
+            prefix = self.value[:-1]
+            self._next()
+            self.prefixes[prefix] = self._iri_value()
+        else:
+            self.base = self._iri_value()
+        self._next()
+
+    def _iri_value(self):
+        if self.kind != 'iri':
+            raise ParseError('IRI expected at char {}'.format(self.pos))
+        iri = unescape(self.value[1:-1])
+        if self.base and ':' not in iri.split('/', 1)[0]:
+            iri = urljoin(self.base, iri)
+        return iri
+
+    def _triples(self):
+        if self.value == '[':
+            subject = self._blank_node_property_list()
+            if self.value != '.':
+                self._predicate_object_list(subject)
+        else:
+            subject = self._subject()
+            self._predicate_object_list(subject)
+
+    def _subject(self):
+        if self.kind in ('iri', 'pname'):
+            return self._iri()
+        elif self.kind == 'bnode':
+            return self._bnode()
+        elif self.value == '(':
+            return self._collection()
+        raise ParseError('Unexpected {!r} at char {}'.format(
+            self.value, self.pos))
+
+    def _iri(self):
+        key = (self.value, self.base) if self.kind == 'iri' else \
+            (self.value, self.prefixes.get(self.value.split(':', 1)[0]))
+        try:
+            out = self.uris[key]
+        except KeyError:
+            if self.kind == 'iri':
+                out = terms.uri_ref(self._iri_value())
+            else:
+                prefix, local = self.value.split(':', 1)
+                if key[1] is None:
+                    raise ParseError('Prefix {!r} is not '
+                                     'declared'.format(prefix))
+                out = terms.uri_ref(key[1] + re.sub(r'\\(.)', r'\1', local))
+            self.uris[key] = out
+        self._next()
+        return out
+
+    def _bnode(self):
+        label = self.value[2:]
+        self._next()
+        try:
+            return self.bnodes[label]
+        except KeyError:
+            self.bnodes[label] = rdflib.BNode()
+            return self.bnodes[label]
+
+    def _predicate_object_list(self, subject):
+        while True:
+            if self.kind == 'word' and self.value == 'a':
+                predicate = rdflib.RDF.type
+                self._next()
+            else:
+                predicate = self._iri()
+            self._object_list(subject, predicate)
+            if self.value != ';':
+                return
+            while self.value == ';':
+                self._next()
+            if self.value in ('.', ']'):
+                return
+
+    def _object_list(self, subject, predicate):
+        self.emit(subject, predicate, self._object())
+        while self.value == ',':
+            self._next()
+            self.emit(subject, predicate, self._object())
+
+    def _object(self):
+        kind = self.kind
+        if kind in ('iri', 'pname'):
+            return self._iri()
+        elif kind == 'bnode':
+            return self._bnode()
+        elif kind in ('string', 'long_string'):
+            return self._literal()
+        elif kind == 'integer':
+            return self._number(_xsd_integer)
+        elif kind == 'decimal':
+            return self._number(_xsd_decimal)
+        elif kind == 'double':
+            return self._number(_xsd_double)
+        elif kind == 'word' and self.value in ('true', 'false'):
+            return self._number(_xsd_boolean)
+        elif self.value == '[':
+            return self._blank_node_property_list()
+        elif self.value == '(':
+            return self._collection()
+        raise ParseError('Unexpected {!r} at char {}'.format(
+            self.value, self.pos))
+
+    def _number(self, datatype):
+        out = terms.literal(self.value, datatype)
+        self._next()
+        return out
+
+    def _literal(self):
+        quote_len = 3 if self.kind == 'long_string' else 1
+        lexical = unescape(self.value[quote_len:-quote_len])
+        self._next()
+        if self.kind == 'langtag':
+            out = rdflib.Literal(lexical, lang=self.value[1:])
+            self._next()
+        elif self.kind == 'datatype_mark':
+            self._next()
+            out = terms.literal(lexical, self._iri())
+        else:
+            out = rdflib.Literal(lexical)
+        return out
+
+    def _blank_node_property_list(self):
+        self._expect('[')
+        node = rdflib.BNode()
+        if self.value != ']':
+            self._predicate_object_list(node)
+        self._expect(']')
+        return node
+
+    def _collection(self):
+        self._expect('(')
+        items = []
+        while self.value != ')':
+            items.append(self._object())
+        self._next()
+        if not items:
+            return rdflib.RDF.nil
+        head = node = rdflib.BNode()
+        for i, item in enumerate(items):
+            self.emit(node, rdflib.RDF.first, item)
+            rest = rdflib.BNode() if i + 1 < len(items) else rdflib.RDF.nil
+            self.emit(node, rdflib.RDF.rest, rest)
+            node = rest
+        return head
+
+
+def iter_turtle(data):
+    """
+    :param str data: Turtle document
+    :return: list of (s, p, o) in document order
+    """
+    out = []
+    _TurtleParser(data, lambda s, p, o: out.append((s, p, o))).parse()
+    return out
+
+
+def group_by_subject(triples):
+    """
+    :return: dict subject -> list of (predicate, object), in input order
+    """
+    by_subject = dict()
+    for s, p, o in triples:
+        try:
+            by_subject[s].append((p, o))
+        except KeyError:
+            by_subject[s] = [(p, o)]
+    return by_subject
+
+
+def find_context(by_subject, context_class=nif_ns.Context):
+    """
+    :param dict by_subject: see `group_by_subject`
+    :raise ValueError: if there is no subject of class `context_class`
+    :return: NIFContext built from the first subject of class
+        `context_class`
+    """
+    from nif.annotation import NIFContext
+    type_ref = rdflib.RDF.type
+    for s, pos in by_subject.items():
+        if (type_ref, context_class) in pos:
+            return NIFContext.from_triples([(s, p, o) for p, o in pos],
+                                           context_uri=s)
+    raise ValueError('Provided RDF does not contain a context of class '
+                     '{}.'.format(context_class))
+
+
+def annotation_subjects(by_subject, context_uri):
+    """
+    :return: list of the subjects of class nif:Annotation referring to the
+        context `context_uri`, in the order of `by_subject`
+    """
+    type_ref = rdflib.RDF.type
+    ref_cxt = (nif_ns.referenceContext, context_uri)
+    annotation = (type_ref, nif_ns.Annotation)
+    return [s for s, pos in by_subject.items()
+            if s != context_uri and ref_cxt in pos and annotation in pos]
+
+
+def build_annotation(subject, by_subject, context, consumed=None):
+    """
+    Build the annotation `subject` and its units, not validated.
+
+    :param consumed: optional dict of the records already built by uri, the
+        annotation and its units are added to it. Units already in it, e.g.
+        shared with another annotation, are attached but not built again.
+    :return: NIFAnnotation
+    """
+    from nif.annotation import NIFAnnotation, NIFAnnotationUnit
+    if consumed is None:
+        consumed = dict()
+    annotation_unit_ref = nif_ns.annotationUnit
+    pos = by_subject[subject]
+    ann = NIFAnnotation.from_triples(
+        [(subject, p, o) for p, o in pos], ref_cxt=context, validate=False)
+    consumed[subject] = ann
+    for p, au_uri in pos:
+        if p != annotation_unit_ref:
+            continue
+        au = consumed.get(au_uri)
+        if au is None:
+            au = NIFAnnotationUnit(uri=au_uri)
+            au += [(au_uri, au_p, au_o)
+                   for au_p, au_o in by_subject.get(au_uri, ())]
+            consumed[au_uri] = au
+        elif not isinstance(au, NIFAnnotationUnit):
+            continue
+        ann.add_annotation_unit(au, validate=False)
+    return ann
+
+
+def unconsumed_triples(by_subject, consumed):
+    """
+    :param dict consumed: records by uri, see `build_annotation`
+    :return: generator over the triples of `by_subject` that are not kept by
+        the records of `consumed`
+    """
+    for s, pos in by_subject.items():
+        record = consumed.get(s)
+        if record is None:
+            for p, o in pos:
+                yield s, p, o
+            continue
+        # only the values of the slots (offsets, anchors, ...) are
+        # normalized by the records, everything else is kept as is
+        slots = record._slot_predicates
+        for p, o in pos:
+            if p in slots and (s, p, o) not in record:
+                yield s, p, o
+
+
+def build_document(by_subject, context_class=nif_ns.Context,
+                   document_class=None):
+    """
+    Build a `NIFDocument` in one pass over triples grouped by subject. The
+    context is the first subject of class `context_class`, the annotations
+    are the subjects of class nif:Annotation referring to it; all the triples
+    not describing the annotations and their units are kept in the context.
+
+    :param dict by_subject: see `group_by_subject`
+    :return: NIFDocument
+    """
+    if document_class is None:
+        from nif.annotation import NIFDocument as document_class
+    context = find_context(by_subject, context_class)
+    consumed = {context.uri: context}
+    annotations = [build_annotation(s, by_subject, context, consumed)
+                   for s in annotation_subjects(by_subject, context.uri)
+                   if s not in consumed]
+    for triple in list(unconsumed_triples(by_subject, consumed)):
+        context.add(triple)
+    return document_class(context=context, annotations=annotations)
+
+
+def parse_by_subject(data, format='turtle'):
+    """
+    Parse N-Triples, Turtle or JSON-LD (see `nif.jsonld`) with the single
+    pass parsers.
+
+    :raise ParseError: if the input is not supported by the fast parsers
+    :return: dict, see `group_by_subject`
+    """
+    if format in JSONLD_FORMATS:
+        from nif import jsonld
+        return jsonld.parse_by_subject(data)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    if format in NT_FORMATS:
+        triples = iter_ntriples(data)
+    elif format in TURTLE_FORMATS:
+        triples = iter_turtle(data)
+    else:
+        raise ParseError('Format {} is not supported by the fast '
+                         'parsers.'.format(format))
+    return group_by_subject(triples)
+
+
+def parse_document(data, format='turtle', context_class=nif_ns.Context,
+                   document_class=None):
+    """
+    Single pass loader of N-Triples and Turtle NIF documents: the triples
+    are grouped by subject as they are parsed and the context, annotations
+    and units are constructed directly, no `rdflib.Graph` is involved.
+
+    :raise ParseError: if the input is not supported by the fast parsers
+    :return: NIFDocument
+    """
+    return build_document(parse_by_subject(data, format=format),
+                          context_class=context_class,
+                          document_class=document_class)
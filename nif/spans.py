@@ -0,0 +1,202 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class SpanIndex:
+    """
+    Static interval tree over half-open character spans [begin, end).
+
+    The spans are kept sorted by (begin, end) with two implicit segment
+    trees on top holding the maximal and the minimal end of every block,
+    and a second ordering by end for the nearest neighbour search. Queries
+    descend only into blocks that can contain a hit, so their cost is
+    logarithmic in the number of spans plus the size of the output.
+    Additions, removals and moves are buffered and the structure is rebuilt
+    on the next query.
+    """
+    def __init__(self, spans=(), key=None):
+        """
+        :param spans: iterable of (begin, end, item) triples
+        :param key: function item -> (begin, end) giving the current span of
+            an item, needed by `move`
+        """
+        self._entries = []
+        self._dirty = True
+        self._size = 0
+        self._key = key
+        self._moved = dict()  # id(item) -> item whose span may have changed
+        self.update(spans)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        self._build()
+        return iter(self._items)
+
+    def add(self, begin, end, item):
+        self._entries.append((begin, end, item))
+        self._dirty = True
+
+    def update(self, spans):
+        for begin, end, item in spans:
+            self.add(begin, end, item)
+
+    def remove(self, item):
+        """
+        Remove all spans holding `item` (compared by identity).
+        """
+        self.remove_all([item])
+
+    def remove_all(self, items):
+        """
+        Remove all spans holding any of `items` (compared by identity) in a
+        single pass.
+        """
+        ids = {id(item) for item in items}
+        if ids:
+            self._entries = [e for e in self._entries if id(e[2]) not in ids]
+            for key in ids:
+                self._moved.pop(key, None)
+            self._dirty = True
+
+    def move(self, item):
+        """
+        Mark the span of `item` as possibly changed, it is read again with
+        `key` on the next query.
+        """
+        self._moved[id(item)] = item
+
+    def clear(self):
+        self._entries = []
+        self._moved = dict()
+        self._dirty = True
+
+    def __getstate__(self):
+        # the moves are keyed by id
+        if self._moved:
+            self._apply_moves()
+        return self.__dict__.copy()
+
+    def _apply_moves(self):
+        moved = self._moved
+        self._moved = dict()
+        for i, (begin, end, item) in enumerate(self._entries):
+            if id(item) in moved:
+                span = self._key(item)
+                if None not in span and span != (begin, end):
+                    self._entries[i] = (span[0], span[1], item)
+                    self._dirty = True
+
+    def _build(self):
+        if self._moved:
+            self._apply_moves()
+        if not self._dirty:
+            return
+        self._entries.sort(key=lambda e: (e[0], e[1]))
+        n = len(self._entries)
+        self._begins = array('l', (e[0] for e in self._entries))
+        self._ends = array('l', (e[1] for e in self._entries))
+        self._items = [e[2] for e in self._entries]
+        size = 1
+        while size < n:
+            size *= 2
+        self._size = size
+        max_end = array('l', [-1]) * (2 * size)
+        min_end = array('l', [2 ** 62]) * (2 * size)
+        max_end[size:size + n] = self._ends
+        min_end[size:size + n] = self._ends
+        for node in range(size - 1, 0, -1):
+            max_end[node] = max(max_end[2 * node], max_end[2 * node + 1])
+            min_end[node] = min(min_end[2 * node], min_end[2 * node + 1])
+        self._max_end = max_end
+        self._min_end = min_end
+        self._by_end = sorted(range(n), key=lambda i: self._ends[i])
+        self._sorted_ends = array('l', (self._ends[i] for i in self._by_end))
+        self._dirty = False
+
+    def _report(self, lo, hi, tree, keep):
+        """
+        Indices lo <= i < hi of the leaves with keep(tree[leaf]), pruning
+        the blocks for which keep(tree[block]) is False.
+        """
+        out = []
+        if hi <= lo:
+            return out
+        stack = [(1, 0, self._size)]
+        while stack:
+            node, node_lo, node_hi = stack.pop()
+            if node_lo >= hi or node_hi <= lo or not keep(tree[node]):
+                continue
+            if node >= self._size:
+                out.append(node_lo)
+            else:
+                mid = (node_lo + node_hi) // 2
+                stack.append((2 * node + 1, mid, node_hi))
+                stack.append((2 * node, node_lo, mid))
+        return out
+
+    def overlapping(self, begin, end):
+        """
+        :return: items of the spans sharing at least one character with
+            [begin, end), ordered by (begin, end)
+        """
+        self._build()
+        hi = bisect_left(self._begins, end)
+        idxs = self._report(0, hi, self._max_end, lambda x: x > begin)
+        return [self._items[i] for i in idxs]
+
+    def containing(self, pos):
+        """
+        :return: items of the spans covering the character at `pos`
+        """
+        return self.overlapping(pos, pos + 1)
+
+    def within(self, begin, end):
+        """
+        :return: items of the spans lying inside [begin, end)
+        """
+        self._build()
+        lo = bisect_left(self._begins, begin)
+        hi = bisect_right(self._begins, end)
+        idxs = self._report(lo, hi, self._min_end, lambda x: x <= end)
+        return [self._items[i] for i in idxs]
+
+    def nearest(self, pos, k=1):
+        """
+        :return: up to `k` items closest to the position `pos`. The distance
+            is 0 for the spans covering `pos`, otherwise the number of
+            characters between `pos` and the span.
+        """
+        self._build()
+        found = []
+        for item in self.containing(pos):
+            if len(found) == k:
+                return found
+            found.append(item)
+        # spans after pos by increasing begin, spans before pos by
+        # decreasing end
+        right = bisect_right(self._begins, pos)
+        left = bisect_right(self._sorted_ends, pos) - 1
+        candidates = []
+        if right < len(self._begins):
+            heapq.heappush(candidates,
+                           (self._begins[right] - pos, 1, right))
+        if left >= 0:
+            heapq.heappush(candidates,
+                           (pos - self._sorted_ends[left] + 1, 0, left))
+        while candidates and len(found) < k:
+            dist, side, i = heapq.heappop(candidates)
+            if side:
+                found.append(self._items[i])
+                if i + 1 < len(self._begins):
+                    heapq.heappush(candidates,
+                                   (self._begins[i + 1] - pos, 1, i + 1))
+            else:
+                found.append(self._items[self._by_end[i]])
+                if i > 0:
+                    heapq.heappush(
+                        candidates,
+                        (pos - self._sorted_ends[i - 1] + 1, 0, i - 1))
+        return found
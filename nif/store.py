@@ -0,0 +1,320 @@
+"""
+Compact binary file format of a `NIFDocument`.
+
+The file starts with the magic bytes and the offset of a JSON header
+describing the sections, every section is aligned to 8 bytes::
+
+    MAGIC | header offset (uint64) | sections ... | header
+
+The `text` section holds the raw UTF-8 context string. The annotations and
+their units are stored as the little endian fixed width columns of
+`nif.columnar.ColumnarAnnotations`, the paragraphs, sentences and words of
+`nif.structure` as interleaved begin and end offsets. Every URI and literal
+is stored once in the `terms` table (N-Triples syntax, one line per term,
+indexed by `term_offsets`) and referred to by its index everywhere else.
+Triples outside of the columns are stored as rows of term indices.
+"""
+import json
+import mmap as mmap_module
+import struct
+import sys
+from array import array
+
+import rdflib
+
+from nif.annotation import NIFContext, NIFDocument, nif_ns
+from nif.columnar import ColumnarAnnotations, NO_TERM
+from nif.parser import parse_nt_term
+from nif.structure import Segmentation
+from nif.writer import nt_term
+
+MAGIC = b'NIFSTORE'
+VERSION = 1
+_offset = struct.Struct('<Q')
+_align = 8
+_column_names = ('begin', 'end', 'unit_ann', 'unit_ident', 'unit_class',
+                 'unit_annotator', 'unit_confidence_dt')
+_layer_names = ('paragraphs', 'sentences', 'words')
+
+
+def _to_bytes(typecode, values):
+    out = array(typecode, values)
+    if sys.byteorder != 'little':
+        out.byteswap()
+    return out.tobytes()
+
+
+def save(doc, path):
+    """
+    Write `doc` to `path` in the store format.
+
+    :param NIFDocument doc:
+    :return: the number of bytes written
+    """
+    cols = ColumnarAnnotations.from_document(doc)
+    context = doc.context
+    text = context.text
+    context_rows = []
+    for s, p, o in context:
+        if s == context.uri and p == nif_ns.isString:
+            continue
+        context_rows.extend((cols.intern(s), cols.intern(p), cols.intern(o)))
+    anchor_rows = []
+    for ann_idx, anchor in sorted(cols.anchors.items()):
+        anchor_rows.extend((ann_idx, cols.intern(anchor)))
+    unit_uri_rows = []
+    for unit_idx, uri in sorted(cols.unit_uris.items()):
+        unit_uri_rows.extend((unit_idx, cols.intern(uri)))
+    extra_rows = dict()
+    for name, extra in (('ann_extra', cols.ann_extra),
+                        ('unit_extra', cols.unit_extra)):
+        rows = extra_rows[name] = []
+        for idx, triples in sorted(extra.items()):
+            for s, p, o in triples:
+                rows.extend((idx, cols.intern(s), cols.intern(p),
+                             cols.intern(o)))
+    context_uri = cols.intern(context.uri)
+
+    term_lines = [nt_term(term).encode('utf-8') for term in cols.terms]
+    term_offsets = [0]
+    for line in term_lines:
+        term_offsets.append(term_offsets[-1] + len(line))
+
+    sections = [('text', 'B', text.encode('utf-8')),
+                ('terms', 'B', b''.join(term_lines)),
+                ('term_offsets', 'q', _to_bytes('q', term_offsets)),
+                ('anchor_kind', 'b', cols.anchor_kind.tobytes()),
+                ('unit_confidence', 'd',
+                 _to_bytes('d', cols.unit_confidence)),
+                ('context', 'q', _to_bytes('q', context_rows)),
+                ('anchors', 'q', _to_bytes('q', anchor_rows)),
+                ('unit_uris', 'q', _to_bytes('q', unit_uri_rows))]
+    sections.extend((name, 'q', _to_bytes('q', getattr(cols, name)))
+                    for name in _column_names)
+    sections.extend((name, 'q', _to_bytes('q', rows))
+                    for name, rows in extra_rows.items())
+    if cols.structure is not None and len(cols.structure):
+        for name in _layer_names:
+            layer = getattr(cols.structure, name)
+            offsets = [0] * (2 * len(layer))
+            offsets[::2] = layer.begin
+            offsets[1::2] = layer.end
+            sections.append((name, 'q', _to_bytes('q', offsets)))
+
+    header = {'version': VERSION, 'context_uri': context_uri,
+              'n_annotations': len(cols), 'n_units': cols.n_units,
+              'sections': dict()}
+    is_string = context.nif__is_string
+    if isinstance(is_string, rdflib.Literal):
+        if is_string.language:
+            header['text_lang'] = is_string.language
+        elif is_string.datatype:
+            header['text_datatype'] = str(is_string.datatype)
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_offset.pack(0))
+        for name, typecode, data in sections:
+            f.write(b'\0' * (-f.tell() % _align))
+            header['sections'][name] = [f.tell(), len(data), typecode]
+            f.write(data)
+        header_offset = f.tell()
+        f.write(json.dumps(header).encode('utf-8'))
+        size = f.tell()
+        f.seek(len(MAGIC))
+        f.write(_offset.pack(header_offset))
+    return size
+
+
+class _Terms:
+    """
+    Read-only list of the terms of a store, every term is parsed on the
+    first access.
+    """
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+        self._terms = dict()
+        self._bnodes = dict()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        try:
+            return self._terms[idx]
+        except KeyError:
+            pass
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        line = bytes(self._blob[self._offsets[idx]:self._offsets[idx + 1]])
+        term = parse_nt_term(line.decode('utf-8'), bnodes=self._bnodes)
+        self._terms[idx] = term
+        return term
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class DocumentStore:
+    """
+    Lazy reader of a file written by `save`.
+
+    Opening a store only reads the header. The offset columns are
+    zero-copy views of the (memory-mapped) file, the context text, the
+    terms and the annotations are decoded on the first access, so single
+    annotations can be read without loading the whole document::
+
+        with DocumentStore(path) as store:
+            for idx in store.columnar.select(begin=0, end=1000):
+                ann = store.annotation(idx)
+
+    The views are released by `close`.
+    """
+    def __init__(self, path, mmap=True):
+        """
+        :param mmap: if True the file is memory-mapped, otherwise read
+        """
+        with open(path, 'rb') as f:
+            if mmap:
+                self._buffer = mmap_module.mmap(f.fileno(), 0,
+                                                access=mmap_module.ACCESS_READ)
+            else:
+                self._buffer = f.read()
+        self._data = memoryview(self._buffer)
+        if bytes(self._data[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError('{} is not a NIF store file.'.format(path))
+        header_offset, = _offset.unpack_from(self._data, len(MAGIC))
+        self.header = json.loads(bytes(self._data[header_offset:]).decode())
+        if self.header['version'] > VERSION:
+            self.close()
+            raise ValueError('Unsupported NIF store version {}.'.format(
+                self.header['version']))
+        self._views = []
+        self._text = None
+        self._context = None
+        self._columnar = None
+        self._terms = _Terms(self.section('terms'),
+                             self.section('term_offsets'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.header['n_annotations']
+
+    def close(self):
+        for view in getattr(self, '_views', ()):
+            view.release()
+        self._views = []
+        self._columnar = None
+        self._data.release()
+        if isinstance(self._buffer, mmap_module.mmap):
+            self._buffer.close()
+
+    def section(self, name):
+        """
+        :return: read-only view of the section `name`, cast to its type
+        """
+        offset, length, typecode = self.header['sections'][name]
+        view = self._data[offset:offset + length]
+        self._views.append(view)
+        if typecode == 'B':
+            return view
+        if sys.byteorder != 'little':
+            out = array(typecode, view.tobytes())
+            out.byteswap()
+            return out
+        cast = view.cast(typecode)
+        self._views.append(cast)
+        return cast
+
+    def _rows(self, name, width):
+        column = self.section(name)
+        return [tuple(column[i:i + width])
+                for i in range(0, len(column), width)]
+
+    def term(self, term_id):
+        return None if term_id == NO_TERM else self._terms[term_id]
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = bytes(self.section('text')).decode('utf-8')
+        return self._text
+
+    @property
+    def context(self):
+        """
+        :return: NIFContext
+        """
+        if self._context is None:
+            term = self.term
+            is_string = self.text
+            if 'text_lang' in self.header or 'text_datatype' in self.header:
+                is_string = rdflib.Literal(
+                    is_string, lang=self.header.get('text_lang'),
+                    datatype=self.header.get('text_datatype'))
+            context = NIFContext(uri=term(self.header['context_uri']),
+                                 is_string=is_string)
+            for s, p, o in self._rows('context', 3):
+                context.add((term(s), term(p), term(o)))
+            self._context = context
+        return self._context
+
+    @property
+    def columnar(self):
+        """
+        :return: ColumnarAnnotations whose columns are views of the file
+        """
+        if self._columnar is None:
+            term = self.term
+            cols = ColumnarAnnotations(self.context)
+            for name in _column_names + ('anchor_kind', 'unit_confidence'):
+                setattr(cols, name, self.section(name))
+            cols.terms = self._terms
+            cols._term_ids = None
+            cols._units_sorted = True
+            cols.anchors = {idx: term(t)
+                            for idx, t in self._rows('anchors', 2)}
+            cols.unit_uris = {idx: term(t)
+                              for idx, t in self._rows('unit_uris', 2)}
+            for name in ('ann_extra', 'unit_extra'):
+                extra = getattr(cols, name)
+                for idx, s, p, o in self._rows(name, 4):
+                    extra.setdefault(idx, []).append(
+                        (term(s), term(p), term(o)))
+            if any(name in self.header['sections'] for name in _layer_names):
+                cols.structure = Segmentation(self.context)
+                for name in _layer_names:
+                    if name in self.header['sections']:
+                        getattr(cols.structure, name).extend(
+                            self._rows(name, 2))
+            self._columnar = cols
+        return self._columnar
+
+    def annotation(self, idx):
+        """
+        :return: NIFAnnotation number `idx` with its units
+        """
+        return self.columnar.annotation(idx)
+
+    def annotations(self, indices=None):
+        """
+        :param indices: indices of the annotations, all by default
+        :return: generator over NIFAnnotations
+        """
+        if indices is None:
+            indices = range(len(self))
+        for idx in indices:
+            yield self.annotation(idx)
+
+    def document(self, document_class=NIFDocument):
+        """
+        :return: the whole document
+        """
+        return self.columnar.to_document(document_class=document_class)
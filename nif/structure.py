@@ -0,0 +1,389 @@
+"""
+Paragraphs, sentences and words of a context.
+
+The structures of one kind are kept as two sorted offset arrays of a
+`StructureLayer` instead of one record per structure: looking up the word or
+the sentence at a position is a binary search, and `NIFWord`,
+`NIFSentence` and `NIFParagraph` are light views created on access. The
+triples, including the links between neighbours (`nif:nextWord`, ...) and
+between the levels (`nif:sentence`, `nif:firstWord`, ...), are generated
+only when the document is serialized::
+
+    doc.structure.sentences.extend(sentence_spans)
+    doc.structure.words.extend(word_spans)
+    word = doc.structure.words.at(42)
+    word.sentence.words
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+import rdflib
+
+from nif import terms
+from nif.annotation import do_suffix_offset, nif_ns
+
+
+class NIFStructure:
+    """
+    View of the structure number `index` of a `StructureLayer`.
+    """
+    __slots__ = ('layer', 'index')
+
+    def __init__(self, layer, index):
+        self.layer = layer
+        self.index = index
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.layer is self.layer and \
+            other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.layer), self.index))
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.uri)
+
+    @property
+    def begin_end_index(self):
+        """
+        :return: tuple (begin_index, end_index) of ints
+        """
+        return self.layer.begin[self.index], self.layer.end[self.index]
+
+    @property
+    def uri(self):
+        return self.layer.uri(self.index)
+
+    @property
+    def anchor_of(self):
+        """
+        :return: the text of the structure
+        """
+        begin, end = self.begin_end_index
+        return self.layer.segmentation.context.text[begin:end]
+
+    @property
+    def next(self):
+        if self.index + 1 < len(self.layer):
+            return self.layer[self.index + 1]
+        return None
+
+    @property
+    def previous(self):
+        if self.index > 0:
+            return self.layer[self.index - 1]
+        return None
+
+    def _children(self, layer):
+        return [layer[i] for i in layer.within(*self.begin_end_index)]
+
+    def _parent(self, layer):
+        return layer.at(self.begin_end_index[0])
+
+
+class NIFParagraph(NIFStructure):
+    __slots__ = ()
+
+    @property
+    def sentences(self):
+        return self._children(self.layer.segmentation.sentences)
+
+
+class NIFSentence(NIFStructure):
+    __slots__ = ()
+
+    @property
+    def words(self):
+        return self._children(self.layer.segmentation.words)
+
+    @property
+    def paragraph(self):
+        return self._parent(self.layer.segmentation.paragraphs)
+
+
+class NIFWord(NIFStructure):
+    __slots__ = ()
+
+    @property
+    def sentence(self):
+        return self._parent(self.layer.segmentation.sentences)
+
+
+class StructureLayer:
+    """
+    Structures of one kind of a context, sorted and not overlapping, stored
+    as the `begin` and `end` offset arrays.
+    """
+    structure_class = NIFStructure
+    nif_class = None
+    next_predicate = None
+    previous_predicate = None
+
+    def __init__(self, segmentation, spans=()):
+        """
+        :param Segmentation segmentation: the owner of the layer
+        :param spans: iterable of (begin, end) tuples
+        """
+        self.segmentation = segmentation
+        self.begin = array('l')
+        self.end = array('l')
+        self.extend(spans)
+
+    def __len__(self):
+        return len(self.begin)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self.structure_class(self, idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.structure_class(self, idx)
+
+    def extend(self, spans):
+        """
+        Append structures after the last one.
+
+        :param spans: iterable of (begin, end) tuples, sorted
+        :raise ValueError: if the spans overlap, are not sorted or do not fit
+            the context
+        :return: self
+        """
+        length = len(self.segmentation.context.text)
+        last_end = self.end[-1] if len(self) else 0
+        n = len(self)
+        try:
+            for begin, end in spans:
+                begin, end = int(begin), int(end)
+                if not last_end <= begin <= end <= length:
+                    raise ValueError(
+                        'The span {} of a {} does not follow the previous '
+                        'one ending at {} or does not fit the context of '
+                        'length {}.'.format((begin, end),
+                                            self.structure_class.__name__,
+                                            last_end, length))
+                self.begin.append(begin)
+                self.end.append(end)
+                last_end = end
+        except ValueError:
+            del self.begin[n:]
+            del self.end[n:]
+            raise
+        if len(self) != n:
+            self.segmentation._changed()
+        return self
+
+    def clear(self):
+        if len(self):
+            self.begin = array('l')
+            self.end = array('l')
+            self.segmentation._changed()
+
+    def uri(self, idx):
+        return do_suffix_offset(self.segmentation.context.uri,
+                                self.begin[idx], self.end[idx])
+
+    def index_at(self, pos):
+        """
+        :return: the index of the structure covering the character at
+            `pos`, None if there is none
+        """
+        idx = bisect_right(self.begin, pos) - 1
+        if idx >= 0 and pos < self.end[idx]:
+            return idx
+        return None
+
+    def at(self, pos):
+        """
+        :return: the structure covering the character at `pos` or None
+        """
+        idx = self.index_at(pos)
+        return None if idx is None else self.structure_class(self, idx)
+
+    def index_of(self, begin, end):
+        """
+        :return: the index of the structure spanning exactly [`begin`,
+            `end`), None if there is none
+        """
+        idx = bisect_left(self.begin, begin)
+        while idx < len(self) and self.begin[idx] == begin:
+            if self.end[idx] == end:
+                return idx
+            idx += 1
+        return None
+
+    def within(self, begin, end):
+        """
+        :return: range of the indices of the structures lying inside
+            [`begin`, `end`)
+        """
+        return range(bisect_left(self.begin, begin),
+                     bisect_right(self.end, end))
+
+    def _links(self, idx, uris):
+        """
+        :return: list of (predicate, object) pairs linking the structure
+            `idx` to other structures
+        """
+        out = []
+        if self.next_predicate is not None and idx + 1 < len(self):
+            out.append((self.next_predicate, uris(self, idx + 1)))
+        if self.previous_predicate is not None and idx > 0:
+            out.append((self.previous_predicate, uris(self, idx - 1)))
+        return out
+
+    def iter_subjects(self, uris, previous_layers=()):
+        """
+        :param uris: function (layer, idx) -> URI
+        :param previous_layers: layers whose triples are already generated;
+            a structure with the same span, hence the same URI, as one of
+            theirs only gets its class and its links
+        :return: generator over (URI, list of (predicate, object)) of every
+            structure
+        """
+        context = self.segmentation.context
+        text = context.text
+        for idx in range(len(self)):
+            begin, end = self.begin[idx], self.end[idx]
+            pos = [(rdflib.RDF.type, self.nif_class)]
+            if not any(layer.index_of(begin, end) is not None
+                       for layer in previous_layers):
+                pos.extend((
+                    (rdflib.RDF.type, nif_ns.OffsetBasedString),
+                    (nif_ns.beginIndex, terms.offset_literal(begin)),
+                    (nif_ns.endIndex, terms.offset_literal(end)),
+                    (nif_ns.referenceContext, context.uri),
+                    (nif_ns.anchorOf, rdflib.Literal(text[begin:end]))))
+            pos.extend(self._links(idx, uris))
+            yield uris(self, idx), pos
+
+
+class ParagraphLayer(StructureLayer):
+    structure_class = NIFParagraph
+    nif_class = nif_ns.Paragraph
+
+
+class SentenceLayer(StructureLayer):
+    structure_class = NIFSentence
+    nif_class = nif_ns.Sentence
+    next_predicate = nif_ns.nextSentence
+    previous_predicate = nif_ns.previousSentence
+
+    def _links(self, idx, uris):
+        out = super()._links(idx, uris)
+        paragraphs = self.segmentation.paragraphs
+        parent = paragraphs.index_at(self.begin[idx])
+        if parent is not None:
+            out.append((nif_ns.superString, uris(paragraphs, parent)))
+        words = self.segmentation.words.within(self.begin[idx], self.end[idx])
+        if words:
+            out.append((nif_ns.firstWord, uris(self.segmentation.words,
+                                               words[0])))
+            out.append((nif_ns.lastWord, uris(self.segmentation.words,
+                                              words[-1])))
+        return out
+
+
+class WordLayer(StructureLayer):
+    structure_class = NIFWord
+    nif_class = nif_ns.Word
+    next_predicate = nif_ns.nextWord
+    previous_predicate = nif_ns.previousWord
+
+    def _links(self, idx, uris):
+        out = super()._links(idx, uris)
+        sentences = self.segmentation.sentences
+        parent = sentences.index_at(self.begin[idx])
+        if parent is not None:
+            out.append((nif_ns.sentence, uris(sentences, parent)))
+        return out
+
+
+class Segmentation:
+    """
+    The paragraph, sentence and word layers of a context, see
+    `NIFDocument.structure`. Iterating over it yields the triples of all the
+    structures.
+    """
+    def __init__(self, context, document=None):
+        """
+        :param NIFContext context:
+        :param NIFDocument document: notified of the changes
+        """
+        self.context = context
+        self._document_ref = None if document is None else document._ref
+        self.paragraphs = ParagraphLayer(self)
+        self.sentences = SentenceLayer(self)
+        self.words = WordLayer(self)
+
+    @property
+    def layers(self):
+        return self.paragraphs, self.sentences, self.words
+
+    def __len__(self):
+        return sum(len(layer) for layer in self.layers)
+
+    def _changed(self):
+        document = self._document_ref() if self._document_ref else None
+        if document is not None:
+            document._record_changed(self)
+
+    def _uris(self):
+        """
+        :return: function (layer, idx) -> URI, caching the URIs
+        """
+        cache = dict()
+
+        def uris(layer, idx):
+            key = (id(layer), idx)
+            uri = cache.get(key)
+            if uri is None:
+                uri = cache[key] = layer.uri(idx)
+            return uri
+        return uris
+
+    def iter_subjects(self):
+        """
+        :return: generator over (URI, list of (predicate, object)) of every
+            structure
+        """
+        uris = self._uris()
+        layers = self.layers
+        for i, layer in enumerate(layers):
+            yield from layer.iter_subjects(uris, previous_layers=layers[:i])
+
+    def iter_layers(self):
+        """
+        :return: list with a generator per layer over ((begin, end), URI,
+            list of (predicate, object)) of its structures, sorted by span
+        """
+        uris = self._uris()
+        layers = self.layers
+        return [((span, uri, pos) for span, (uri, pos) in zip(
+                    zip(layer.begin, layer.end),
+                    layer.iter_subjects(uris, previous_layers=layers[:i])))
+                for i, layer in enumerate(layers)]
+
+    def __iter__(self):
+        for s, pos in self.iter_subjects():
+            for p, o in pos:
+                yield s, p, o
+
+    def copy(self, context=None, document=None):
+        """
+        :return: a segmentation with copies of the offset arrays
+        """
+        out = Segmentation(self.context if context is None else context,
+                           document=document)
+        for layer, copied in zip(self.layers, out.layers):
+            copied.begin = array('l', layer.begin)
+            copied.end = array('l', layer.end)
+        return out
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_document_ref'] = None
+        return state
@@ -0,0 +1,173 @@
+"""
+Templates of annotations sharing the same extra (predicate, object) pairs,
+e.g. the annotator, the class or an additional type of every annotation of
+an extractor.
+
+The pairs given as keyword arguments are resolved once, by
+`_parse_attr_name` and `to_rdf_literal`, into tuples of terms shared by all
+the instances. An instance only gets its offsets, URI and entity URI, so it
+is the same record that `NIFExtractedEntity` (or `NIFAnnotation` without an
+entity) builds from the same keyword arguments, without any per annotation
+name resolution, literal conversion or validation::
+
+    template = AnnotationTemplate(
+        au_kwargs={'itsrdf__ta_annotators_ref': 'NER Service',
+                   'itsrdf__ta_class_ref': dbo_ns.Place},
+        rdf__type=lkg_ns.LynxAnnotation)
+    doc.add_extracted_positions(uris, begins, ends, template=template)
+"""
+import rdflib
+
+from nif import terms
+from nif.annotation import CONTEXT_ANCHOR, NIFAnnotation, \
+    NIFAnnotationUnit, NIFExtractedEntity, RDFGetSetMixin, nif_ns, \
+    do_suffix_offset, to_rdf_literal, _parse_attr_name, _uri_schemes
+from nif.namespace import itsrdf_ns
+
+_set = object.__setattr__
+_rdf_type = rdflib.RDF.type
+_ident_ref = itsrdf_ns.taIdentRef
+
+
+def resolve_pairs(kwargs):
+    """
+    :param kwargs: dict attribute name (e.g. `itsrdf__ta_class_ref`) or
+        URIRef -> object or list of objects
+    :return: tuple of (predicate, tuple of terms) in the order of `kwargs`
+    """
+    out = dict()
+    for key, value in kwargs.items():
+        if '__' in key:
+            predicate = _parse_attr_name(key)
+        elif isinstance(key, rdflib.URIRef):
+            predicate = key
+        else:
+            raise ValueError('{} is neither an attribute name nor a '
+                             'URIRef'.format(key))
+        values = value if isinstance(value, (list, tuple)) else [value]
+        objs = out.setdefault(predicate, [])
+        for obj in values:
+            obj = to_rdf_literal(obj)
+            if obj not in objs:
+                objs.append(obj)
+    return tuple((p, tuple(objs)) for p, objs in out.items())
+
+
+def _with_types(pairs, types):
+    pairs = [(p, list(objs)) for p, objs in pairs]
+    type_objs = next((objs for p, objs in pairs if p == _rdf_type), None)
+    if type_objs is None:
+        type_objs = []
+        pairs.append((_rdf_type, type_objs))
+    for t in types:
+        if t not in type_objs:
+            type_objs.append(t)
+    return tuple((p, tuple(objs)) for p, objs in pairs)
+
+
+class AnnotationTemplate:
+    def __init__(self, au_kwargs=None, uri_scheme=nif_ns.OffsetBasedString,
+                 annotation_class=None, **kwargs):
+        """
+        :param au_kwargs: additional (predicate, object) pairs of the
+            annotation units
+        :param uri_scheme: the `rdf:type` giving the URI scheme
+        :param annotation_class: class of the instances, by default
+            `NIFExtractedEntity` if an entity URI is given and
+            `NIFAnnotation` otherwise
+        :param **kwargs: additional (predicate, object) pairs of every
+            annotation
+        """
+        assert uri_scheme in _uri_schemes
+        self.uri_scheme = uri_scheme
+        self.annotation_class = annotation_class
+        self.pairs = resolve_pairs(kwargs)
+        self.au_pairs = resolve_pairs(au_kwargs or {})
+        for p, _ in self.pairs:
+            if p in NIFAnnotation._slot_predicates:
+                raise ValueError('{} differs for every annotation and can not'
+                                 ' be part of a template.'.format(p))
+        if any(p == _ident_ref for p, _ in self.au_pairs):
+            raise ValueError('{} is given by the entity URI.'.format(
+                _ident_ref))
+        self._au_pairs = _with_types(self.au_pairs,
+                                     NIFAnnotationUnit.nif_classes)
+        # class -> pairs of its instances, with their rdf:types
+        self._class_pairs = dict()
+
+    def _pairs(self, cls):
+        try:
+            return self._class_pairs[cls]
+        except KeyError:
+            pairs = self._class_pairs[cls] = _with_types(
+                self.pairs, cls.nif_classes + (self.uri_scheme,))
+            return pairs
+
+    def unit(self, entity_uri):
+        """
+        :param entity_uri: URI of the entity
+        :return: NIFAnnotationUnit with a new BNode
+        """
+        if not isinstance(entity_uri, rdflib.URIRef):
+            entity_uri = terms.uri_ref(entity_uri)
+        au = NIFAnnotationUnit.__new__(NIFAnnotationUnit)
+        RDFGetSetMixin.__init__(au)
+        _set(au, 'uri', rdflib.BNode())
+        po = {_ident_ref: [entity_uri]}
+        for p, objs in self._au_pairs:
+            po[p] = list(objs)
+        _set(au, '_po', po)
+        return au
+
+    def annotation(self, context, begin, end, entity_uri=None,
+                   anchor_of=CONTEXT_ANCHOR):
+        """
+        :param NIFContext context: the reference context
+        :param int begin: begin index
+        :param int end: end index
+        :param entity_uri: URI of the entity of the annotation unit, no unit
+            is created if None
+        :param anchor_of: the anchor, read from the context by default
+        :return: the annotation, not validated
+        """
+        cls = self.annotation_class
+        if cls is None:
+            cls = NIFAnnotation if entity_uri is None else NIFExtractedEntity
+        ann = cls.__new__(cls)
+        RDFGetSetMixin.__init__(ann)
+        _set(ann, 'uri', do_suffix_offset(context.uri, begin, end))
+        _set(ann, '_begin', begin)
+        _set(ann, '_end', end)
+        _set(ann, 'reference_context', context)
+        _set(ann, '_ref_uri', context.uri)
+        po = {p: list(objs) for p, objs in self._pairs(cls)}
+        _set(ann, '_po', po)
+        if anchor_of is CONTEXT_ANCHOR or ann._spans_context(anchor_of):
+            _set(ann, '_anchor', CONTEXT_ANCHOR)
+        elif anchor_of is not None:
+            _set(ann, '_anchor', to_rdf_literal(anchor_of))
+        if entity_uri is None:
+            _set(ann, 'annotation_units', dict())
+        else:
+            au = self.unit(entity_uri)
+            po.setdefault(nif_ns.annotationUnit, []).append(au.uri)
+            _set(ann, 'annotation_units', {au.uri: au})
+        return ann
+
+    def annotations(self, context, entity_uris, begins, ends):
+        """
+        :param entity_uris: entity URI of every position, or a single URI
+            for all of them
+        :param begins: begin indices, any sequence of ints
+        :param ends: end indices
+        :return: list of the annotations, not validated
+        """
+        if len(begins) != len(ends):
+            raise ValueError('{} begin and {} end indices provided.'.format(
+                len(begins), len(ends)))
+        if isinstance(entity_uris, str):
+            entity_uris = [entity_uris] * len(begins)
+        uri_ref = terms.uri_ref
+        return [self.annotation(context, int(begin), int(end),
+                                uri_ref(entity_uri))
+                for entity_uri, begin, end in zip(entity_uris, begins, ends)]
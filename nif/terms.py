@@ -0,0 +1,113 @@
+"""
+Process-wide interning of the RDF terms created over and over by
+`nif.annotation`: the offset literals, the offset-suffix URIs of the
+annotations, the entity URIs and the short literals such as the annotator
+names. Equal terms built through this module are the same object, so a
+corpus holds a single copy of each of them and their hashes are computed
+once.
+
+Every kind of term has its own LRU cache of at most `TERM_CACHE_SIZE`
+entries, see `set_cache_size`, `cache_info` and `clear_caches`. Long
+strings, e.g. the text of a context, are never cached.
+"""
+import functools
+
+import rdflib
+
+TERM_CACHE_SIZE = 1 << 16
+# longer lexical forms are not cached, not to keep whole texts alive
+MAX_CACHED_LENGTH = 256
+
+_xsd_nni = rdflib.XSD.nonNegativeInteger
+_offset_marker = '#offset_'
+_cacheable_types = (str, int, float, bool)
+
+
+def _offset_literal(value):
+    return rdflib.Literal(value, datatype=_xsd_nni)
+
+
+def _offset_uri(uri, begin_index, end_index):
+    # TODO: add uri_scheme and add support for RFC5147String
+    uri_str = uri.toPython() if hasattr(uri, 'toPython') else str(uri)
+    uri_str = uri_str.rstrip('/')
+    if _offset_marker in uri_str:
+        splitted = uri_str.split(_offset_marker)
+        splitted[-1] = '{}_{}'.format(begin_index, end_index)
+        out = _offset_marker.join(splitted)
+    else:
+        out = uri_str + _offset_marker + '{}_{}'.format(begin_index,
+                                                        end_index)
+    return rdflib.URIRef(out)
+
+
+def _literal(value, datatype):
+    return rdflib.Literal(value, datatype=datatype)
+
+
+_factories = {'offset_literal': _offset_literal,
+              'offset_uri': _offset_uri,
+              'uri_ref': rdflib.URIRef,
+              'literal': _literal}
+_caches = dict()
+
+
+def set_cache_size(maxsize=TERM_CACHE_SIZE):
+    """
+    Replace the caches by empty ones of at most `maxsize` entries each,
+    `None` for unbounded caches and 0 to disable the interning.
+    """
+    for name, factory in _factories.items():
+        _caches[name] = functools.lru_cache(maxsize=maxsize,
+                                            typed=True)(factory)
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.cache_clear()
+
+
+def cache_info():
+    """
+    :return: dict kind of term -> `functools._CacheInfo` of its cache
+    """
+    return {name: cache.cache_info() for name, cache in _caches.items()}
+
+
+def offset_literal(value):
+    """
+    :param int value: begin or end index
+    :return: xsd:nonNegativeInteger literal of `value`
+    """
+    return _caches['offset_literal'](value)
+
+
+def offset_uri(uri, begin_index, end_index):
+    """
+    :return: URIRef of the span `begin_index`, `end_index` of the string
+        `uri`, any previous offset suffix of `uri` is replaced
+    """
+    return _caches['offset_uri'](uri, begin_index, end_index)
+
+
+def uri_ref(value):
+    """
+    :return: URIRef of `value`
+    """
+    if isinstance(value, rdflib.URIRef) or len(value) > MAX_CACHED_LENGTH:
+        return rdflib.URIRef(value)
+    return _caches['uri_ref'](value)
+
+
+def literal(value, datatype=None):
+    """
+    :return: literal of the plain python value, or lexical form if
+        `datatype` is given, `value`
+    """
+    if type(value) not in _cacheable_types or \
+            type(value) is str and len(value) > MAX_CACHED_LENGTH:
+        return rdflib.Literal(value, datatype=datatype)
+    return _caches['literal'](value, datatype)
+
+
+set_cache_size()
@@ -0,0 +1,59 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from nif.annotation import *
+from nif.benchmark import synthetic_document
+
+
+async def _chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class _Writer:
+    def __init__(self):
+        self.data = []
+
+    async def write(self, data):
+        self.data.append(data)
+
+
+class TestAsync:
+    def setUp(self):
+        self.doc = synthetic_document(text_length=1000, n_annotations=20)
+        self.doc.context.nif__keyword = 'Mádrid'
+        self.nt = self.doc.serialize(format='nt').decode()
+
+    def test_parse(self):
+        doc = asyncio.run(NIFDocument.aparse_rdf(self.nt, format='nt'))
+        assert doc == self.doc
+        # a multibyte character split between chunks
+        chunks = _chunks(self.nt.encode('utf-8'), 7)
+        with ThreadPoolExecutor(1) as executor:
+            doc = asyncio.run(NIFDocument.aparse_rdf(chunks, format='nt',
+                                                     executor=executor))
+        assert doc == self.doc
+
+    def test_serialize(self):
+        nt = asyncio.run(self.doc.aserialize(format='nt')).decode()
+        assert sorted(nt.splitlines()) == sorted(self.nt.splitlines())
+        writer = _Writer()
+        n = asyncio.run(self.doc.awrite_to(writer, format='ttl',
+                                           batch_size=5))
+        assert n == len(writer.data) > 1
+        doc = NIFDocument.parse_rdf(b''.join(writer.data).decode(),
+                                    format='ttl')
+        assert doc == self.doc
+
+    def test_instrument(self):
+        async def parse(n):
+            with instrument() as stats:
+                await asyncio.gather(*(NIFDocument.aparse_rdf(self.nt,
+                                                              format='nt')
+                                       for _ in range(n)))
+            return stats.calls['parse_rdf']
+
+        async def main():
+            return await asyncio.gather(parse(1), parse(2))
+
+        assert asyncio.run(main()) == [1, 2]
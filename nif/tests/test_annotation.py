@@ -1,8 +1,11 @@
+import gc
 import os
+import threading
 from collections import Counter
 
 import nose
 from nose.tools import assert_raises
+from rdflib.compare import isomorphic
 
 from nif.annotation import *
 
@@ -121,6 +124,21 @@ class TestAnnotation:
                 reference_context=self.cxt,
                 anchor_of=text)
 
+    def test_context_anchor(self):
+        import pickle
+        ann = NIFAnnotation(begin_end_index=(0, 5),
+                            reference_context=self.cxt, anchor_of='Vodka')
+        assert ann._anchor is CONTEXT_ANCHOR
+        assert ann.nif__anchor_of == rdflib.Literal('Vodka')
+        assert (ann.uri, nif_ns.anchorOf, rdflib.Literal('Vodka')) in ann
+        assert pickle.loads(pickle.dumps(ann))._anchor is CONTEXT_ANCHOR
+        lowered = NIFAnnotation(begin_end_index=(0, 5),
+                                reference_context=self.cxt, anchor_of='vodka')
+        assert lowered.nif__anchor_of == rdflib.Literal('vodka')
+        with nose.tools.assert_raises(ValueError):
+            ann.nif__begin_index = 1
+        assert ann.nif__anchor_of == rdflib.Literal('Vodka')
+
     def test_annotation_unit(self):
         au1_dict = {
             "nif__confidence": 1.0,
@@ -149,6 +167,82 @@ class TestAnnotation:
         assert len(ann_alex.annotation_units) == 1
 
 
+class TestRecord:
+    def setUp(self):
+        self.text = 'some larger context. this is a phrase in this context.'
+        self.cxt = NIFContext(is_string=self.text,
+                              uri='http://some.doc/' + str(uuid.uuid4()))
+
+    def test_not_a_graph(self):
+        ann = NIFExtractedEntity(
+            reference_context=self.cxt, begin_end_index=(0, 4),
+            anchor_of='some', entity_uri='http://example.com/index#some')
+        assert not isinstance(ann, rdflib.Graph)
+        assert not isinstance(self.cxt, rdflib.Graph)
+        assert not ann.__dict__, ann.__dict__
+
+    def test_attribute_api(self):
+        ann = NIFAnnotation(begin_end_index=(5, 11),
+                            reference_context=self.cxt, anchor_of='larger')
+        assert int(ann.nif__begin_index) == 5
+        assert ann.nif__begin_index.datatype == rdflib.XSD.nonNegativeInteger
+        assert ann.nif__reference_context == self.cxt.uri
+        assert str(ann.nif__anchor_of) == 'larger'
+        assert ann.nif__is_string is None
+        ann.nif__keyword = ['a', 'b']
+        assert len(ann.nif__keyword) == 2
+
+    def test_slot_attributes(self):
+        from nif.annotation import _SlotAttribute
+        assert isinstance(NIFAnnotation.__dict__['nif__anchor_of'],
+                          _SlotAttribute)
+        assert isinstance(NIFString.__dict__['nif__begin_index'],
+                          _SlotAttribute)
+        ann = NIFAnnotation(begin_end_index=(5, 11),
+                            reference_context=self.cxt, anchor_of='larger')
+        ann.nif__begin_index = 5
+        assert ann.nif__begin_index == rdflib.Literal('5', datatype=rdflib.XSD.integer)
+        # a second value of a slot predicate
+        ann.addattr('nif__anchor_of', 'LARGER', validate=False)
+        assert sorted(map(str, ann.nif__anchor_of)) == ['LARGER', 'larger']
+
+    def test_attr_name_cache(self):
+        from nif.annotation import _attr_predicates, _parse_attr_name
+        assert _parse_attr_name('itsrdf__ta_class_ref') == \
+               ns_dict['itsrdf'].taClassRef
+        assert 'itsrdf__ta_class_ref' in _attr_predicates
+        old_ns = ns_dict['itsrdf']
+        try:
+            register_ns('itsrdf', rdflib.Namespace('http://example.com/its#'))
+            assert 'itsrdf__ta_class_ref' not in _attr_predicates
+            assert _parse_attr_name('itsrdf__ta_class_ref') == \
+                   rdflib.URIRef('http://example.com/its#taClassRef')
+        finally:
+            register_ns('itsrdf', old_ns)
+        assert _parse_attr_name('itsrdf__ta_class_ref') == \
+               ns_dict['itsrdf'].taClassRef
+
+    def test_to_graph(self):
+        ann = NIFAnnotation(begin_end_index=(5, 11),
+                            reference_context=self.cxt, anchor_of='larger')
+        g = ann.to_graph()
+        assert isinstance(g, rdflib.Graph)
+        assert len(g) == len(ann) == 6, list(g)
+        assert set(g) == set(ann)
+        assert (ann.uri, rdflib.RDF.type, nif_ns.OffsetBasedString) in g
+        assert (ann.uri, nif_ns.endIndex,
+                rdflib.Literal(11, datatype=rdflib.XSD.nonNegativeInteger)) in g
+
+    def test_foreign_subject(self):
+        other = rdflib.URIRef('http://example.com/other')
+        self.cxt.add((other, rdflib.RDFS.label, rdflib.Literal('other')))
+        assert self.cxt.value(subject=other,
+                              predicate=rdflib.RDFS.label) is not None
+        assert (other, rdflib.RDFS.label, None) in self.cxt.to_graph()
+        self.cxt.remove((other, None, None))
+        assert (other, None, None) not in self.cxt
+
+
 class TestContext:
     def setUp(self):
         pass
@@ -304,17 +398,254 @@ class TestDocument:
         d = NIFDocument(context=self.cxt, annotations=[])
         d.add_extracted_cpts([cpt])
 
-    # def test_copy(self):
-    #     cpt = {
-    #         'uri': 'http://some.uri',
-    #         'matchings': [
-    #             {'text': 'larger', 'positions': [(5, 11)]},
-    #             {'text': 'this', 'positions': [(21, 25), (41, 45)]}
-    #         ]
-    #     }
-    #     d = NIFDocument(context=self.cxt, annotations=[])
-    #     d.add_extracted_cpts([cpt])
-    #     assert d == d.__copy__()
+    def test_add_extracted_positions(self):
+        from array import array
+        d = NIFDocument(context=self.cxt, annotations=[])
+        stats = dict()
+        d.add_extracted_positions(
+            'http://some.uri', array('l', [5, 21, 41]), array('l', [11, 25, 45]),
+            au_kwargs={'itsrdf__ta_annotators_ref': 'Extractor'}, stats=stats)
+        assert stats['positions'] == 3
+        assert stats['positions_per_second'] > 0
+        assert [str(a.nif__anchor_of) for a in d.annotations] == \
+            ['larger', 'this', 'this']
+        units = [list(a.annotation_units.values())[0] for a in d.annotations]
+        assert len({au.uri for au in units}) == 3
+        assert all(str(au.itsrdf__ta_annotators_ref) == 'Extractor'
+                   for au in units)
+        assert all(isinstance(a, NIFExtractedEntity) for a in d.annotations)
+        with assert_raises(ValueError):
+            d.add_extracted_positions(['http://some.uri'], [5], [500])
+        assert len(d.annotations) == 3
+
+    def test_span_queries(self):
+        cpt = {
+            'uri': 'http://some.uri',
+            'matchings': [
+                {'text': 'larger', 'positions': [(5, 11)]},
+                {'text': 'this', 'positions': [(21, 25), (41, 45)]}
+            ]
+        }
+        d = NIFDocument(context=self.cxt, annotations=[self.ee])
+        d.add_extracted_cpts([cpt])
+        assert len(d.spans) == 4
+        assert [a.begin_end_index for a in d.spans.overlapping(3, 22)] == \
+            [(0, 4), (5, 11), (21, 25)]
+        assert d.spans.containing(42)[0].begin_end_index == (41, 45)
+        assert [a.begin_end_index for a in d.spans.within(20, 50)] == \
+            [(21, 25), (41, 45)]
+        assert d.spans.nearest(15)[0].begin_end_index == (5, 11)
+
+    def test_span_index_follows_offsets(self):
+        d = NIFDocument(context=self.cxt)
+        d.add_extracted_positions('http://some.uri', [0, 21], [4, 25])
+        a = d.annotations[0]
+        assert d.spans.overlapping(0, 4) == [a]
+        a.__setattr__('nif__begin_index', 5, validate=False)
+        a.__setattr__('nif__end_index', 11, validate=False)
+        assert d.spans.overlapping(0, 4) == []
+        assert d.spans.overlapping(5, 11) == [a]
+        assert d.spans.within(0, 30) == [a, d.annotations[1]]
+        d.remove_annotations(d.annotations)
+        assert len(d.spans) == 0
+
+    def test_from_spans(self):
+        spans = [(0, 4), (5, 11, 'http://some.uri'), (21, 25)]
+        d = NIFDocument.from_spans(self.cxt, spans,
+                                   rdf__type=ns_dict['lkg']['LynxAnnotation'])
+        assert len(d.annotations) == 3
+        assert str(d.annotations[1].nif__anchor_of) == 'larger'
+        au = next(iter(d.annotations[1].annotation_units.values()))
+        assert str(au.itsrdf__ta_ident_ref) == 'http://some.uri'
+        assert (d.annotations[2].uri, rdflib.RDF.type,
+                ns_dict['lkg']['LynxAnnotation']) in d.rdf
+
+    def test_from_spans_reports_all_errors(self):
+        spans = [(0, 4), (50, 60), (5, 11), (30, 1000)]
+        with assert_raises(ValueError) as cm:
+            NIFDocument.from_spans(self.cxt, spans)
+        msg = str(cm.exception)
+        assert msg.startswith('2 of 4 annotations are invalid'), msg
+        assert '#offset_50_60' in msg and '#offset_30_1000' in msg, msg
+
+    def test_failed_add_keeps_document(self):
+        d = NIFDocument(context=self.cxt, annotations=[self.ee])
+        with assert_raises(ValueError):
+            d.add_annotations([self.ee2])
+        assert d.annotations == [self.ee]
+        assert len(d.spans) == 1
+
+    def test_rdf_cached(self):
+        d = NIFDocument(context=self.cxt, annotations=[self.ee])
+        g = d.rdf
+        assert d.rdf is g
+        assert not (None, nif_ns.referenceContext, None) in self.cxt
+        n_triples = len(g)
+        ee = NIFExtractedEntity(reference_context=self.cxt,
+                                begin_end_index=(5, 11), anchor_of='larger',
+                                entity_uri='http://example.com/index#larger')
+        d.add_annotations([ee])
+        assert d.rdf is g
+        assert len(d.rdf) > n_triples
+        assert (ee.uri, nif_ns.anchorOf, rdflib.Literal('larger')) in d.rdf
+        ee.nif__keyword = 'keyword'
+        assert (ee.uri, nif_ns.keyword, rdflib.Literal('keyword')) in d.rdf
+        au = next(iter(ee.annotation_units.values()))
+        au.nif__confidence = 0.5
+        assert (au.uri, nif_ns.confidence, rdflib.Literal(0.5)) in d.rdf
+        self.cxt.rdfs__label = 'label'
+        assert (self.cxt.uri, rdflib.RDFS.label, None) in d.rdf
+        g = d.rdf
+        d.remove_annotations([ee])
+        assert d.rdf is g
+        assert (ee.uri, None, None) not in d.rdf
+        assert (au.uri, None, None) not in d.rdf
+        assert len(d.spans) == 1
+        # the triples shared with a remaining annotation are kept
+        same = NIFExtractedEntity(reference_context=self.cxt,
+                                  begin_end_index=(5, 11), anchor_of='larger',
+                                  entity_uri='http://example.com/index#large')
+        d.add_annotations([ee, same])
+        d.remove_annotations([ee])
+        assert d.rdf is g
+        assert (ee.uri, nif_ns.anchorOf, rdflib.Literal('larger')) in d.rdf
+        assert (ee.uri, nif_ns.keyword, None) not in d.rdf
+        assert isomorphic(d.rdf, d._build_rdf())
+
+    def test_watchers_pruned(self):
+        for _ in range(10):
+            NIFDocument(context=self.cxt)
+        gc.collect()
+        NIFDocument(context=self.cxt)
+        assert len(self.cxt._watchers) == 1
+
+    def test_pickle(self):
+        import pickle
+        d = NIFDocument(context=self.cxt, annotations=[self.ee])
+        d2 = pickle.loads(pickle.dumps(d))
+        assert len(d2.rdf) == len(d.rdf)
+        assert d2 == d
+        d2.context.rdfs__label = 'label'
+        assert (d2.context.uri, rdflib.RDFS.label, None) in d2.rdf
+        assert d2.fingerprint != d.fingerprint
+
+    def test_copy(self):
+        cpt = {
+            'uri': 'http://some.uri',
+            'matchings': [
+                {'text': 'larger', 'positions': [(5, 11)]},
+                {'text': 'this', 'positions': [(21, 25), (41, 45)]}
+            ]
+        }
+        d = NIFDocument(context=self.cxt, annotations=[])
+        d.add_extracted_cpts([cpt])
+        assert d == d.__copy__()
+        d2 = d.__copy__()
+        assert d2.context is not d.context
+        assert d2.annotations[0].reference_context is d2.context
+        d2.annotations[0].nif__keyword = 'changed'
+        assert d.annotations[0].nif__keyword is None
+        assert d != d2
+
+    def test_fingerprint(self):
+        cpt = {
+            'uri': 'http://some.uri',
+            'matchings': [{'text': 'this', 'positions': [(21, 25), (41, 45)]}]
+        }
+        d = NIFDocument(context=self.cxt, annotations=[self.ee])
+        d.add_extracted_cpts([cpt])
+        fp = d.fingerprint
+        assert len(fp) == 32
+        # other blank node ids of the units and another order
+        parsed = NIFDocument.parse_rdf(d.serialize(format='nt').decode(),
+                                       format='nt')
+        parsed.annotations.reverse()
+        assert parsed.fingerprint == fp
+        # incremental updates
+        au = list(d.annotations[1].annotation_units.values())[0]
+        au.itsrdf__ta_confidence = 0.5
+        fp_changed = d.fingerprint
+        assert fp_changed != fp
+        au.itsrdf__ta_confidence = []
+        assert d.fingerprint == fp
+        ann = d.annotations[2]
+        d.remove_annotations([ann])
+        assert d.fingerprint != fp
+        d.add_annotations([ann])
+        assert d.fingerprint == fp
+        d.context.rdfs__label = 'label'
+        assert d.fingerprint != fp
+        assert d.fingerprint == NIFDocument.parse_rdf(
+            d.serialize(format='nt').decode(), format='nt').fingerprint
+
+    def test_fingerprint_duplicates(self):
+        # the graph of a document is a set of triples
+        d = NIFDocument(context=self.cxt, annotations=[self.ee])
+        fp = d.fingerprint
+        dup = NIFDocument(context=self.cxt,
+                          annotations=[self.ee, self.ee.__copy__()])
+        assert dup == d
+        d.add_annotations([self.ee.__copy__()], validate=False)
+        assert d.fingerprint == fp
+        d.remove_annotations(d.annotations[1:])
+        assert d.fingerprint == fp
+        d.remove_annotations(d.annotations)
+        assert d.fingerprint != fp
+
+    def test_instrument(self):
+        import nif.annotation
+        stages = []
+        with instrument() as outer:
+            with instrument(callback=lambda *args: stages.append(args)) \
+                    as stats:
+                d = NIFDocument(context=self.cxt, annotations=[self.ee])
+                d.add_extracted_positions('http://some.uri', [5], [11])
+                parsed = NIFDocument.parse_rdf(d.serialize(format='nt'),
+                                               format='nt')
+                assert parsed.annotations[0].nif__anchor_of is not None
+            assert nif.annotation._instrumentation.get() is outer
+        assert nif.annotation._instrumentation.get() is None
+        snapshot = stats.snapshot()
+        counters = snapshot['counters']
+        assert counters['validations'] == 4
+        assert counters['graphs_created'] == 1
+        assert counters['attribute_resolutions'] >= 1
+        assert counters['records_created'] > 0
+        assert counters['triples_added'] > 0
+        timers = snapshot['timers']
+        for stage in ('parse_rdf', 'add_annotations', 'validate', 'rdf',
+                      'serialize', 'add_extracted_positions'):
+            assert timers[stage]['calls'] >= 1, stage
+        assert timers['add_annotations']['calls'] == 3
+        assert len(stages) == sum(t['calls'] for t in timers.values())
+        assert outer.snapshot() == snapshot
+        NIFDocument(context=self.cxt, annotations=[self.ee])
+        assert stats.snapshot() == snapshot
+
+    def test_instrument_threads(self):
+        import nif.annotation
+        entered, exited = threading.Barrier(2), threading.Event()
+        counts = dict()
+
+        def run(name, exit_first):
+            with instrument() as stats:
+                entered.wait()
+                # the blocks exit in the other order than they were entered
+                if not exit_first:
+                    exited.wait()
+                NIFDocument(context=self.cxt, annotations=[self.ee])
+            if exit_first:
+                exited.set()
+            counts[name] = stats.counters['validations']
+
+        threads = [threading.Thread(target=run, args=(i, i == 0))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert counts == {0: 1, 1: 1}
+        assert nif.annotation._instrumentation.get() is None
 
 
 class TestSuffix:
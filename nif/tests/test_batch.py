@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+
+from nif.annotation import *
+from nif.batch import BatchResult, process
+
+
+def add_madrid(doc):
+    cpt = {'uri': 'http://dbpedia.org/resource/Madrid',
+           'matchings': [{'text': 'Madrid', 'positions': [(7, 13)]}]}
+    doc.add_extracted_cpts([cpt])
+    return doc
+
+
+def count_annotations(doc):
+    return len(doc.annotations)
+
+
+def annotation_generator(doc):
+    return (ann for ann in doc.annotations)
+
+
+def exit_on_ner(doc):
+    # the extracted entity of madrid_ner.nif is kept in the context
+    if len(doc.context) > 10:
+        os._exit(1)
+    return len(doc.annotations)
+
+
+class TestBatch:
+    def setUp(self):
+        examples_path = Path(os.getenv('EXAMPLES_PATH', default='../examples'))
+        self.paths = [examples_path / 'madrid_ner.nif',
+                      examples_path / 'missing.nif',
+                      examples_path / 'madrid_empty.nif']
+
+    def test_sequential(self):
+        results = list(process(self.paths, count_annotations, workers=0))
+        assert [r.index for r in results] == [0, 1, 2]
+        assert [r.ok for r in results] == [True, False, True]
+        assert 'missing.nif' in results[1].error
+        assert results[0].value == 0
+
+    def test_pool(self):
+        results = list(process(self.paths * 3, add_madrid, workers=2,
+                               max_pending=2))
+        assert [r.index for r in results] == list(range(9))
+        assert sum(r.ok for r in results) == 6
+        doc = results[0].document()
+        assert isinstance(doc, NIFDocument)
+        assert len(doc.annotations) == 1
+        assert str(doc.annotations[0].nif__anchor_of) == 'Madrid'
+
+    def test_unordered(self):
+        results = list(process(self.paths * 2, count_annotations, workers=2,
+                               ordered=False))
+        assert sorted(r.index for r in results) == list(range(6))
+        assert all(isinstance(r, BatchResult) for r in results)
+
+    def test_unpicklable_value(self):
+        results = list(process(self.paths, annotation_generator, workers=1))
+        assert [r.index for r in results] == [0, 1, 2]
+        assert not any(r.ok for r in results)
+        assert 'pickle' in results[0].error
+
+    def test_broken_pool(self):
+        paths = [self.paths[2], self.paths[0], self.paths[2]]
+        for ordered in (True, False):
+            results = list(process(paths, exit_on_ner, workers=1,
+                                   max_pending=1, ordered=ordered))
+            assert [r.index for r in results] == [0, 1, 2]
+            assert [r.ok for r in results] == [True, False, True]
+            assert 'BrokenProcessPool' in results[1].error
+
+    def test_broken_pool_pending(self):
+        # the documents queued with the one killing its worker are retried
+        paths = [self.paths[2], self.paths[0]] + [self.paths[2]] * 4
+        for workers in (1, 2):
+            for ordered in (True, False):
+                results = sorted(process(paths, exit_on_ner, workers=workers,
+                                         max_pending=4, ordered=ordered))
+                assert [r.index for r in results] == list(range(6))
+                assert [r.ok for r in results] == [True, False] + [True] * 4
+                assert 'BrokenProcessPool' in results[1].error
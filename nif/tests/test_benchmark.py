@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+
+from nif import benchmark
+
+
+class TestBenchmark:
+    def test_synthetic_document(self):
+        doc = benchmark.synthetic_document(
+            text_length=500, n_annotations=20, units_per_annotation=2,
+            n_extra=8)
+        assert len(doc.annotations) == 20
+        assert all(len(ann.annotation_units) == 2 for ann in doc.annotations)
+        doc.validate()
+
+    def test_run(self):
+        results = benchmark.run(text_length=300, n_annotations=10, repeat=1)
+        expected = {'construct', 'add_extracted_cpts', 'validate',
+                    'serialize_turtle', 'serialize_nt', 'parse_turtle',
+                    'serialize_jsonld', 'parse_jsonld'}
+        if benchmark.rdflib_has_jsonld():
+            expected |= {'serialize_jsonld_rdflib', 'parse_jsonld_rdflib'}
+        assert set(results['stages']) == expected
+        for result in results['stages'].values():
+            assert result['seconds'] >= 0
+            assert result['peak_bytes'] > 0
+            assert result['triples'] > 0
+        results = json.loads(json.dumps(results))
+        rows = benchmark.compare(results, results)
+        assert all(ratio == 1 for _, _, _, ratio in rows)
+
+    def test_compare_zero(self):
+        old = {'stages': {'a': {'seconds': 0}, 'b': {'seconds': 2.0}}}
+        new = {'stages': {'a': {'seconds': 0.5}, 'b': {'seconds': 1.0}}}
+        assert [row[3] for row in benchmark.compare(old, new)] == [None, 0.5]
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name, results in (('old', old), ('new', new)):
+                paths.append(os.path.join(tmp, name + '.json'))
+                with open(paths[-1], 'w') as f:
+                    json.dump(results, f)
+            benchmark.main(['--compare'] + paths)
@@ -0,0 +1,70 @@
+import pickle
+
+from rdflib.compare import isomorphic, to_isomorphic
+
+from nif.annotation import *
+from nif.columnar import ColumnarAnnotations, NO_TERM
+
+
+class TestColumnar:
+    def setUp(self):
+        self.text = 'I like Madrid. Article 1. Europe is good.'
+        self.cxt = NIFContext(is_string=self.text,
+                              uri='http://some.doc/' + str(uuid.uuid4()))
+        self.doc = NIFDocument(context=self.cxt)
+        madrid = NIFAnnotationUnit(
+            itsrdf__ta_class_ref=rdflib.URIRef('http://dbpedia.org/ontology/Location'),
+            itsrdf__ta_annotators_ref='NER Service',
+            itsrdf__ta_confidence=rdflib.Literal('0.5', datatype=rdflib.XSD.decimal))
+        self.doc.add_annotations([
+            NIFAnnotation(begin_end_index=(7, 13), reference_context=self.cxt,
+                          anchor_of='Madrid', annotation_units=[madrid],
+                          rdf__type=ns_dict['lkg']['LynxAnnotation'])])
+        cpt = {'uri': 'http://example.com/europe',
+               'matchings': [{'text': 'europe', 'positions': [(26, 32)]}]}
+        self.doc.add_extracted_cpts(
+            [cpt], au_kwargs={'itsrdf__ta_annotators_ref': 'Extractor'})
+
+    def test_columns(self):
+        cols = self.doc.to_columnar()
+        assert len(cols) == 2
+        assert cols.n_units == 2
+        assert list(cols.begin) == [7, 26]
+        assert list(cols.end) == [13, 32]
+        assert cols.term(cols.unit_annotator[0]) == rdflib.Literal('NER Service')
+        assert cols.unit_ident[0] == NO_TERM
+        assert cols.unit_confidence[0] == 0.5
+
+    def test_roundtrip(self):
+        cols = self.doc.to_columnar()
+        doc = NIFDocument.from_columnar(cols)
+        g1 = self.doc.rdf
+        g2 = doc.rdf
+        assert isomorphic(g1, g2), \
+            set(to_isomorphic(g1)) ^ set(to_isomorphic(g2))
+
+    def test_confidence_literals(self):
+        au = next(iter(self.doc.annotations[1].annotation_units.values()))
+        au.itsrdf__ta_confidence = rdflib.Literal(1)
+        madrid = next(iter(self.doc.annotations[0].annotation_units.values()))
+        madrid.itsrdf__ta_confidence = rdflib.Literal(
+            '0.50', datatype=rdflib.XSD.decimal)
+        cols = self.doc.to_columnar()
+        assert cols.unit_confidence[1] == 1.0
+        assert NIFDocument.from_columnar(cols) == self.doc
+        assert cols.select(min_confidence=0.9) == [1]
+
+    def test_select(self):
+        cols = self.doc.to_columnar()
+        europe = rdflib.URIRef('http://example.com/europe')
+        assert cols.select(ident_ref=europe) == [1]
+        assert cols.select(annotators_ref=rdflib.Literal('NER Service')) == [0]
+        assert cols.select(min_confidence=0.4) == [0]
+        assert cols.select(begin=0, end=20) == [0]
+        assert cols.select(ident_ref=rdflib.URIRef('http://unknown')) == []
+        assert cols.select() == [0, 1]
+
+    def test_pickle(self):
+        cols = pickle.loads(pickle.dumps(self.doc.to_columnar()))
+        assert list(cols.begin) == [7, 26]
+        assert str(cols.to_document().context.nif__is_string) == self.text
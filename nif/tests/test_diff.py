@@ -0,0 +1,91 @@
+from nose.tools import assert_raises
+from rdflib.compare import isomorphic
+
+from nif.annotation import *
+from nif.namespace import itsrdf_ns
+
+ENTITY = 'http://example.com/entity/'
+
+
+def _parsed(doc):
+    data = doc.serialize(format='nt')
+    return NIFDocument.parse_rdf(
+        data.decode() if isinstance(data, bytes) else data, format='nt')
+
+
+class TestDiff:
+    def setUp(self):
+        self.text = 'I like Madrid. Europe is good.'
+        self.old = NIFDocument.from_text(self.text, uri='http://example.doc')
+        self.old.add_extracted_positions(
+            [ENTITY + 'like', ENTITY + 'madrid', ENTITY + 'europe'],
+            [2, 7, 15], [6, 13, 21],
+            au_kwargs={'itsrdf__ta_confidence': 0.5})
+        self.old.structure.sentences.extend([(0, 14), (15, 30)])
+        self.new = _parsed(self.old)
+
+    def _apply(self, diff):
+        out = rdflib.Graph()
+        for triple in self.old.rdf:
+            out.add(triple)
+        for triple in diff.removed:
+            out.remove(triple)
+        for triple in diff.added:
+            out.add(triple)
+        return out
+
+    def _update(self, diff, graph=None):
+        dataset = rdflib.ConjunctiveGraph()
+        target = dataset if graph is None else dataset.get_context(
+            rdflib.URIRef(graph))
+        for triple in self.old.rdf:
+            target.add(triple)
+        dataset.update(diff.to_sparql(graph=graph))
+        return target
+
+    def test_no_difference(self):
+        diff = self.old.diff(self.new)
+        assert not diff and len(diff) == 0
+        assert diff.to_sparql() == ''
+        assert not diff.changed_spans
+
+    def test_changes(self):
+        by_span = {ann.begin_end_index: ann for ann in self.new.annotations}
+        madrid, europe = by_span[(7, 13)], by_span[(15, 21)]
+        self.new.remove_annotations([europe])
+        au, = madrid.annotation_units.values()
+        au.itsrdf__ta_confidence = 0.9
+        self.new.add_extracted_positions(ENTITY + 'good', [25], [29])
+        self.new.context.rdfs__label = 'label'
+        self.new.structure.words.extend([(7, 13)])
+        diff = self.old.diff(self.new)
+        assert diff.removed_spans == [(15, 21)]
+        assert diff.added_spans == [(25, 29)]
+        assert diff.changed_spans == [(7, 13)]
+        # the changed unit is replaced, the annotation itself is unchanged
+        assert (madrid.uri, itsrdf_ns.taConfidence, rdflib.Literal(0.9)) \
+            not in diff.added
+        assert [o for s, p, o in diff.added
+                if p == itsrdf_ns.taConfidence] == [rdflib.Literal(0.9)]
+        assert (self.new.context.uri, rdflib.RDFS.label,
+                rdflib.Literal('label')) in diff.added
+        sparql = diff.to_sparql()
+        assert sparql.count('DELETE WHERE') == 2
+        assert sparql.count('INSERT DATA') == 1
+        assert isomorphic(self._apply(diff), self.new.rdf)
+        graph = 'http://example.com/graph'
+        assert 'GRAPH <{}>'.format(graph) in diff.to_sparql(graph=graph)
+        try:
+            from rdflib.plugins import sparql  # noqa: F401
+        except ImportError:  # the SPARQL engine of rdflib 5 needs requests
+            return
+        assert isomorphic(self._update(diff), self.new.rdf)
+        assert isomorphic(self._update(diff, graph=graph), self.new.rdf)
+        reverse = self.new.diff(self.old)
+        assert reverse.removed_spans == diff.added_spans
+        assert len(reverse) == len(diff)
+
+    def test_different_contexts(self):
+        other = NIFDocument.from_text(self.text, uri='http://example.doc/b')
+        with assert_raises(ValueError):
+            self.old.diff(other)
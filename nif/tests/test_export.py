@@ -0,0 +1,93 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from nose.tools import assert_raises
+from rdflib.compare import isomorphic
+
+from nif.annotation import *
+from nif.benchmark import synthetic_document
+from nif.export import BulkExporter, http_sink
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.headers['Content-Type'],
+                                     body.decode('utf-8')))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBulkExporter:
+    def setUp(self):
+        self.docs = [synthetic_document(text_length=500, n_annotations=10,
+                                        units_per_annotation=2, seed=i)
+                     for i in range(3)]
+        self.n_triples = sum(len(doc.rdf) for doc in self.docs)
+
+    def test_nquads(self):
+        batches = []
+        with BulkExporter(batches.append, format='nquads',
+                          batch_size=50) as exporter:
+            exporter.add_all(self.docs)
+        assert exporter.stats['documents'] == 3
+        assert exporter.stats['triples'] == self.n_triples
+        assert exporter.stats['batches'] == len(batches) > 3
+        dataset = rdflib.ConjunctiveGraph()
+        for batch in batches:
+            lines = batch.splitlines()
+            # the annotations with their 2 units are not split
+            assert len(lines) <= 50
+            dataset.parse(data=batch, format='nquads')
+        for doc in self.docs:
+            assert isomorphic(dataset.get_context(doc.context.uri), doc.rdf)
+
+    def test_sparql(self):
+        batches = []
+        exporter = BulkExporter(batches.append, max_chars=5000)
+        exporter.add(self.docs[0]).add(self.docs[1])
+        exporter.flush().flush()
+        assert len(batches) == exporter.stats['batches'] > 2
+        # only the contexts, with their texts, are larger
+        assert sum(len(batch) > 5000 for batch in batches) <= 2
+        assert max(len(batch) for batch in batches
+                   if '#offset_' in batch) <= 5000
+        assert exporter.stats['triples'] == self.n_triples - \
+            len(self.docs[2].rdf)
+        assert all(batch.startswith('INSERT DATA {') for batch in batches)
+        assert 'GRAPH <{}>'.format(self.docs[1].context.uri) in batches[-1]
+        try:
+            from rdflib.plugins import sparql  # noqa: F401
+        except ImportError:  # the SPARQL engine of rdflib 5 needs requests
+            return
+        dataset = rdflib.ConjunctiveGraph()
+        for batch in batches:
+            dataset.update(batch)
+        for doc in self.docs[:2]:
+            assert isomorphic(dataset.get_context(doc.context.uri), doc.rdf)
+
+    def test_http_sink(self):
+        server = HTTPServer(('127.0.0.1', 0), _Handler)
+        server.requests = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://127.0.0.1:{}/update'.format(server.server_port)
+            with BulkExporter(http_sink(url), batch_size=100,
+                              named_graphs=False) as exporter:
+                exporter.add_all(self.docs)
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        assert len(server.requests) == exporter.stats['batches']
+        content_type, body = server.requests[0]
+        assert content_type.startswith('application/sparql-update')
+        assert 'GRAPH' not in body
+
+    def test_invalid(self):
+        with assert_raises(ValueError):
+            BulkExporter(print, format='turtle')
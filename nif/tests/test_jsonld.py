@@ -0,0 +1,163 @@
+import io
+import json
+import re
+
+from nose.tools import assert_raises
+
+from nif.annotation import *
+from nif.benchmark import synthetic_document
+from nif import jsonld
+from nif.parser import ParseError
+
+LYNX_DOC = '''
+{
+    "@context": "http://lynx-project.eu/doc/jsonld/lynxdocument.json",
+    "@id": "d39a661a",
+    "@type": ["nif:Context", "lkg:LynxDocument"],
+    "metadata": {
+        "language": "de",
+        "title": {"de": "Nichtigkeitsbeschwerde", "en": "Appeal"},
+        "sameAs": [{"@id": "https://lawthek.eu/detail/d39a661a"}]
+    },
+    "text": "Kopf Der Oberste Gerichtshof hat am 14. März 2016",
+    "offset_ini": 0,
+    "offset_end": 49,
+    "annotations": [{
+        "@id": "d39a661a#offset_9_28",
+        "@type": ["nif:Annotation", "nif:OffsetBasedString"],
+        "offset_ini": 9,
+        "offset_end": 28,
+        "anchorOf": "Oberste Gerichtshof",
+        "annotationUnit": [{
+            "@type": "nif:AnnotationUnit",
+            "taIdentRef": "http://example.com/ogh",
+            "taConfidence": 0.75
+        }]
+    }]
+}
+'''
+
+# the terms of LYNX_DOC, registered by the test only
+LYNX_TEST_CONTEXT = dict(jsonld.NIF_CONTEXT, **{
+    'taConfidence': {'@id': 'itsrdf:taConfidence', '@type': 'xsd:double'},
+    'metadata': 'lkg:metadata',
+    'language': 'eli:language',
+    'title': {'@id': 'eli:title', '@container': '@language'},
+    'sameAs': {'@id': 'owl:sameAs', '@type': '@id'}})
+
+
+class TestJsonLd:
+    def setUp(self):
+        self.doc = synthetic_document(text_length=1000, n_annotations=20,
+                                      units_per_annotation=2)
+
+    def tearDown(self):
+        jsonld.unregister_context(jsonld.LYNX_CONTEXT_URL)
+
+    def _text(self, data):
+        return data.decode() if isinstance(data, bytes) else data
+
+    def test_round_trip(self):
+        data = self._text(self.doc.serialize(format='json-ld'))
+        obj = json.loads(data)
+        assert obj['@context'] == jsonld.NIF_CONTEXT
+        assert obj['text'] == self.doc.context.text
+        ann = obj['annotations'][0]
+        assert 'referenceContext' not in ann
+        assert ann['offset_ini'] == self.doc.annotations[0].begin_end_index[0]
+        assert len(ann['annotationUnit']) == 2
+        assert NIFDocument.parse_rdf(data, format='json-ld') == self.doc
+        pretty = self._text(self.doc.serialize(format='json-ld', indent=2))
+        assert json.loads(pretty) == obj
+        assert NIFDocument.parse_rdf(pretty, format='json-ld') == self.doc
+        chunks = list(self.doc.iter_serialize(format='json-ld'))
+        assert len(chunks) == 2 + len(self.doc.annotations)
+        assert ''.join(chunks) == data
+        out = io.StringIO()
+        self.doc.write_to(out, format='json-ld')
+        assert out.getvalue() == data
+
+    def test_structure(self):
+        text = 'I like Madrid. Europe is good.'
+        doc = NIFDocument.from_text(text, uri='http://example.doc')
+        doc.structure.sentences.extend([(0, 14), (15, 30)])
+        doc.structure.words.extend((m.start(), m.end())
+                                   for m in re.finditer(r'\w+', text))
+        data = self._text(doc.serialize(format='json-ld'))
+        assert len(json.loads(data)['annotations']) == len(doc.structure)
+        assert NIFDocument.parse_rdf(data, format='json-ld') == doc
+
+    def test_lynx(self):
+        # not registered by default, the context is not guessed
+        with assert_raises(ParseError):
+            jsonld.parse_by_subject(LYNX_DOC)
+        jsonld.register_context(jsonld.LYNX_CONTEXT_URL,
+                                {'@context': LYNX_TEST_CONTEXT})
+        doc = NIFDocument.parse_rdf(LYNX_DOC, format='json-ld')
+        assert doc.context.uri == rdflib.URIRef('d39a661a')
+        assert doc.context.text.endswith('März 2016')
+        ann, = doc.annotations
+        assert ann.begin_end_index == (9, 28)
+        assert ann.nif__anchor_of == rdflib.Literal('Oberste Gerichtshof')
+        au, = ann.annotation_units.values()
+        assert au.itsrdf__ta_ident_ref == \
+            rdflib.URIRef('http://example.com/ogh')
+        assert au.itsrdf__ta_confidence == rdflib.Literal(
+            '7.5E-1', datatype=rdflib.XSD.double)
+        metadata = doc.context.lkg__metadata
+        assert isinstance(metadata, rdflib.BNode)
+        eli = rdflib.Namespace('http://data.europa.eu/eli/ontology#')
+        assert set(doc.context.objects(metadata, eli.title)) == {
+            rdflib.Literal('Nichtigkeitsbeschwerde', lang='de'),
+            rdflib.Literal('Appeal', lang='en')}
+        assert (metadata, rdflib.OWL.sameAs,
+                rdflib.URIRef('https://lawthek.eu/detail/d39a661a')) in \
+            doc.context
+        by_subject = jsonld.parse_by_subject(LYNX_DOC,
+                                             base='http://lynx.eu/doc/')
+        assert rdflib.URIRef('http://lynx.eu/doc/d39a661a') in by_subject
+        data = self._text(doc.serialize(format='json-ld',
+                                        context=jsonld.LYNX_CONTEXT_URL))
+        assert json.loads(data)['metadata']['title'] == \
+            {'de': 'Nichtigkeitsbeschwerde', 'en': 'Appeal'}
+        assert NIFDocument.parse_rdf(data, format='json-ld') == doc
+        # the default inline context is self-contained
+        data = self._text(doc.serialize(format='json-ld'))
+        jsonld.unregister_context(jsonld.LYNX_CONTEXT_URL)
+        assert NIFDocument.parse_rdf(data, format='json-ld') == doc
+
+    def test_contexts(self):
+        url = 'http://example.com/prefixes.json'
+        jsonld.register_context(url, json.dumps({'@context': {
+            'nif': str(nif_ns), 'text': 'nif:isString'}}))
+        data = self._text(self.doc.serialize(format='json-ld', context=url))
+        obj = json.loads(data)
+        assert 'text' in obj and 'nif:beginIndex' in obj
+        # no reverse property, the annotations are included
+        assert len(obj['@included']) == len(self.doc.annotations)
+        assert NIFDocument.parse_rdf(data, format='json-ld') == self.doc
+        inline = {'@vocab': 'http://example.com/vocab#'}
+        data = self._text(self.doc.serialize(format='json-ld',
+                                             context=inline))
+        assert json.loads(data)['@context'] == inline
+        assert NIFDocument.parse_rdf(data, format='json-ld') == self.doc
+
+    def test_unsupported(self):
+        for data in ('{"@context": "http://example.com/unknown.json"}',
+                     '{"@id": "http://a", "http://p": {"@list": [1]}}',
+                     '{"@id": "http://a", "@graph": []}',
+                     '{"@context": {"id": "@id"}}',
+                     'not json'):
+            with assert_raises(ParseError):
+                jsonld.parse_by_subject(data)
+        by_subject = jsonld.parse_by_subject(
+            '{"@id": "http://a", "http://p": [1, 2.5, true, "x"], '
+            '"undefined": "dropped"}')
+        assert by_subject == {rdflib.URIRef('http://a'): [
+            (rdflib.URIRef('http://p'), rdflib.Literal(
+                '1', datatype=rdflib.XSD.integer)),
+            (rdflib.URIRef('http://p'), rdflib.Literal(
+                '2.5E0', datatype=rdflib.XSD.double)),
+            (rdflib.URIRef('http://p'), rdflib.Literal(
+                'true', datatype=rdflib.XSD.boolean)),
+            (rdflib.URIRef('http://p'), rdflib.Literal('x'))]}
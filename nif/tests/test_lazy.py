@@ -0,0 +1,67 @@
+from nose.tools import assert_raises
+
+from nif.annotation import *
+from nif import parser
+from nif.benchmark import synthetic_document
+from nif.lazy import LazyDocument
+from nif.namespace import lynx_ns
+
+
+class TestLazyDocument:
+    def setUp(self):
+        self.doc = synthetic_document(text_length=2000, n_annotations=50,
+                                      units_per_annotation=2)
+        unit = next(iter(self.doc.annotations[0].annotation_units.values()))
+        unit.itsrdf__ta_annotators_ref = 'other'
+        self.turtle = self.doc.serialize(format='turtle')
+
+    def test_lazy(self):
+        lazy = NIFDocument.parse_rdf(self.turtle, format='turtle', lazy=True)
+        assert isinstance(lazy, LazyDocument)
+        assert lazy.context.uri == self.doc.context.uri
+        assert len(lazy.annotations) == len(self.doc.annotations)
+        assert lazy.materialized == 0
+        ann = lazy.annotations[3]
+        assert lazy.annotations[3] is ann
+        assert lazy.materialized == 1
+        assert len(ann.annotation_units) == 2
+        assert lazy.to_document() == self.doc
+
+    def test_filter(self):
+        lazy = NIFDocument.parse_rdf(self.turtle, format='turtle', lazy=True)
+        others = lazy.annotations.filter(annotators_ref='other')
+        assert len(others) == 1
+        assert lazy.materialized == 0
+        assert others[0].begin_end_index == \
+            self.doc.annotations[0].begin_end_index
+        assert len(lazy.annotations.filter(class_ref=lynx_ns.Class1)) == \
+            len(self.doc.annotations)
+        assert len(lazy.annotations.filter(class_ref=lynx_ns.Class2)) == 0
+        assert len(lazy.annotations.filter(rdf_type=nif_ns.Annotation)) == \
+            len(self.doc.annotations)
+        begin, end = self.doc.annotations[5].begin_end_index
+        within = lazy.annotations.filter(begin=begin, end=end)
+        assert within.uris == [self.doc.annotations[5].uri]
+        assert lazy.materialized == 1
+        part = lazy.to_document(lazy.annotations.filter(end=end))
+        assert len(part.annotations) == 6
+
+    def test_validate(self):
+        ann = self.doc.annotations[1]
+        end_triple = '<{}> <{}> "{}"'.format(ann.uri, nif_ns.endIndex,
+                                             ann.begin_end_index[1])
+        nt = self.doc.serialize(format='nt').decode()
+        assert end_triple in nt
+        nt = nt.replace(end_triple, end_triple[:-1] + '00000"')
+        lazy = NIFDocument.parse_rdf(nt, format='nt', lazy=True)
+        other = self.doc.annotations[2]
+        assert lazy.annotation(other.uri).begin_end_index == \
+            other.begin_end_index
+        with assert_raises(ValueError):
+            lazy.annotation(ann.uri)
+        lazy = LazyDocument(parser.parse_by_subject(nt, format='nt'),
+                            validate=False)
+        assert lazy.annotation(ann.uri).begin_end_index[1] > \
+            len(self.doc.context.text)
+        assert len(lazy.to_document().annotations) == \
+            len(self.doc.annotations)
@@ -0,0 +1,71 @@
+from nose.tools import assert_raises
+
+from nif.annotation import *
+
+ENTITY = 'http://example.com/entity/'
+TOOL_A = rdflib.URIRef('http://example.com/tool_a')
+TOOL_B = rdflib.URIRef('http://example.com/tool_b')
+
+
+def _units(doc, span):
+    ann, = [ann for ann in doc.annotations if ann.begin_end_index == span]
+    return sorted((str(au.itsrdf__ta_ident_ref),
+                   float(au.itsrdf__ta_confidence))
+                  for au in ann.annotation_units.values())
+
+
+class TestMerge:
+    def setUp(self):
+        self.text = 'I like Madrid and Europe.'
+        self.a = NIFDocument.from_text(self.text, uri='http://example.doc/a')
+        self.a.add_extracted_positions(
+            [ENTITY + 'madrid', ENTITY + 'like'], [7, 2], [13, 6],
+            au_kwargs={'itsrdf__ta_confidence': 0.9,
+                       'itsrdf__ta_annotators_ref': TOOL_A})
+        self.b = NIFDocument.from_text(self.text, uri='http://example.doc/b')
+        self.b.context.nif__keyword = 'capital'
+        self.b.add_extracted_positions(
+            [ENTITY + 'madrid_city', ENTITY + 'madrid', ENTITY + 'europe'],
+            [7, 7, 18], [13, 13, 24],
+            au_kwargs={'itsrdf__ta_confidence': 0.5,
+                       'itsrdf__ta_annotators_ref': TOOL_B})
+
+    def test_merge_all(self):
+        fingerprints = self.a.fingerprint, self.b.fingerprint
+        doc = NIFDocument.merge(self.a, self.b)
+        assert (self.a.fingerprint, self.b.fingerprint) == fingerprints
+        assert doc.context.uri == self.a.context.uri
+        assert str(doc.context.nif__keyword) == 'capital'
+        assert [ann.begin_end_index for ann in doc.annotations] == \
+            [(2, 6), (7, 13), (18, 24)]
+        assert all(ann.reference_context is doc.context
+                   for ann in doc.annotations)
+        assert _units(doc, (7, 13)) == [(ENTITY + 'madrid', 0.5),
+                                        (ENTITY + 'madrid', 0.9),
+                                        (ENTITY + 'madrid_city', 0.5)]
+        # merging a document with itself does not duplicate the units
+        assert NIFDocument.merge(self.a, self.a) == self.a
+        parsed = NIFDocument.parse_rdf(doc.serialize(format='nt').decode(),
+                                       format='nt')
+        assert parsed == doc
+
+    def test_policies(self):
+        doc = NIFDocument.merge(self.a, self.b, policy='confidence')
+        assert _units(doc, (7, 13)) == [(ENTITY + 'madrid', 0.9)]
+        doc = NIFDocument.merge(self.a, self.b, policy='annotator',
+                                annotators=[TOOL_B, TOOL_A])
+        assert _units(doc, (7, 13)) == [(ENTITY + 'madrid', 0.5),
+                                        (ENTITY + 'madrid_city', 0.5)]
+        assert _units(doc, (2, 6)) == [(ENTITY + 'like', 0.9)]
+        doc = NIFDocument.merge(self.a, self.b, policy=lambda units: units[:1])
+        assert all(len(ann.annotation_units) == 1 for ann in doc.annotations)
+        with assert_raises(ValueError):
+            NIFDocument.merge(self.a, self.b, policy='majority')
+
+    def test_different_contexts(self):
+        other = NIFDocument.from_text(self.text.upper(),
+                                      uri='http://example.doc/c')
+        with assert_raises(ValueError):
+            NIFDocument.merge(self.a, other)
+        with assert_raises(ValueError):
+            NIFDocument.merge()
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+
+from nose.tools import assert_raises
+from rdflib.compare import isomorphic
+
+from nif.annotation import *
+from nif.parser import ParseError, iter_ntriples, iter_turtle
+
+
+class TestParser:
+    def setUp(self):
+        self.examples_path = Path(os.getenv('EXAMPLES_PATH',
+                                            default='../examples'))
+        self.lynx_document = rdflib.URIRef(
+            'http://lkg.lynx-project.eu/def/LynxDocument')
+
+    def _check(self, text, format, **kwargs):
+        fast = NIFDocument.parse_rdf(text, format=format, **kwargs)
+        slow = NIFDocument.parse_rdf(text, format=format, fast=False,
+                                     **kwargs)
+        assert len(fast.annotations) == len(slow.annotations)
+        assert isomorphic(fast.rdf, slow.rdf)
+        return fast
+
+    def test_examples(self):
+        self._check((self.examples_path / 'madrid_ner.nif').read_text(), 'n3')
+        self._check((self.examples_path / 'madrid_empty.nif').read_text(),
+                    'n3')
+        doc = self._check((self.examples_path / 'aardwamte.nif').read_text(),
+                          'n3', context_class=self.lynx_document)
+        assert len(doc.annotations) == 4
+        assert all(ann.annotation_units for ann in doc.annotations)
+
+    def test_shared_unit(self):
+        cxt = NIFContext(is_string='I like Madrid.', uri='http://example.doc')
+        au = NIFAnnotationUnit(
+            uri=rdflib.URIRef('http://example.com/unit'),
+            itsrdf__ta_ident_ref=rdflib.URIRef('http://example.com/e'))
+        doc = NIFDocument(context=cxt, annotations=[
+            NIFAnnotation(begin_end_index=span, reference_context=cxt,
+                          anchor_of=anchor, annotation_units=[au])
+            for span, anchor in (((2, 6), 'like'), ((7, 13), 'Madrid'))])
+        nt = doc.serialize(format='nt')
+        nt = nt.decode() if isinstance(nt, bytes) else nt
+        parsed = self._check(nt, 'nt')
+        for ann in parsed.annotations:
+            assert list(ann.annotation_units) == [au.uri]
+        assert parsed == doc
+
+    def test_ntriples(self):
+        text = (self.examples_path / 'aardwamte.nif').read_text()
+        g = rdflib.Graph().parse(data=text, format='n3')
+        nt = g.serialize(format='nt').decode('utf-8')
+        doc = self._check(nt, 'nt', context_class=self.lynx_document)
+        assert len(doc.annotations) == 4
+
+    def test_turtle_syntax(self):
+        text = '''
+        @prefix ex: <http://example.com/> .
+        PREFIX x: <http://example.com/x#>
+        @base <http://example.com/base/> .
+        ex:a a ex:C ; ex:p "one", 'two'@en, """multi
+        "line\\"""" ; ex:q 1, -2.5, 1e3, true ;
+            ex:r [ ex:s <rel> ], (ex:b x:c) ; .
+        _:b1 ex:p ex:a\\.b .
+        [] ex:p "\\u00e9"^^ex:D .
+        '''
+        g = rdflib.Graph()
+        for t in iter_turtle(text):
+            g.add(t)
+        expected = rdflib.Graph().parse(data=text, format='turtle')
+        assert len(g) == len(expected) == 17, (len(g), len(expected))
+        assert isomorphic(g, expected)
+
+    def test_ntriples_syntax(self):
+        text = ('# comment\n'
+                '<http://a> <http://p> "a\\tb\\u00e9"@en-GB .\n'
+                '\n'
+                '_:x <http://p> "1"^^<http://www.w3.org/2001/XMLSchema#int> .\n'
+                '_:x <http://p> <http://b> .\n')
+        triples = list(iter_ntriples(text))
+        assert triples[0][2] == rdflib.Literal('a\tbé', lang='en-GB')
+        assert triples[1][0] is triples[2][0]
+        assert_raises(ParseError, list, iter_ntriples('<http://a> <http://b>'))
+
+    def test_fallback(self):
+        # N3 formulas are not Turtle: the rdflib route is taken
+        text = (self.examples_path / 'madrid_ner.nif').read_text()
+        assert_raises(ParseError, iter_turtle, text + '\n{ <a> <b> <c> } '
+                                                      '<d> <e> .')
+        doc = NIFDocument.parse_rdf(text + '\n{ <a> <b> <c> } <d> <e> .')
+        assert len(doc.rdf) > 0
+
+    def test_no_context(self):
+        assert_raises(ValueError, NIFDocument.parse_rdf,
+                      '<http://a> <http://b> <http://c> .', format='nt')
@@ -0,0 +1,61 @@
+import random
+
+from nif.spans import SpanIndex
+
+
+class TestSpanIndex:
+    def setUp(self):
+        rnd = random.Random(42)
+        self.spans = []
+        for i in range(200):
+            begin = rnd.randint(0, 500)
+            self.spans.append((begin, begin + rnd.randint(1, 30), i))
+        self.index = SpanIndex(self.spans)
+
+    def test_overlapping(self):
+        for begin, end in [(0, 10), (100, 180), (495, 600), (50, 50)]:
+            expected = [i for b, e, i in self.spans if b < end and e > begin]
+            result = self.index.overlapping(begin, end)
+            assert sorted(result) == sorted(expected), (begin, end)
+
+    def test_ordered(self):
+        result = self.index.overlapping(0, 1000)
+        assert [self.spans[i][:2] for i in result] == \
+            sorted(s[:2] for s in self.spans)
+
+    def test_containing(self):
+        for pos in [0, 13, 250, 529]:
+            expected = [i for b, e, i in self.spans if b <= pos < e]
+            assert sorted(self.index.containing(pos)) == sorted(expected)
+
+    def test_within(self):
+        for begin, end in [(0, 40), (100, 180), (400, 600)]:
+            expected = [i for b, e, i in self.spans if b >= begin and e <= end]
+            assert sorted(self.index.within(begin, end)) == sorted(expected)
+
+    def test_nearest(self):
+        index = SpanIndex([(0, 5, 'a'), (10, 12, 'b'), (20, 30, 'c')])
+        assert index.nearest(11) == ['b']
+        assert index.nearest(7) == ['a']
+        assert index.nearest(9, k=2) == ['b', 'a']
+        assert index.nearest(100, k=5) == ['c', 'b', 'a']
+
+    def test_add_remove(self):
+        index = SpanIndex()
+        assert index.overlapping(0, 10) == []
+        item = object()
+        index.add(3, 6, item)
+        assert index.containing(4) == [item]
+        index.remove(item)
+        assert index.containing(4) == []
+
+    def test_remove_all_and_move(self):
+        spans = {'a': [0, 5], 'b': [10, 12], 'c': [20, 30]}
+        index = SpanIndex([(b, e, i) for i, (b, e) in spans.items()],
+                          key=lambda i: tuple(spans[i]))
+        index.remove_all(['a', 'c'])
+        assert list(index) == ['b']
+        spans['b'][:] = [40, 45]
+        index.move('b')
+        assert index.containing(11) == []
+        assert index.containing(42) == ['b']
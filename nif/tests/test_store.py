@@ -0,0 +1,70 @@
+import os
+import tempfile
+from pathlib import Path
+
+from nose.tools import assert_raises
+from rdflib.compare import isomorphic
+
+from nif.annotation import *
+from nif.store import DocumentStore
+
+
+class TestStore:
+    def setUp(self):
+        examples_path = Path(os.getenv('EXAMPLES_PATH', default='../examples'))
+        self.doc = NIFDocument.parse_rdf(
+            (examples_path / 'aardwamte.nif').read_text(),
+            context_class=rdflib.URIRef('http://lkg.lynx-project.eu/def/LynxDocument'))
+        self.doc.annotations[0].nif__keyword = 'keyword'
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'doc.nifs')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_roundtrip(self):
+        assert self.doc.save(self.path) > 0
+        for mmap in (True, False):
+            doc = NIFDocument.load(self.path, mmap=mmap)
+            assert doc == self.doc
+            assert isomorphic(doc.rdf, self.doc.rdf)
+
+    def test_confidence_literals(self):
+        ann = self.doc.annotations[1]
+        au = next(iter(ann.annotation_units.values()))
+        au.itsrdf__ta_confidence = rdflib.Literal(1)
+        self.doc.save(self.path)
+        loaded = NIFDocument.load(self.path)
+        assert loaded == self.doc
+        au = next(iter(loaded.annotations[1].annotation_units.values()))
+        assert au.itsrdf__ta_confidence == rdflib.Literal(1)
+
+    def test_lazy(self):
+        self.doc.save(self.path)
+        with DocumentStore(self.path) as store:
+            assert len(store) == len(self.doc.annotations)
+            assert store.text == str(self.doc.context.nif__is_string)
+            idx = 2
+            begin, end = self.doc.annotations[idx].begin_end_index
+            assert (store.columnar.begin[idx], store.columnar.end[idx]) == \
+                (begin, end)
+            ann = store.annotation(idx)
+            assert ann.begin_end_index == (begin, end)
+            assert ann.uri == self.doc.annotations[idx].uri
+            assert len(ann.annotation_units) == \
+                len(self.doc.annotations[idx].annotation_units)
+            assert store.columnar.select(begin=begin, end=end) == [idx]
+
+    def test_language(self):
+        text = rdflib.Literal('Madrid', lang='es')
+        doc = NIFDocument(context=NIFContext(uri='http://example.doc',
+                                             is_string=text))
+        doc.save(self.path)
+        loaded = NIFDocument.load(self.path)
+        assert loaded.context.nif__is_string == text
+        assert loaded == doc
+
+    def test_not_a_store(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'@prefix nif: <http://example.com/> .')
+        assert_raises(ValueError, DocumentStore, self.path)
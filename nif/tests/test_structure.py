@@ -0,0 +1,88 @@
+import os
+import pickle
+import re
+import tempfile
+from copy import copy
+
+from nose.tools import assert_raises
+
+from nif.annotation import *
+from nif.structure import NIFSentence, NIFWord
+
+
+class TestStructure:
+    def setUp(self):
+        self.text = 'I like Madrid. Article 1.\nEurope is good.'
+        self.doc = NIFDocument.from_text(self.text, uri='http://example.doc')
+        structure = self.doc.structure
+        structure.paragraphs.extend([(0, 25), (26, 41)])
+        structure.sentences.extend([(0, 14), (15, 25), (26, 41)])
+        structure.words.extend((m.start(), m.end())
+                               for m in re.finditer(r'\w+', self.text))
+
+    def test_lookup(self):
+        words = self.doc.structure.words
+        word = words.at(8)
+        assert isinstance(word, NIFWord)
+        assert word.anchor_of == 'Madrid'
+        assert word.begin_end_index == (7, 13)
+        assert words.at(13) is None
+        assert word.next.anchor_of == 'Article'
+        assert word.previous.anchor_of == 'like'
+        assert words[0].previous is None
+        sentence = word.sentence
+        assert isinstance(sentence, NIFSentence)
+        assert [w.anchor_of for w in sentence.words] == ['I', 'like', 'Madrid']
+        assert sentence.next.next.anchor_of == 'Europe is good.'
+        assert sentence.paragraph.sentences[1].anchor_of == 'Article 1.'
+        assert words.within(15, 25) == range(3, 5)
+
+    def test_extend(self):
+        n = len(self.doc.structure.words)
+        with assert_raises(ValueError):
+            self.doc.structure.words.extend([(40, 41), (38, 39)])
+        with assert_raises(ValueError):
+            self.doc.structure.words.extend([(40, 100)])
+        assert len(self.doc.structure.words) == n
+
+    def test_rdf(self):
+        words = self.doc.structure.words
+        madrid, article = words.at(8).uri, words.at(16).uri
+        graph = self.doc.rdf
+        assert (madrid, nif_ns.nextWord, article) in graph
+        assert (article, nif_ns.previousWord, madrid) in graph
+        assert (madrid, nif_ns.sentence,
+                self.doc.structure.sentences[0].uri) in graph
+        assert (self.doc.structure.sentences[0].uri, nif_ns.lastWord,
+                madrid) in graph
+        assert (madrid, rdflib.RDF.type, nif_ns.Word) in graph
+        assert len(graph) == len(self.doc.context) + \
+            len(set(self.doc.structure))
+        for format in ('nt', 'ttl'):
+            text = ''.join(self.doc.iter_serialize(format=format))
+            parsed = NIFDocument.parse_rdf(text, format=format)
+            assert parsed == self.doc
+
+    def test_fingerprint(self):
+        fingerprint = self.doc.fingerprint
+        self.doc.structure.words.clear()
+        assert self.doc.fingerprint != fingerprint
+        assert len(self.doc.rdf) == len(self.doc.context) + \
+            len(set(self.doc.structure))
+
+    def test_copy(self):
+        for doc in (copy(self.doc), pickle.loads(pickle.dumps(self.doc)),
+                    NIFDocument.from_columnar(self.doc.to_columnar())):
+            assert doc == self.doc
+            fingerprint = doc.fingerprint
+            doc.structure.words.clear()
+            assert doc.fingerprint != fingerprint
+            assert len(self.doc.structure.words) == 8
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'doc.nifs')
+            self.doc.save(path)
+            doc = NIFDocument.load(path, mmap=False)
+        assert doc == self.doc
+        assert doc.structure.sentences.at(30).anchor_of == 'Europe is good.'
@@ -0,0 +1,80 @@
+from nose.tools import assert_raises
+
+from nif.annotation import *
+from nif.namespace import itsrdf_ns, lynx_ns
+from nif.template import AnnotationTemplate
+
+ENTITY = 'http://example.com/entity'
+PLACE = rdflib.URIRef('http://dbpedia.org/ontology/Place')
+
+
+class TestAnnotationTemplate:
+    def setUp(self):
+        self.text = 'some larger context. this is a phrase in this context.'
+        self.cxt = NIFContext(is_string=self.text, uri='http://example.doc')
+        self.au_kwargs = {'itsrdf__ta_annotators_ref': 'NER Service',
+                          'itsrdf__ta_class_ref': PLACE}
+        self.kwargs = {'rdf__type': lynx_ns.LynxAnnotation,
+                       'rdfs__comment': ['a', 'b']}
+        self.template = AnnotationTemplate(au_kwargs=self.au_kwargs,
+                                           **self.kwargs)
+
+    def _unit_po(self, ann):
+        au, = ann.annotation_units.values()
+        return au._po
+
+    def test_same_as_kwargs(self):
+        ann = self.template.annotation(self.cxt, 21, 25, ENTITY)
+        ee = NIFExtractedEntity(
+            reference_context=self.cxt, begin_end_index=(21, 25),
+            anchor_of='this', entity_uri=ENTITY, au_kwargs=self.au_kwargs,
+            **self.kwargs)
+        assert type(ann) is NIFExtractedEntity
+        assert ann.uri == ee.uri
+        assert ann.nif__anchor_of == rdflib.Literal('this')
+        assert self._unit_po(ann) == self._unit_po(ee)
+        po = dict(ann._po)
+        po[nif_ns.annotationUnit] = ee._po[nif_ns.annotationUnit]
+        assert list(po.items()) == list(ee._po.items())
+        ann.validate()
+        plain = self.template.annotation(self.cxt, 0, 4)
+        assert type(plain) is NIFAnnotation and not plain.annotation_units
+        assert plain.nif__anchor_of == rdflib.Literal('some')
+
+    def test_documents(self):
+        spans = [(5, 11, ENTITY), (21, 25), (41, 45, ENTITY)]
+        with_kwargs = NIFDocument.from_spans(self.cxt, spans,
+                                             au_kwargs=self.au_kwargs,
+                                             **self.kwargs)
+        d = NIFDocument.from_spans(self.cxt, spans, template=self.template)
+        assert d == with_kwargs
+        assert d.fingerprint == with_kwargs.fingerprint
+        d = NIFDocument.from_text(self.text, uri='http://example.doc')
+        d.add_extracted_positions([ENTITY, ENTITY + '2'], [5, 41], [11, 45],
+                                  template=self.template)
+        d.add_extracted_positions(ENTITY, [21], [25], template=self.template)
+        units = [au for ann in d.annotations
+                 for au in ann.annotation_units.values()]
+        assert len({au.uri for au in units}) == 3
+        assert all(au.itsrdf__ta_class_ref == PLACE for au in units)
+        # the instances do not share the lists of their terms
+        units[0].itsrdf__ta_class_ref = lynx_ns.Organization
+        assert units[1].itsrdf__ta_class_ref == PLACE
+        parsed = NIFDocument.parse_rdf(d.serialize(format='nt'), format='nt')
+        assert parsed == d
+        with assert_raises(ValueError):
+            d.add_extracted_positions(ENTITY, [5], [500],
+                                      template=self.template)
+
+    def test_invalid(self):
+        with assert_raises(ValueError):
+            AnnotationTemplate(nif__begin_index=3)
+        with assert_raises(ValueError):
+            AnnotationTemplate(au_kwargs={'itsrdf__ta_ident_ref': ENTITY})
+        with assert_raises(ValueError):
+            AnnotationTemplate(au_kwargs={'label': 'x'})
+        with assert_raises(ValueError):
+            NIFDocument.from_spans(self.cxt, [(0, 4)], template=self.template,
+                                   rdfs__label='x')
+        assert self.template.au_pairs[0] == (
+            itsrdf_ns.taAnnotatorsRef, (rdflib.Literal('NER Service'),))
@@ -0,0 +1,45 @@
+from nif.annotation import *
+from nif import terms
+
+
+class TestTerms:
+    def setUp(self):
+        terms.set_cache_size(4)
+        self.text = 'some larger context. this is a phrase in this context.'
+
+    def tearDown(self):
+        terms.set_cache_size()
+
+    def test_interned(self):
+        assert terms.offset_literal(5) is terms.offset_literal(5)
+        assert terms.offset_literal(5) == rdflib.Literal(5, datatype=xsd_nni)
+        uri = rdflib.URIRef('http://example.doc')
+        assert terms.offset_uri(uri, 5, 11) is do_suffix_offset(uri, 5, 11)
+        assert str(do_suffix_offset(uri + '#offset_0_4', 5, 11)) == \
+            'http://example.doc#offset_5_11'
+        assert terms.uri_ref('http://e') is terms.uri_ref('http://e')
+        assert to_rdf_literal('NER Service') is to_rdf_literal('NER Service')
+        # typed caches: equal python values of other types are other terms
+        assert to_rdf_literal(1) is not to_rdf_literal(True)
+        assert to_rdf_literal(1).datatype == rdflib.XSD.integer
+        cxt = NIFContext(is_string=self.text, uri='http://example.doc')
+        d = NIFDocument(context=cxt)
+        d.add_extracted_positions('http://e', [21, 41], [25, 45])
+        a, b = d.annotations
+        (au_a,), (au_b,) = a.annotation_units, b.annotation_units
+        assert a.annotation_units[au_a].itsrdf__ta_ident_ref is \
+            b.annotation_units[au_b].itsrdf__ta_ident_ref
+        assert a.nif__begin_index is a.nif__begin_index
+
+    def test_bounded(self):
+        for i in range(10):
+            terms.offset_literal(i)
+        info = terms.cache_info()['offset_literal']
+        assert info.currsize == 4 and info.misses == 10
+        long_text = 'x' * (terms.MAX_CACHED_LENGTH + 1)
+        terms.literal(long_text)
+        assert terms.cache_info()['literal'].currsize == 0
+        terms.clear_caches()
+        assert terms.cache_info()['offset_literal'].currsize == 0
+        terms.set_cache_size(0)
+        assert terms.offset_literal(5) is not terms.offset_literal(5)
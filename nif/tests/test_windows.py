@@ -0,0 +1,54 @@
+import re
+from copy import copy
+
+from nose.tools import assert_raises
+
+from nif.annotation import *
+from nif.benchmark import synthetic_text
+from nif import windows
+
+
+def annotate(doc):
+    text = doc.context.text
+    spans = [m.span() for m in re.finditer(r'madrid|europe', text)]
+    doc.add_extracted_positions('http://example.com/entity',
+                                [b for b, e in spans], [e for b, e in spans])
+
+
+class TestWindows:
+    def setUp(self):
+        self.text = synthetic_text(5000)
+        self.doc = NIFDocument.from_text(self.text, uri='http://example.doc')
+
+    def test_bounds(self):
+        assert windows.window_bounds(10, 4, 1) == [(0, 4), (3, 7), (6, 10)]
+        assert windows.window_bounds(10, 4, 1, boundaries=[3, 5, 9]) == \
+            [(0, 3), (2, 5), (4, 8), (7, 10)]
+        with assert_raises(ValueError):
+            windows.window_bounds(10, 4, 4)
+
+    def test_process(self):
+        expected = copy(self.doc)
+        annotate(expected)
+        for workers in (0, 2):
+            doc = windows.process(copy(self.doc), annotate, size=700,
+                                  overlap=50, workers=workers)
+            assert len(doc.annotations) == len(expected.annotations)
+            assert doc == expected
+            assert all(ann.reference_context is doc.context
+                       for ann in doc.annotations)
+
+    def test_split_merge(self):
+        annotate(self.doc)
+        fingerprint = self.doc.fingerprint
+        parts = windows.split(self.doc, size=1000, overlap=100)
+        assert parts[0].begin == 0 and parts[-1].end == len(self.text)
+        window = parts[1]
+        assert window.document.context.text == \
+            self.text[window.begin:window.end]
+        for ann in window.document.annotations:
+            begin, end = ann.begin_end_index
+            assert self.text[window.begin + begin:window.begin + end] == \
+                str(ann.nif__anchor_of)
+        windows.merge(self.doc, parts)
+        assert self.doc.fingerprint == fingerprint
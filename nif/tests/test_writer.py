@@ -0,0 +1,42 @@
+import io
+import os
+from pathlib import Path
+
+from nose.tools import assert_raises
+from rdflib.compare import isomorphic
+
+from nif.annotation import *
+from nif.writer import nt_term
+
+
+class TestStreamingWriter:
+    def setUp(self):
+        examples_path = Path(os.getenv('EXAMPLES_PATH', default='../examples'))
+        self.doc = NIFDocument.parse_rdf(
+            (examples_path / 'aardwamte.nif').read_text(),
+            context_class=rdflib.URIRef('http://lkg.lynx-project.eu/def/LynxDocument'))
+
+    def test_ntriples(self):
+        out = io.StringIO()
+        self.doc.write_to(out, format='nt')
+        g = rdflib.Graph().parse(data=out.getvalue(), format='nt')
+        assert isomorphic(g, self.doc.rdf)
+
+    def test_turtle(self):
+        out = io.BytesIO()
+        n_chunks = self.doc.write_to(out, format='ttl')
+        assert n_chunks > len(self.doc.annotations)
+        g = rdflib.Graph().parse(data=out.getvalue().decode('utf-8'),
+                                 format='turtle')
+        assert isomorphic(g, self.doc.rdf)
+
+    def test_escaping(self):
+        lit = rdflib.Literal('a "quoted"\nline\\', lang='en')
+        g = rdflib.Graph().parse(
+            data='<http://a> <http://b> {} .\n'.format(nt_term(lit)),
+            format='nt')
+        assert g.value(rdflib.URIRef('http://a'), rdflib.URIRef('http://b')) == lit
+
+    def test_unknown_format(self):
+        with assert_raises(ValueError):
+            self.doc.iter_serialize(format='xml')
@@ -0,0 +1,170 @@
+"""
+Processing of long contexts in overlapping windows.
+
+A document is split into window documents whose contexts are substrings of
+the original one, the windows are processed independently (in a pool of
+processes if required) and their annotations are merged back with the
+offsets and the URIs rebased onto the original context::
+
+    doc = windows.process(doc, annotate, size=100000, overlap=1000,
+                          workers=4)
+
+Every position of the context is owned by a single window: the overlap of
+two neighbouring windows is split in the middle. An annotation is merged
+from the window owning its begin only, so the annotations found twice in an
+overlap are kept once and the ones cut by the end of a window are dropped
+as long as the annotations are shorter than half of the overlap.
+Annotations equal to ones of the document are not added again.
+"""
+import os
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import rdflib
+
+from nif.annotation import NIFContext
+from nif.columnar import ColumnarAnnotations
+from nif.fingerprint import triples_fingerprint
+
+
+class Window(namedtuple('Window', ('begin', 'end', 'document'))):
+    """
+    The window [`begin`, `end`) of a context and its `document`, whose
+    offsets are relative to `begin`.
+    """
+    __slots__ = ()
+
+
+def window_bounds(length, size, overlap=0, boundaries=None):
+    """
+    :param length: the length of the context
+    :param size: the maximal length of a window
+    :param overlap: the number of characters shared by consecutive windows
+    :param boundaries: optional sorted offsets where the windows should be
+        cut, e.g. the ends of the sentences. A window ends at the last
+        boundary that keeps it within `size` if there is one.
+    :return: list of (begin, end) tuples covering [0, `length`)
+    """
+    if size <= 0 or not 0 <= overlap < size:
+        raise ValueError('The size {} should be positive and greater than '
+                         'the overlap {}.'.format(size, overlap))
+    out = []
+    begin = 0
+    while True:
+        end = min(begin + size, length)
+        if end < length and boundaries is not None:
+            idx = bisect_right(boundaries, end) - 1
+            if idx >= 0 and boundaries[idx] > begin + overlap:
+                end = boundaries[idx]
+        out.append((begin, end))
+        if end >= length:
+            return out
+        begin = end - overlap
+
+
+def split(doc, size, overlap=0, boundaries=None, annotations=True):
+    """
+    :param NIFDocument doc: the document to split
+    :param annotations: if True the annotations of `doc` lying inside a
+        window are copied to its document
+    :return: list of `Window`, see `window_bounds` for the parameters
+    """
+    text = doc.context.text
+    uri = str(doc.context.uri).rstrip('/')
+    anns = sorted(doc.annotations, key=lambda a: a.begin_end_index) \
+        if annotations else []
+    begins = [ann.begin_end_index[0] for ann in anns]
+    out = []
+    for begin, end in window_bounds(len(text), size, overlap, boundaries):
+        context = NIFContext(
+            uri=rdflib.URIRef('{}/window_{}_{}'.format(uri, begin, end)),
+            is_string=text[begin:end])
+        window_doc = type(doc)(context=context)
+        window_doc.add_annotations(
+            [ann.copy_to(context, -begin)
+             for ann in anns[bisect_left(begins, begin):
+                             bisect_right(begins, end)]
+             if ann.begin_end_index[1] <= end], validate=False)
+        out.append(Window(begin, end, window_doc))
+    return out
+
+
+def _annotation_key(ann):
+    triples = list(ann)
+    for au in ann.annotation_units.values():
+        triples.extend(au)
+    return triples_fingerprint(triples)
+
+
+def merge(doc, windows, validate=True):
+    """
+    Add the annotations of the windows to `doc`, see the module docstring.
+
+    :param windows: list of `Window` of the context of `doc`, sorted by
+        `begin`
+    :param validate: if False the rebased annotations are trusted to fit
+        the context
+    :return: doc
+    """
+    windows = sorted(windows, key=lambda w: w.begin)
+    by_span = dict()
+    for ann in doc.annotations:
+        by_span.setdefault(ann.begin_end_index, []).append(ann)
+    new = []
+    for i, window in enumerate(windows):
+        own_begin = 0 if i == 0 else \
+            (window.begin + windows[i - 1].end) // 2
+        own_end = None if i + 1 == len(windows) else \
+            (windows[i + 1].begin + window.end) // 2
+        for ann in window.document.annotations:
+            begin = ann.begin_end_index[0] + window.begin
+            if begin < own_begin or own_end is not None and begin >= own_end:
+                continue
+            rebased = ann.copy_to(doc.context, window.begin)
+            same_span = by_span.setdefault(rebased.begin_end_index, [])
+            if same_span:
+                key = _annotation_key(rebased)
+                if any(_annotation_key(other) == key for other in same_span):
+                    continue
+            same_span.append(rebased)
+            new.append(rebased)
+    return doc.add_annotations(new, validate=validate)
+
+
+def _apply(fn, window_doc):
+    result = fn(window_doc)
+    return window_doc if result is None else result
+
+
+def _process_window(task):
+    # much smaller and faster to pickle than the records
+    return ColumnarAnnotations.from_document(_apply(*task))
+
+
+def process(doc, fn, size, overlap=0, boundaries=None, workers=0,
+            annotations=False):
+    """
+    Split `doc`, apply `fn` to every window and merge the results back into
+    `doc`.
+
+    :param fn: function `NIFDocument -> NIFDocument or None` (if the window
+        document is changed in place). Must be picklable if `workers` is
+        not 0.
+    :param workers: number of processes, `os.cpu_count()` if None. If 0
+        the windows are processed one by one in the current process.
+    :param annotations: see `split`
+    :return: doc
+    """
+    windows = split(doc, size, overlap=overlap, boundaries=boundaries,
+                    annotations=annotations)
+    if workers == 0:
+        docs = [_apply(fn, window.document) for window in windows]
+    else:
+        tasks = [(fn, window.document) for window in windows]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) \
+                as executor:
+            docs = [result.to_document(document_class=type(doc))
+                    for result in executor.map(_process_window, tasks)]
+    return merge(doc, [window._replace(document=window_doc)
+                       for window, window_doc in zip(windows, docs)])
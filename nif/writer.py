@@ -0,0 +1,172 @@
+import io
+import re
+
+import rdflib
+
+from nif.namespace import ns_dict
+
+_local_name = re.compile(r'^[A-Za-z_][A-Za-z0-9_\-]*$')
+_escapes = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_to_escape = re.compile(r'[\\"\n\r\t]')
+
+NT_FORMATS = ('nt', 'ntriples', 'nt11', 'n-triples')
+TURTLE_FORMATS = ('ttl', 'turtle')
+JSONLD_FORMATS = ('json-ld', 'jsonld')
+
+
+def _escape(value):
+    return _to_escape.sub(lambda m: _escapes[m.group()], value)
+
+
+def nt_term(term):
+    """
+    :return: N-Triples representation of an rdflib term
+    """
+    if isinstance(term, rdflib.Literal):
+        out = '"{}"'.format(_escape(str(term)))
+        if term.language:
+            out += '@' + term.language
+        elif term.datatype:
+            out += '^^<{}>'.format(term.datatype)
+        return out
+    elif isinstance(term, rdflib.BNode):
+        return '_:' + str(term)
+    else:
+        return '<{}>'.format(term)
+
+
+class TurtleTerms:
+    """
+    Turtle representation of rdflib terms with the prefixes of
+    `nif.namespace.ns_dict` (and xsd).
+    """
+    def __init__(self, prefixes=None):
+        """
+        :param dict prefixes: prefix -> namespace URI. `ns_dict` by default.
+        """
+        if prefixes is None:
+            prefixes = {key: str(ns) for key, ns in ns_dict.items()}
+            prefixes['xsd'] = str(rdflib.XSD)
+        self.prefixes = prefixes
+        # longest namespaces first so that nested namespaces win
+        self._by_ns = sorted(((ns, key) for key, ns in prefixes.items()),
+                             key=lambda x: -len(x[0]))
+
+    def header(self):
+        return ''.join('@prefix {}: <{}> .\n'.format(key, ns)
+                       for key, ns in sorted(self.prefixes.items())) + '\n'
+
+    def uri(self, uri):
+        for ns, key in self._by_ns:
+            if uri.startswith(ns):
+                local = uri[len(ns):]
+                if _local_name.match(local):
+                    return '{}:{}'.format(key, local)
+        return '<{}>'.format(uri)
+
+    def term(self, term):
+        if isinstance(term, rdflib.Literal):
+            out = '"{}"'.format(_escape(str(term)))
+            if term.language:
+                out += '@' + term.language
+            elif term.datatype:
+                out += '^^' + self.uri(term.datatype)
+            return out
+        elif isinstance(term, rdflib.BNode):
+            return '_:' + str(term)
+        else:
+            return self.uri(term)
+
+
+def iter_records(doc):
+    """
+    :return: generator over the records of the document: the context, then
+        every annotation followed by its annotation units
+    """
+    yield doc.context
+    for ann in doc.annotations:
+        yield ann
+        for au in ann.annotation_units.values():
+            yield au
+
+
+def iter_ntriples(doc):
+    """
+    :return: generator over the N-Triples lines of the document
+    """
+    for record in iter_records(doc):
+        for s, p, o in record:
+            yield '{} {} {} .\n'.format(nt_term(s), nt_term(p), nt_term(o))
+    if doc._structure is not None:
+        for s, p, o in doc._structure:
+            yield '{} {} {} .\n'.format(nt_term(s), nt_term(p), nt_term(o))
+
+
+def iter_turtle(doc, terms=None):
+    """
+    :param TurtleTerms terms: prefixes to use
+    :return: generator over the Turtle chunks of the document, one subject
+        block per chunk
+    """
+    if terms is None:
+        terms = TurtleTerms()
+    yield terms.header()
+    for record in iter_records(doc):
+        pos = list(record.predicate_objects(record.uri))
+        if pos:
+            yield _turtle_block(terms, record.uri, pos)
+        if record._extra:
+            by_subject = dict()
+            for s, p, o in record._extra:
+                by_subject.setdefault(s, []).append((p, o))
+            for s, pos in by_subject.items():
+                yield _turtle_block(terms, s, pos)
+    if doc._structure is not None:
+        for s, pos in doc._structure.iter_subjects():
+            yield _turtle_block(terms, s, pos)
+
+
+def _turtle_block(terms, subject, pos):
+    lines = []
+    for p, o in pos:
+        if p == rdflib.RDF.type:
+            pred = 'a'
+        else:
+            pred = terms.uri(p)
+        lines.append('    {} {}'.format(pred, terms.term(o)))
+    return '{}\n{} .\n\n'.format(terms.term(subject), ' ;\n'.join(lines))
+
+
+def iter_serialize(doc, format='nt'):
+    """
+    :param NIFDocument doc:
+    :param format: one of `NT_FORMATS`, `TURTLE_FORMATS` or
+        `JSONLD_FORMATS`
+    :return: generator over text chunks
+    """
+    if format in NT_FORMATS:
+        return iter_ntriples(doc)
+    elif format in TURTLE_FORMATS:
+        return iter_turtle(doc)
+    elif format in JSONLD_FORMATS:
+        from nif import jsonld
+        return jsonld.iter_serialize(doc)
+    raise ValueError('Streaming serialization is not supported for format '
+                     '{}, use one of {}.'.format(
+                         format, NT_FORMATS + TURTLE_FORMATS +
+                         JSONLD_FORMATS))
+
+
+def write_to(doc, fileobj, format='nt', encoding='utf-8'):
+    """
+    Write the document chunk by chunk to a text or binary file object.
+
+    :return: the number of chunks written
+    """
+    chunks = iter_serialize(doc, format=format)
+    binary = not isinstance(fileobj, io.TextIOBase)
+    n = 0
+    for chunk in chunks:
+        fileobj.write(chunk.encode(encoding) if binary else chunk)
+        n += 1
+    return n